@@ -24,13 +24,15 @@ dotenv.load_dotenv()
 import logging
 import os
 
-import xarray as xr
-
 from spaemis.config import get_default_results_dir, get_path, load_config
 from spaemis.constants import OUTPUT_VERSION, RAW_DATA_DIR, TEST_DATA_DIR
 from spaemis.input_data import load_timeseries
-from spaemis.inventory import clip_region, load_inventory, write_inventory_csvs
-from spaemis.project import calculate_point_sources, calculate_projections
+from spaemis.inventory import load_inventory, write_inventory_csvs
+from spaemis.project import (
+    calculate_point_sources,
+    calculate_projections,
+    merge_point_sources,
+)
 
 logger = logging.getLogger("200_run_projection")
 logging.basicConfig(level=logging.INFO)
@@ -40,6 +42,9 @@ CONFIG_PATH = os.path.join(
     RAW_DATA_DIR, "configuration", "scenarios", "ssp119_australia.yaml"
 )
 RESULTS_PATH = get_default_results_dir(CONFIG_PATH)
+# Slices can be calculated using a pool of "thread" or "process" workers
+EXECUTOR = "serial"
+WORKERS = None
 
 # %%
 # Test configuration
@@ -67,7 +72,9 @@ timeseries = load_timeseries(config.input_timeseries, get_path(RESULTS_PATH, "in
 timeseries
 
 # %%
-dataset = calculate_projections(config, inventory, timeseries)
+dataset = calculate_projections(
+    config, inventory, timeseries, executor=EXECUTOR, workers=WORKERS
+)
 dataset
 
 
@@ -99,16 +106,7 @@ point_sources["H2"].sel(sector="industry").plot()
 # %%
 # Align and merge point sources
 # dataset has nans outside of the clipped region. PointSources in those areas are ignored.
-merged, temp = xr.align(dataset.fillna(0), point_sources, join="outer", fill_value=0)
-
-for variable in temp.data_vars:
-    if variable not in merged.data_vars:
-        merged[variable] = temp[variable]
-    else:
-        merged[variable] += temp[variable]
-
-del temp  # Save memory
-merged = clip_region(merged, inventory.border_mask)
+merged = merge_point_sources(dataset, point_sources, inventory)
 
 # %%
 _show_variable_sums(merged)
@@ -0,0 +1,284 @@
+"""
+Compressed representation of the cells within a border
+
+Emissions inventories are clipped to a border (see :func:`spaemis.utils.clip_region`)
+so any cells outside the border are nan. For irregular regions, such as Australia,
+a large fraction of the rectangular lat/lon grid is outside the border.
+
+A :class:`CellMask` stores the position of the cells inside the border so that
+data can be compressed into a 1-D vector of valid cells. Calculations and storage
+then only need to consider the valid cells. The vector can be expanded back onto
+the rectangular grid with nans outside of the border.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, cast
+
+import geopandas  # type: ignore
+import numpy as np
+import xarray as xr
+from attrs import define
+from numpy.typing import ArrayLike, NDArray
+
+from spaemis.utils import clip_region
+
+logger = logging.getLogger(__name__)
+
+CELL_DIM = "cell"
+
+
+def _get_non_spatial_coords(
+    da: xr.DataArray, spatial_dims: tuple[str, ...]
+) -> dict[Any, xr.DataArray]:
+    return {
+        name: coord
+        for name, coord in da.coords.items()
+        if name not in spatial_dims and not set(coord.dims) & set(spatial_dims)
+    }
+
+
+@define(frozen=True, eq=False)
+class CellMask:
+    """
+    Index of the valid cells on a rectangular lat/lon grid
+
+    Use :meth:`from_border` to create a mask for a given border.
+    """
+
+    lat: NDArray[np.float_]
+    """Latitude of the grid"""
+
+    lon: NDArray[np.float_]
+    """Longitude of the grid"""
+
+    index: NDArray[np.intp]
+    """Sorted flat (row-major) index of each valid cell on the (lat, lon) grid"""
+
+    @classmethod
+    def from_border(
+        cls,
+        lat: ArrayLike,
+        lon: ArrayLike,
+        border: geopandas.GeoDataFrame,
+        valid: NDArray[np.bool_] | None = None,
+    ) -> CellMask:
+        """
+        Create a mask from a border
+
+        The cells within the border are identified using the same rules as
+        :func:`spaemis.utils.clip_region`.
+
+        Parameters
+        ----------
+        lat
+            Latitude of the grid
+        lon
+            Longitude of the grid
+        border
+            Border of the region of interest
+        valid
+            Any additional cells that should be treated as valid
+
+            Must have the dimensions (lat, lon)
+
+        Returns
+        -------
+            Mask of the cells within the border
+        """
+        lat = np.asarray(lat)
+        lon = np.asarray(lon)
+        ones = xr.DataArray(
+            np.ones((len(lat), len(lon))),
+            coords={"lat": lat, "lon": lon},
+            dims=("lat", "lon"),
+        )
+        # clip_region also crops the grid to the bounds of the border
+        clipped = clip_region(ones, border).reindex(lat=lat, lon=lon)
+
+        mask = clipped.notnull().values
+        if valid is not None:
+            mask |= valid
+
+        return cls(lat=lat, lon=lon, index=np.flatnonzero(mask))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """
+        Shape of the (lat, lon) grid
+        """
+        return len(self.lat), len(self.lon)
+
+    @property
+    def size(self) -> int:
+        """
+        Number of valid cells
+        """
+        return len(self.index)
+
+    @property
+    def mask(self) -> NDArray[np.bool_]:
+        """
+        Boolean grid which is True for the valid cells
+        """
+        mask = np.zeros(self.shape, dtype=bool)
+        mask.reshape(-1)[self.index] = True
+        return mask
+
+    @property
+    def cell_lat(self) -> NDArray[np.float_]:
+        """
+        Latitude of each valid cell
+        """
+        return cast(NDArray[np.float_], self.lat[self.index // len(self.lon)])
+
+    @property
+    def cell_lon(self) -> NDArray[np.float_]:
+        """
+        Longitude of each valid cell
+        """
+        return cast(NDArray[np.float_], self.lon[self.index % len(self.lon)])
+
+    def matches(self, lat: ArrayLike, lon: ArrayLike) -> bool:
+        """
+        Check if a grid is the same as the grid of the mask
+
+        Parameters
+        ----------
+        lat
+            Latitude of the grid
+        lon
+            Longitude of the grid
+
+        Returns
+        -------
+            True if the grids are identical
+        """
+        return bool(
+            np.array_equal(np.asarray(lat), self.lat)
+            and np.array_equal(np.asarray(lon), self.lon)
+        )
+
+    def compress(self, values: NDArray[Any]) -> NDArray[Any]:
+        """
+        Select the valid cells
+
+        A warning is logged if any emissions outside of the valid cells are dropped
+
+        Parameters
+        ----------
+        values
+            Array where the last two dimensions are (lat, lon)
+
+        Raises
+        ------
+        ValueError
+            ``values`` doesn't match the grid of the mask
+
+        Returns
+        -------
+            Array where the last dimension is the valid cells
+        """
+        values = np.asarray(values)
+        if values.shape[-2:] != self.shape:
+            raise ValueError(f"Expected grid of {self.shape}, got {values.shape[-2:]}")
+
+        flat = values.reshape(*values.shape[:-2], -1)
+
+        if self.size != flat.shape[-1]:
+            dropped = np.nansum(np.abs(np.delete(flat, self.index, axis=-1)))
+            if dropped:
+                logger.warning(
+                    f"Dropping {dropped} from {flat.shape[-1] - self.size} cells "
+                    "outside of the border"
+                )
+
+        return flat[..., self.index]
+
+    def expand(self, values: NDArray[Any], fill_value: float = np.nan) -> NDArray[Any]:
+        """
+        Expand the valid cells onto the (lat, lon) grid
+
+        Parameters
+        ----------
+        values
+            Array where the last dimension is the valid cells
+        fill_value
+            Value used for cells that aren't valid
+
+        Raises
+        ------
+        ValueError
+            ``values`` doesn't have the expected number of cells
+
+        Returns
+        -------
+            Array where the last two dimensions are (lat, lon)
+        """
+        values = np.asarray(values)
+        if values.shape[-1] != self.size:
+            raise ValueError(f"Expected {self.size} cells, got {values.shape[-1]}")
+
+        # Integer values are promoted so that the cells can be filled with nan
+        dtype: np.dtype[Any] = (
+            values.dtype
+            if np.issubdtype(values.dtype, np.floating)
+            else np.dtype(np.float64)
+        )
+        flat = np.full(
+            (*values.shape[:-1], self.shape[0] * self.shape[1]), fill_value, dtype=dtype
+        )
+        flat[..., self.index] = values
+        return flat.reshape(*values.shape[:-1], *self.shape)
+
+    def compress_dataarray(self, da: xr.DataArray) -> xr.DataArray:
+        """
+        Select the valid cells of a DataArray
+
+        Parameters
+        ----------
+        da
+            DataArray with lat and lon dimensions on the grid of the mask
+
+        Returns
+        -------
+            DataArray where the lat and lon dimensions are replaced with a ``cell``
+            dimension
+        """
+        other_dims = [dim for dim in da.dims if dim not in ("lat", "lon")]
+        da = da.transpose(*other_dims, "lat", "lon")
+
+        return xr.DataArray(
+            self.compress(da.values),
+            coords=_get_non_spatial_coords(da, ("lat", "lon")),
+            dims=(*other_dims, CELL_DIM),
+            attrs=da.attrs,
+        )
+
+    def expand_dataarray(self, da: xr.DataArray) -> xr.DataArray:
+        """
+        Expand a DataArray of valid cells onto the (lat, lon) grid
+
+        Parameters
+        ----------
+        da
+            DataArray with a ``cell`` dimension
+
+        Returns
+        -------
+            DataArray where the ``cell`` dimension is replaced with lat and lon
+            dimensions. Cells which aren't valid are nan.
+        """
+        other_dims = [dim for dim in da.dims if dim != CELL_DIM]
+        da = da.transpose(*other_dims, CELL_DIM)
+
+        return xr.DataArray(
+            self.expand(da.values),
+            coords={
+                **_get_non_spatial_coords(da, (CELL_DIM,)),
+                "lat": self.lat,
+                "lon": self.lon,
+            },
+            dims=(*other_dims, "lat", "lon"),
+            attrs=da.attrs,
+        )
@@ -0,0 +1,242 @@
+"""
+Checkpointing of long running projections
+
+A run directory holds the projections calculated so far along with a log of the
+(variable, sector, year) slices which have been completely written. If a run is
+interrupted, rerunning the same configuration with the same run directory only
+calculates the slices which are missing from the log.
+
+Each completed slice is recorded along with a fingerprint of its inputs (see
+:mod:`spaemis.fingerprint`). A slice is only reused if its fingerprint is unchanged
+so that editing a single scaler only recalculates the affected slices.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+import xarray as xr
+from attrs import define
+from numpy.typing import DTypeLike
+
+from spaemis.output import NetCDFOutput, OutputCoords
+
+logger = logging.getLogger(__name__)
+
+SliceKey = tuple[str, str, int]
+
+
+@define
+class RunCheckpoint:
+    """
+    Tracks the slices of a projection which have been completed
+
+    Slices are only marked as complete after they have been written to the output
+    file. Slices which were written, but not marked before an interruption are
+    recalculated.
+    """
+
+    run_dir: str
+    """Directory containing the checkpoint state"""
+
+    resume: bool = True
+    """
+    If True, previously completed slices are reused
+
+    Otherwise any existing state in ``run_dir`` is discarded
+    """
+
+    dtype: DTypeLike = np.float64
+    """dtype of the stored projections"""
+
+    @property
+    def log_path(self) -> str:
+        """
+        Path of the log of completed slices
+        """
+        return os.path.join(self.run_dir, "completed.jsonl")
+
+    @property
+    def output_path(self) -> str:
+        """
+        Path of the netCDF file containing the projections
+        """
+        return os.path.join(self.run_dir, "projections.nc")
+
+    def completed(self) -> dict[SliceKey, str | None]:
+        """
+        Get the slices which have been completed
+
+        Returns
+        -------
+            Fingerprint of each completed (variable, sector, year) slice
+
+            The fingerprint is None if it wasn't recorded. If a slice has been
+            completed multiple times, the latest fingerprint is used.
+        """
+        if not os.path.exists(self.log_path):
+            return {}
+
+        completed = {}
+        with open(self.log_path) as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A partially written record from an interrupted run
+                    logger.warning(f"Ignoring malformed checkpoint record: {line!r}")
+                    continue
+                key = (record["variable"], record["sector"], int(record["year"]))
+                completed[key] = record.get("fingerprint")
+        return completed
+
+    def mark_complete(
+        self,
+        variable: str,
+        sector: str,
+        years: Iterable[int],
+        fingerprints: Mapping[int, str] | None = None,
+    ) -> None:
+        """
+        Record that a slice has been written to the output
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years which were written
+        fingerprints
+            Fingerprint of the inputs used for each year
+        """
+        os.makedirs(self.run_dir, exist_ok=True)
+        with open(self.log_path, "a") as fh:
+            for year in years:
+                record = {
+                    "variable": variable,
+                    "sector": sector,
+                    "year": int(year),
+                    "fingerprint": (fingerprints or {}).get(year),
+                }
+                fh.write(json.dumps(record) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def reset(self) -> None:
+        """
+        Discard any completed slices
+        """
+        for path in (self.log_path, self.output_path, self.previous_output_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def previous_output_path(self) -> str:
+        """
+        Path of the output from a previous run while its slices are carried over
+        """
+        return os.path.join(self.run_dir, "projections.previous.nc")
+
+    def create_output(self, coords: OutputCoords) -> NetCDFOutput:
+        """
+        Create the output for the run
+
+        The existing output file is reused if resuming and it was declared with the
+        same coordinates. If the coordinates have changed, a new output file is
+        created and any completed slices which are still required are copied
+        across from the existing file. If the existing output file is missing or
+        can't be read, the completed slices are discarded.
+
+        Parameters
+        ----------
+        coords
+            Variables, sectors, years and spatial coordinates of the output
+
+        Returns
+        -------
+            Declared output
+        """
+        os.makedirs(self.run_dir, exist_ok=True)
+        output = NetCDFOutput(self.output_path, dtype=self.dtype, append=True)
+
+        if not self.resume:
+            self.reset()
+        elif not self._can_open_output():
+            # Completed slices can't be reused without their values
+            if self.completed():
+                logger.warning(
+                    f"Could not read existing output file {self.output_path}. "
+                    "Recalculating all slices"
+                )
+            self.reset()
+        elif not output.matches(coords):
+            logger.info("Output coordinates have changed. Carrying over slices")
+            completed = self.completed()
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            shutil.move(self.output_path, self.previous_output_path)
+
+            output.declare(coords)
+            self._carry_over(output, completed)
+            os.remove(self.previous_output_path)
+            return output
+
+        output.declare(coords)
+        return output
+
+    def _can_open_output(self) -> bool:
+        if not os.path.exists(self.output_path):
+            return False
+
+        try:
+            with xr.open_dataset(self.output_path):
+                return True
+        except (OSError, ValueError):
+            return False
+
+    def _carry_over(
+        self, output: NetCDFOutput, completed: dict[SliceKey, str | None]
+    ) -> None:
+        try:
+            previous = xr.open_dataset(self.previous_output_path)
+        except (OSError, ValueError):
+            logger.warning(
+                f"Could not read previous output file {self.previous_output_path}. "
+                "Recalculating all slices",
+                exc_info=True,
+            )
+            return
+
+        coords = output.coords
+        with previous:
+            if not (
+                np.array_equal(previous["lat"], coords.lat)
+                and np.array_equal(previous["lon"], coords.lon)
+            ):
+                return
+
+            for (variable, sector, year), fingerprint in completed.items():
+                if (
+                    variable not in coords.variables
+                    or sector not in coords.sectors
+                    or year not in coords.years
+                    or variable not in previous.data_vars
+                ):
+                    continue
+                try:
+                    values = previous[variable].sel(sector=sector, year=[year]).values
+                    output.write_slice(variable, sector, [year], values)
+                except (KeyError, ValueError):
+                    continue
+                self.mark_complete(
+                    variable,
+                    sector,
+                    [year],
+                    {year: fingerprint} if fingerprint else None,
+                )
@@ -4,6 +4,8 @@ CLI commands
 from .base import cli
 from .generate_command import run_generate_command  # noqa
 from .gse_emis_command import run_gse_command  # noqa
+from .ingest_command import run_ingest_command  # noqa
 from .point_source_command import run_point_source_command  # noqa
+from .run_command import run_run_command  # noqa
 
 __all__ = ["cli"]
@@ -0,0 +1,77 @@
+"""
+ingest CLI command
+"""
+from __future__ import annotations
+
+import logging
+
+import click
+
+from spaemis.commands.base import cli
+from spaemis.config import get_ingest_dir
+from spaemis.input_data import get_database
+
+logger = logging.getLogger(__name__)
+
+
+@cli.command(name="ingest")
+@click.option(
+    "--path",
+    "paths",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Additional input4MIPs directory to ingest. Can be repeated",
+)
+@click.option(
+    "--variable-id",
+    "variable_ids",
+    multiple=True,
+    help="Only ingest these variables. Can be repeated",
+)
+@click.option(
+    "--source-id",
+    "source_ids",
+    multiple=True,
+    help="Only ingest these sources. Can be repeated",
+)
+@click.option("--force", is_flag=True, help="Recreate stores which are up to date")
+def run_ingest_command(
+    paths: tuple[str, ...],
+    variable_ids: tuple[str, ...],
+    source_ids: tuple[str, ...],
+    force: bool,
+) -> None:
+    """
+    Convert input4MIPs data to Zarr stores of annual means
+
+    A store is created for each variable and source in the input4MIPs directories
+    from the ``SPAEMIS_INPUT_PATHS`` environment variable and any ``--path``
+    options. The stores are written to ``data/processed/input4MIPs`` unless the
+    ``SPAEMIS_INGEST_DIR`` environment variable is set and are used instead of the
+    original files by subsequent runs.
+    """
+    database = get_database()
+    for path in paths:
+        database.register_path(path)
+
+    available = database.available_data
+    if variable_ids:
+        available = available[available["variable_id"].isin(variable_ids)]
+    if source_ids:
+        available = available[available["source_id"].isin(source_ids)]
+
+    options = (
+        available[["variable_id", "source_id"]]
+        .drop_duplicates()
+        .sort_values(["variable_id", "source_id"])
+    )
+    if options.empty:
+        raise click.ClickException("No matching input4MIPs data found")
+
+    num_written = 0
+    for variable_id, source_id in options.itertuples(index=False):
+        num_written += database.ingest(variable_id, source_id, force=force)
+
+    click.echo(
+        f"Ingested {num_written} of {len(options)} sources into {get_ingest_dir()}"
+    )
@@ -0,0 +1,214 @@
+"""
+run CLI command
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import shutil
+from collections.abc import Generator
+from contextlib import contextmanager
+
+import click
+import xarray as xr
+
+from spaemis.checkpoint import RunCheckpoint
+from spaemis.commands.base import cli
+from spaemis.config import (
+    DownscalingScenarioConfig,
+    get_default_results_dir,
+    get_default_run_dir,
+    get_path,
+    load_config,
+)
+from spaemis.constants import OUTPUT_VERSION, RAW_DATA_DIR
+from spaemis.input_data import load_timeseries
+from spaemis.inventory import load_inventory, write_inventory_csvs
+from spaemis.output import BaseOutput, InMemoryOutput, NetCDFOutput, ZarrOutput
+from spaemis.parallel import ExecutorKind
+from spaemis.project import (
+    calculate_point_sources,
+    calculate_projections,
+    merge_point_sources,
+)
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("memory", "netcdf", "zarr")
+
+
+def _copy_inputs(config: DownscalingScenarioConfig, input_dir: str) -> str:
+    # Copy the input timeseries alongside the results so that the run can be
+    # reproduced
+    output_dir = get_path(input_dir)
+
+    for timeseries in config.input_timeseries or []:
+        output_file_path = os.path.join(output_dir, timeseries.path)
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        shutil.copy(os.path.join(RAW_DATA_DIR, timeseries.path), output_file_path)
+
+    return output_dir
+
+
+def _create_output(output_format: str, output_dir: str) -> BaseOutput:
+    if output_format == "netcdf":
+        return NetCDFOutput(os.path.join(output_dir, "projections_unmerged.nc"))
+    elif output_format == "zarr":
+        return ZarrOutput(os.path.join(output_dir, "projections_unmerged.zarr"))
+    return InMemoryOutput()
+
+
+@contextmanager
+def _profile(
+    enabled: bool, output_path: str, num_lines: int = 30
+) -> Generator[None, None, None]:
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_path)
+
+        buff = io.StringIO()
+        pstats.Stats(profiler, stream=buff).sort_stats("cumulative").print_stats(
+            num_lines
+        )
+        logger.info(f"Profile written to {output_path}\n{buff.getvalue()}")
+
+
+def _write_results(
+    merged: xr.Dataset, config: DownscalingScenarioConfig, output_dir: str
+) -> None:
+    logger.info("Writing output dataset as netcdf")
+    merged.to_netcdf(
+        os.path.join(
+            output_dir, f"{OUTPUT_VERSION}_{config.inventory.name}_projections.nc"
+        )
+    )
+
+    logger.info("Writing CSV files")
+    for year in config.timeslices:
+        target_dir = os.path.join(output_dir, str(year))
+        os.makedirs(target_dir, exist_ok=True)
+
+        write_inventory_csvs(merged.sel(year=year), target_dir)
+
+
+@cli.command(name="run")
+@click.option(
+    "-c",
+    "--config",
+    "config_path",
+    help="Scenario configuration file",
+    type=click.Path(exists=True, dir_okay=False),
+    required=True,
+)
+@click.option("--force", is_flag=True, help="Overwrite the results from a previous run")
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of workers used to calculate the projections",
+)
+@click.option(
+    "--executor",
+    type=click.Choice(["thread", "process"]),
+    default="process",
+    show_default=True,
+    help="Type of worker pool used if more than one worker is requested",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(OUTPUT_FORMATS),
+    default=None,
+    help=(
+        "Where the projections are stored as they are calculated  [default: memory]. "
+        "Can't be combined with --resume"
+    ),
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help=(
+        "Reuse any slices completed by a previous run with the same inputs. "
+        "The projections are stored as netcdf in the run directory"
+    ),
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Profile the run and write the statistics to the results directory",
+)
+def run_run_command(  # noqa: PLR0913
+    config_path: str,
+    force: bool,
+    workers: int,
+    executor: ExecutorKind,
+    output_format: str | None,
+    resume: bool,
+    profile: bool,
+) -> None:
+    """
+    Calculate the projections for a scenario
+
+    The projected emissions and any point sources are merged and written to
+    ``data/runs/{OUTPUT_VERSION}/{CONFIG_FILE_NAME}`` as a netCDF file and a set of
+    CSV files for each timeslice.
+    """
+    if resume and output_format is not None:
+        raise click.UsageError(
+            "--output-format can't be used with --resume which stores the "
+            "projections as netcdf in the run directory"
+        )
+
+    config_path = os.path.abspath(config_path)
+    results_dir = get_default_results_dir(config_path)
+    outputs_path = os.path.join(results_dir, "outputs")
+    if os.path.exists(outputs_path) and not (force or resume):
+        raise click.ClickException(
+            f"Results already exist in {results_dir}. Use --force to overwrite"
+        )
+
+    config = load_config(config_path)
+    output_dir = get_path(results_dir, f"outputs/{config.inventory.name}")
+
+    with _profile(profile, os.path.join(results_dir, "profile.prof")):
+        inventory = load_inventory(config.inventory.name, config.inventory.year)
+        timeseries = load_timeseries(
+            config.input_timeseries or [],
+            _copy_inputs(config, os.path.join(results_dir, "inputs")),
+        )
+
+        # A resumed run stores the projections in the checkpoint's run directory
+        dataset = calculate_projections(
+            config,
+            inventory,
+            timeseries,
+            executor=executor,
+            workers=workers,
+            output=(
+                None
+                if resume
+                else _create_output(output_format or "memory", output_dir)
+            ),
+            checkpoint=(
+                RunCheckpoint(get_default_run_dir(config_path)) if resume else None
+            ),
+        )
+
+        merged = merge_point_sources(
+            dataset, calculate_point_sources(config, inventory), inventory
+        )
+        _write_results(merged, config, output_dir)
+        dataset.close()
+
+    click.echo(f"Results written to {output_dir}")
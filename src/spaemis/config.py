@@ -15,13 +15,21 @@ import pandas as pd
 from attrs import define, field
 from cattrs.preconf.pyyaml import make_converter
 
-from spaemis.constants import RUNS_DIR
+from spaemis.constants import CACHE_DIR, INGEST_DIR, RUNS_DIR
 from spaemis.utils import chdir
 
 converter = make_converter()
 converter.register_unstructure_hook(str, lambda u: str(u))
 
 
+RegridMethod = Literal["bilinear", "conservative"]
+"""
+Method used to regrid fields onto the inventory grid
+
+See :mod:`spaemis.regrid`
+"""
+
+
 @define
 class ExcludeScaleMethod:
     """
@@ -63,6 +71,7 @@ class RelativeChangeMethod:
     source_id: str
     variable_id: str
     sector: str
+    regrid: RegridMethod = "bilinear"
 
     name: ClassVar[Literal["relative_change"]] = "relative_change"
 
@@ -81,6 +90,7 @@ class ProxyMethod:
     variable_id: str
     sector: str
     proxy: str
+    regrid: RegridMethod = "bilinear"
 
     name: ClassVar[Literal["proxy"]] = "proxy"
 
@@ -185,7 +195,13 @@ def _convert_filename_to_scalers(
             sector_info = {}
             for key, value in data_item.copy().items():
                 if key.startswith("scaler_"):
-                    sector_info[key[7:]] = value
+                    # Blank cells are used for options which don't apply to a row
+                    # so the scaler defaults are used instead
+                    blank = pd.isna(value) or (
+                        isinstance(value, str) and not value.strip()
+                    )
+                    if not blank:
+                        sector_info[key[7:]] = value
                     data_item.pop(key)
             return {**data_item, "method": sector_info}
 
@@ -366,3 +382,60 @@ def get_default_results_dir(config_path: str) -> str:
 
     config_file_name = os.path.splitext(os.path.basename(config_path))[0]
     return os.path.join(RUNS_DIR, config_file_name)
+
+
+def get_default_run_dir(config_path: str) -> str:
+    """
+    Get the default directory used to checkpoint a run of a configuration file
+
+    The run directory sits next to the results from :func:`get_default_results_dir`
+    at ``data/runs/{OUTPUT_VERSION}/{CONFIG_FILE_NAME}/run``. This function
+    does not create that directory if it doesn't already exist.
+
+    Parameters
+    ----------
+    config_path
+
+    Returns
+    -------
+    Directory for checkpoint state
+    """
+    return os.path.join(get_default_results_dir(config_path), "run")
+
+
+def get_cache_dir(name: str | None = None) -> str:
+    """
+    Get the directory used to cache intermediate data
+
+    Defaults to ``data/cache``, but can be overridden using the ``SPAEMIS_CACHE_DIR``
+    environment variable. This function does not create the directory if it doesn't
+    already exist.
+
+    Parameters
+    ----------
+    name
+        Name of a specific cache within the cache directory
+
+    Returns
+    -------
+    Cache directory
+    """
+    cache_dir = os.environ.get("SPAEMIS_CACHE_DIR") or CACHE_DIR
+
+    if name:
+        cache_dir = os.path.join(cache_dir, name)
+    return cache_dir
+
+
+def get_ingest_dir() -> str:
+    """
+    Get the directory containing the ingested input4MIPs stores
+
+    Defaults to ``data/processed/input4MIPs``, but can be overridden using the
+    ``SPAEMIS_INGEST_DIR`` environment variable.
+
+    Returns
+    -------
+    Ingest directory
+    """
+    return os.environ.get("SPAEMIS_INGEST_DIR") or INGEST_DIR
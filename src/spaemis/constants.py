@@ -17,6 +17,14 @@ PROCESSED_DATA_DIR = os.path.join(
 
 RUNS_DIR = os.path.join(DATA_DIR, "runs", OUTPUT_VERSION)
 
+# Default location for caches of intermediate data
+# Can be overridden using the `SPAEMIS_CACHE_DIR` environment variable
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
+# Default location for input4MIPs data converted using `spaemis ingest`
+# Can be overridden using the `SPAEMIS_INGEST_DIR` environment variable
+INGEST_DIR = os.path.join(PROCESSED_DATA_DIR, "input4MIPs")
+
 # Define the root variables that we support in this tool
 # Any variables should be renamed to these names
 
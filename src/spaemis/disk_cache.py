@@ -0,0 +1,262 @@
+"""
+Size-bounded on-disk cache of intermediate results
+
+Expensive intermediate results, such as the annual mean input4MIPs sources, are
+deterministic given their inputs. A :class:`DiskCache` stores these results in a
+directory within the cache directory (see :func:`spaemis.config.get_cache_dir`)
+so that they can be reused by later runs and by other processes.
+
+Entries are identified by a key which is a hash of all the inputs (see
+:func:`make_key`). The total size of each cache is bounded. Once the bound is
+exceeded, the least recently used entries are removed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections.abc import Callable
+from typing import Any
+
+import xarray as xr
+
+from spaemis.config import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+# Name used by xarray when storing an unnamed DataArray
+_UNNAMED = "__xarray_dataarray_variable__"
+
+
+def get_default_max_bytes() -> int:
+    """
+    Get the default maximum size of each on-disk cache
+
+    Uses the ``SPAEMIS_DISK_CACHE_MAX_BYTES`` environment variable if set. A value
+    of 0 disables caching.
+
+    Returns
+    -------
+        Maximum size in bytes
+    """
+    return int(os.environ.get("SPAEMIS_DISK_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES)
+
+
+def make_key(*items: Any) -> str:
+    """
+    Create a cache key from a set of inputs
+
+    Parameters
+    ----------
+    items
+        JSON serialisable inputs. Any other values are converted to strings
+
+    Returns
+    -------
+        Hex digest of the inputs
+    """
+    return hashlib.sha256(
+        json.dumps(items, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class DiskCache:
+    """
+    Directory of cached files with least recently used eviction
+
+    Each entry is stored as a single file. Entries are written to a temporary file
+    and then renamed so that concurrent readers never see a partially written
+    entry. The modification time of an entry is updated whenever it is used.
+    """
+
+    def __init__(self, name: str, max_bytes: int | None = None):
+        self.name = name
+        self._max_bytes = max_bytes
+
+    @property
+    def directory(self) -> str:
+        """
+        Directory containing the cached entries
+        """
+        return get_cache_dir(self.name)
+
+    @property
+    def max_bytes(self) -> int:
+        """
+        Maximum total size of the cached entries
+
+        Defaults to :func:`get_default_max_bytes`
+        """
+        if self._max_bytes is None:
+            return get_default_max_bytes()
+        return self._max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        """
+        If False, nothing is stored in the cache
+        """
+        return self.max_bytes > 0
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key: str, suffix: str) -> str | None:
+        """
+        Get the path of a cached entry
+
+        Parameters
+        ----------
+        key
+            Cache key
+        suffix
+            File extension of the entry
+
+        Returns
+        -------
+            Path to the entry or None if the entry isn't cached
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(key, suffix)
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, suffix: str, write: Callable[[str], None]) -> str | None:
+        """
+        Add an entry to the cache
+
+        Parameters
+        ----------
+        key
+            Cache key
+        suffix
+            File extension of the entry
+        write
+            Function which writes the entry to the given path
+
+        Returns
+        -------
+            Path to the entry or None if the entry could not be stored
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(key, suffix)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                suffix=suffix, prefix=".tmp-", dir=self.directory
+            )
+            os.close(fd)
+            try:
+                write(tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except OSError:
+            logger.warning(f"Could not write {key} to the {self.name} cache")
+            return None
+
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries
+
+        Entries are removed until the cache fits within :attr:`max_bytes`
+        """
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.startswith(".tmp-")
+            ]
+        except OSError:
+            return
+
+        sizes = {}
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            sizes[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+        total = sum(size for _, size in sizes.values())
+        for path, (_, size) in sorted(sizes.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            logger.debug(f"Evicted {path} from the {self.name} cache")
+            total -= size
+
+    def clear(self) -> None:
+        """
+        Remove all the cached entries
+        """
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_file():
+                os.remove(entry.path)
+
+    def get_dataarray(self, key: str) -> xr.DataArray | None:
+        """
+        Load a cached DataArray
+
+        Parameters
+        ----------
+        key
+            Cache key
+
+        Returns
+        -------
+            Cached DataArray loaded into memory or None if it isn't cached
+        """
+        path = self.get(key, ".nc")
+        if path is None:
+            return None
+        try:
+            with xr.open_dataset(path) as ds:
+                (name,) = ds.data_vars
+                da = ds[name].load()
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable entry {path}")
+            return None
+
+        if name == _UNNAMED:
+            da.name = None
+        return da
+
+    def put_dataarray(self, key: str, da: xr.DataArray) -> None:
+        """
+        Store a DataArray in the cache as a compressed netCDF file
+
+        Parameters
+        ----------
+        key
+            Cache key
+        da
+            DataArray to store
+        """
+        name = da.name if da.name is not None else _UNNAMED
+        encoding = {name: {"zlib": True, "complevel": 1}}
+
+        self.put(key, ".nc", lambda path: da.to_netcdf(path, encoding=encoding))
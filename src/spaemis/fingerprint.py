@@ -0,0 +1,148 @@
+"""
+Fingerprints of the inputs used to calculate a slice of a projection
+
+A fingerprint is a hash of everything which can change the result of a
+(variable, sector, year) slice:
+
+* the scaler configuration
+* the identity (path, modification time and size) of any input4MIPs, proxy
+  and point source files
+* the content of any timeseries used by the scaler
+* the content of the emissions inventory
+* the target year
+
+Slices calculated by a previous run can be reused if their fingerprint is
+unchanged.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import scmdata
+import xarray as xr
+
+import spaemis
+from spaemis.config import VariableScalerConfig, converter
+from spaemis.disk_cache import make_key
+from spaemis.input_data import get_database
+from spaemis.inventory import EmissionsInventory
+from spaemis.scaling import get_scaler_by_config
+from spaemis.scaling.point_source import get_point_source_path
+from spaemis.scaling.proxy import get_proxy_files
+from spaemis.utils import get_file_identity
+
+
+def _hash_array(hasher: Any, values: xr.DataArray) -> None:
+    hasher.update(str(values.dims).encode())
+    hasher.update(np.ascontiguousarray(values.values).tobytes())
+
+
+def _get_file_identity(fname: str) -> tuple[str, int, int] | None:
+    try:
+        return get_file_identity(fname)
+    except FileNotFoundError:
+        # The scaler reports the missing file when it is run
+        return None
+
+
+def hash_inventory(inventory: EmissionsInventory) -> str:
+    """
+    Hash the content of an emissions inventory
+
+    Parameters
+    ----------
+    inventory
+        Emissions inventory
+
+    Returns
+    -------
+        Hex digest of the year, coordinates and values of the inventory
+    """
+    hasher = hashlib.blake2b(str(inventory.year).encode())
+    for name in sorted(map(str, inventory.data.variables)):
+        hasher.update(name.encode())
+        _hash_array(hasher, inventory.data[name])
+    return hasher.hexdigest()
+
+
+def hash_timeseries(timeseries: scmdata.ScmRun) -> str:
+    """
+    Hash the content of a timeseries
+
+    Parameters
+    ----------
+    timeseries
+        Timeseries
+
+    Returns
+    -------
+        Hex digest of the metadata and values of the timeseries
+    """
+    values = timeseries.timeseries().sort_index().reset_index()
+    hashed = pd.util.hash_pandas_object(values, index=False)
+    return hashlib.blake2b(hashed.to_numpy().tobytes()).hexdigest()
+
+
+def get_slice_fingerprints(
+    variable_config: VariableScalerConfig,
+    years: Iterable[int],
+    inventory_hash: str,
+    timeseries_hashes: dict[str, str],
+) -> dict[int, str]:
+    """
+    Get the fingerprint of each year of a slice
+
+    Parameters
+    ----------
+    variable_config
+        Configuration of the slice
+    years
+        Target years
+    inventory_hash
+        Hash of the emissions inventory from :func:`hash_inventory`
+    timeseries_hashes
+        Hash of each of the input timeseries from :func:`hash_timeseries`
+
+    Returns
+    -------
+        Fingerprint for each of the target years
+    """
+    source_files = []
+    source_key = get_scaler_by_config(variable_config.method).source_key
+    if source_key is not None:
+        source_files = [
+            get_file_identity(fname)
+            for fname in get_database().find_files(
+                source_key.variable_id, source_key.source_id
+            )
+        ]
+
+    method = variable_config.method
+    input_files = [
+        fname
+        for proxy_name in (
+            getattr(method, "proxy", None),
+            getattr(method, "proxy_region", None),
+        )
+        if proxy_name
+        for fname in get_proxy_files(proxy_name)
+    ]
+    point_sources = getattr(method, "point_sources", None)
+    if point_sources:
+        input_files.append(get_point_source_path(point_sources))
+
+    source_timeseries = getattr(method, "source_timeseries", None)
+
+    base = make_key(
+        spaemis.__version__,
+        converter.unstructure(variable_config),
+        source_files,
+        [_get_file_identity(fname) for fname in input_files],
+        timeseries_hashes.get(source_timeseries) if source_timeseries else None,
+        inventory_hash,
+    )
+    return {year: make_key(base, year) for year in years}
@@ -0,0 +1,191 @@
+"""
+Conversion of input4MIPs data to Zarr stores
+
+The input4MIPs netCDF files are chunked for reading global monthly fields, whereas
+the scalers read a single sector over a small region for a handful of years. The
+files for each (variable_id, source_id) can be converted to a consolidated Zarr
+store of annual means which is chunked by (year, sector, lat, lon) using
+``spaemis ingest``.
+
+:meth:`spaemis.input_data.InputEmissionsDatabase.load_annual_mean` reads from the
+ingested store when it exists and was created from the current set of files.
+
+Requires the optional ``zarr`` package (``pip install spaemis[zarr]``).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+import xarray as xr
+
+from spaemis.config import get_ingest_dir
+from spaemis.utils import get_file_identity
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKS = {"year": 1, "sector": 1, "lat": 90, "lon": 90}
+
+
+def get_store_path(variable_id: str, source_id: str) -> str:
+    """
+    Get the location of the ingested store for a variable and source
+
+    Parameters
+    ----------
+    variable_id
+        Variable identifier
+    source_id
+        Source identifier
+
+    Returns
+    -------
+        Path to the Zarr store within :func:`spaemis.config.get_ingest_dir`
+    """
+    return os.path.join(get_ingest_dir(), variable_id, f"{source_id}.zarr")
+
+
+def get_source_files_identity(files: Iterable[str]) -> str:
+    """
+    Get the identity of the files used to create a store
+
+    Parameters
+    ----------
+    files
+        Source files
+
+    Returns
+    -------
+        JSON encoded identity of each file (see
+        :func:`spaemis.utils.get_file_identity`)
+    """
+    return json.dumps([list(get_file_identity(fname)) for fname in sorted(files)])
+
+
+def _to_json_attrs(attrs: dict[Any, Any]) -> dict[str, Any]:
+    # Zarr attributes must be JSON serialisable
+    return {
+        str(key): value.item() if isinstance(value, np.generic) else value
+        for key, value in attrs.items()
+        if isinstance(value, str | int | float | np.generic)
+    }
+
+
+def write_annual_mean_store(
+    dataset: xr.Dataset,
+    variable_name: str,
+    path: str,
+    source_files: str,
+) -> None:
+    """
+    Write the annual mean of a monthly input4MIPs dataset to a Zarr store
+
+    The annual means are calculated one year at a time so only a single year of
+    monthly data is held in memory. The store is written to a temporary location
+    and then moved into place so a partially written store is never used.
+
+    Parameters
+    ----------
+    dataset
+        Monthly data with a time, sector, lat and lon dimensions
+    variable_name
+        Name of the variable in ``dataset`` to convert
+    path
+        Path of the Zarr store. Any existing store is replaced
+    source_files
+        Identity of the files used to create ``dataset`` from
+        :func:`get_source_files_identity`
+    """
+    import zarr
+
+    da = dataset[variable_name].transpose("time", "sector", "lat", "lon")
+    data_years = da["time"].dt.year.values
+    years = np.unique(data_years)
+
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    group = zarr.open_group(tmp_path, mode="w")
+    group.attrs["source_files"] = source_files
+    for name, values in (
+        ("year", years),
+        ("sector", da["sector"].values),
+        ("lat", da["lat"].values),
+        ("lon", da["lon"].values),
+    ):
+        array = group.create_dataset(name, data=values, fill_value=None)
+        array.attrs.update(_to_json_attrs(da[name].attrs) if name != "year" else {})
+        # Used by xarray to determine the dimensions
+        array.attrs["_ARRAY_DIMENSIONS"] = [name]
+
+    dims = ("year", "sector", "lat", "lon")
+    shape = (len(years), da.sizes["sector"], da.sizes["lat"], da.sizes["lon"])
+    array = group.create_dataset(
+        variable_name,
+        shape=shape,
+        chunks=tuple(min(DEFAULT_CHUNKS[dim], size) for dim, size in zip(dims, shape)),
+        dtype=da.dtype,
+        fill_value=np.nan,
+    )
+    array.attrs.update(_to_json_attrs(da.attrs))
+    array.attrs["_ARRAY_DIMENSIONS"] = list(dims)
+
+    for year_index, year in enumerate(years):
+        logger.debug(f"Writing annual mean for {year}")
+        array[year_index] = (
+            da.isel(time=np.flatnonzero(data_years == year)).mean(dim="time").values
+        )
+
+    zarr.consolidate_metadata(tmp_path)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def open_annual_mean_store(
+    variable_id: str, source_id: str, source_files: str
+) -> xr.Dataset | None:
+    """
+    Open an ingested store if it is up to date
+
+    Parameters
+    ----------
+    variable_id
+        Variable identifier
+    source_id
+        Source identifier
+    source_files
+        Identity of the current files for the variable and source from
+        :func:`get_source_files_identity`
+
+    Returns
+    -------
+        Lazily loaded annual means or None if there is no usable store
+
+        A warning is logged if the store was created from a different set of
+        files.
+    """
+    path = get_store_path(variable_id, source_id)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        ds: xr.Dataset = xr.open_zarr(path, consolidated=True, chunks=None)
+    except (ImportError, OSError, KeyError, ValueError):
+        logger.warning(f"Could not open ingested store {path}", exc_info=True)
+        return None
+
+    if ds.attrs.get("source_files") != source_files:
+        logger.warning(
+            f"Ingested store {path} is out of date. Rerun `spaemis ingest` to update"
+        )
+        ds.close()
+        return None
+    return ds
@@ -3,21 +3,39 @@ Searching and loading of a local input4MIPs data archive
 """
 from __future__ import annotations
 
+import json
 import logging
 import os
-from functools import lru_cache
-from glob import glob
-from os import PathLike
-from typing import Any
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any, cast
 
+import numpy as np
 import pandas as pd
 import scmdata
 import xarray as xr
+from attrs import define
+from numpy.typing import ArrayLike, NDArray
 
+import spaemis
 from spaemis.config import InputTimeseries
+from spaemis.disk_cache import DiskCache, make_key
+from spaemis.ingest import (
+    get_source_files_identity,
+    get_store_path,
+    open_annual_mean_store,
+    write_annual_mean_store,
+)
+from spaemis.input_index import InputIndex
+from spaemis.memory_cache import MemoryCache
+from spaemis.parallel import create_executor, get_num_io_threads
+from spaemis.utils import get_file_identity
 
 logger = logging.getLogger(__name__)
 
+# Parsed input timeseries
+timeseries_cache = DiskCache("timeseries")
+
 # The sector map used for the input4MIPs emissions data
 SECTOR_MAP = [
     "Agriculture",
@@ -33,16 +51,158 @@ SECTOR_MAP = [
 ]
 
 
+@define(frozen=True)
+class BoundingBox:
+    """
+    Rectangular region of interest in degrees
+
+    The longitude bounds may use any convention (for example -180 to 180 or 0 to
+    360) and ``lon_max`` may be larger than 180 to describe a region which crosses
+    the antimeridian.
+    """
+
+    lon_min: float
+    lat_min: float
+    lon_max: float
+    lat_max: float
+
+    @classmethod
+    def from_grid(cls, lat: Any, lon: Any, halo: float = 0.0) -> BoundingBox:
+        """
+        Create a bounding box which covers a grid
+
+        Parameters
+        ----------
+        lat
+            Latitudes of the grid
+        lon
+            Longitudes of the grid
+        halo
+            Additional margin in degrees added to each side of the grid
+
+        Returns
+        -------
+            Bounding box of the grid
+        """
+        lat = np.asarray(lat)
+        lon = np.asarray(lon)
+        return cls(
+            lon_min=float(lon.min()) - halo,
+            lat_min=max(float(lat.min()) - halo, -90.0),
+            lon_max=float(lon.max()) + halo,
+            lat_max=min(float(lat.max()) + halo, 90.0),
+        )
+
+    def union(self, other: BoundingBox) -> BoundingBox:
+        """
+        Get the smallest bounding box which contains both bounding boxes
+
+        Parameters
+        ----------
+        other
+            Bounding box using the same longitude convention
+
+        Returns
+        -------
+            Combined bounding box
+        """
+        return BoundingBox(
+            lon_min=min(self.lon_min, other.lon_min),
+            lat_min=min(self.lat_min, other.lat_min),
+            lon_max=max(self.lon_max, other.lon_max),
+            lat_max=max(self.lat_max, other.lat_max),
+        )
+
+    def select(self, ds: xr.Dataset) -> xr.Dataset:
+        """
+        Select the region of a dataset within the bounding box
+
+        The selection is performed using integer indexing so lazily loaded
+        datasets only read the data within the region. Longitudes are returned
+        using the convention of the bounding box and sorted in ascending order,
+        so a region which wraps around the edge of the dataset's longitudes is
+        returned as a single contiguous region.
+
+        Parameters
+        ----------
+        ds
+            Dataset with lat and lon dimensions
+
+        Returns
+        -------
+            Subset of ``ds``
+        """
+        lat = ds["lat"].values
+        lat_index = np.flatnonzero((lat >= self.lat_min) & (lat <= self.lat_max))
+
+        lon = ds["lon"].values
+        if self.lon_max - self.lon_min >= 360:  # noqa: PLR2004
+            return ds.isel(lat=lat_index)
+
+        # Shift each longitude into [lon_min, lon_min + 360)
+        shifted = (lon - self.lon_min) % 360 + self.lon_min
+        lon_index = np.flatnonzero(shifted <= self.lon_max)
+        lon_index = lon_index[np.argsort(shifted[lon_index], kind="stable")]
+
+        return ds.isel(lat=lat_index, lon=lon_index).assign_coords(
+            lon=("lon", shifted[lon_index], ds["lon"].attrs)
+        )
+
+
+def _get_neighbouring_years(available: ArrayLike, required: Iterable[int]) -> list[int]:
+    # Years needed to linearly interpolate (or extrapolate) the required years
+    available = np.unique(available)
+    if not len(available):
+        return []
+
+    res: set[int] = set()
+    for year in required:
+        before = available[available <= year]
+        after = available[available >= year]
+        if not len(before):
+            res.update(available[:2])
+        elif not len(after):
+            res.update(available[-2:])
+        else:
+            res.update((before[-1], after[0]))
+    return sorted(int(year) for year in res)
+
+
+def _filter_time_range(files: pd.DataFrame, years: list[int]) -> pd.Series[bool]:
+    # The start and end years of each file must be present in the data so the
+    # neighbouring years can be determined without opening any files
+    known = files["start_year"].notnull() & files["end_year"].notnull()
+    start = files["start_year"].where(known, np.nan)
+    end = files["end_year"].where(known, np.nan)
+
+    required = _get_neighbouring_years(
+        pd.concat([start[known], end[known]]).astype(int), years
+    )
+    contains_year = pd.Series(False, index=files.index)
+    for year in years:
+        contains_year |= (start <= year) & (end >= year)
+
+    return ~known | contains_year | start.isin(required) | end.isin(required)
+
+
 class InputEmissionsDatabase:
     """
     Database of Input4MIPs emissions data
+
+    The available files are tracked using a persistent :class:`InputIndex` so only
+    directories which have changed are scanned when a path is registered.
+
+    Loaded datasets are held in a :class:`~spaemis.memory_cache.MemoryCache` which
+    shares the budget set by the ``SPAEMIS_CACHE_MAX_BYTES`` environment variable
+    with the other in-process caches.
     """
 
-    def __init__(self, paths: str | list[str] | None = None):
-        self.available_data = pd.DataFrame(
-            columns=["variable_id", "institute_id" "source_id", "filename"]
-        )
+    def __init__(
+        self, paths: str | list[str] | None = None, index: InputIndex | None = None
+    ):
+        self.index = index or InputIndex()
         self.paths: list[str] = []
+        self.cache: MemoryCache[xr.Dataset] = MemoryCache()
 
         if paths:
             if isinstance(paths, str):
@@ -51,6 +211,13 @@ class InputEmissionsDatabase:
             for path in paths:
                 self.register_path(path)
 
+    @property
+    def available_data(self) -> pd.DataFrame:
+        """
+        Information about the files within the registered paths
+        """
+        return self.index.query(self.paths)
+
     def register_path(self, path: str) -> None:
         """
         Load data from a given path
@@ -63,7 +230,8 @@ class InputEmissionsDatabase:
         path
             Path that contains input4MIPs data
         """
-        extra_options = self._find_options(path)
+        self.index.refresh(path)
+        extra_options = self.index.query([path])
 
         if not len(extra_options):
             logger.info(f"Did not find any files in {path}")
@@ -74,32 +242,50 @@ class InputEmissionsDatabase:
         logger.info(f"Found {len(extra_options)} new entries")
 
         if len(extra_options):
-            self.available_data = pd.concat(
-                [self.available_data, extra_options]
-            ).sort_values(["variable_id", "institute_id" "source_id"])
             self.paths.append(path)
 
-    def _find_options(self, root_dir: str | PathLike[str]) -> pd.DataFrame:
-        files = glob(os.path.join(root_dir, "**", "*.nc"), recursive=True)
-
-        def parse_filename(dataset_fname: str) -> dict[str, str] | None:
-            toks = os.path.basename(dataset_fname).split("_")
-            if len(toks) != 7:  # noqa
-                return None
-
-            return {
-                "variable_id": toks[0],
-                "institute_id": toks[3],
-                "source_id": toks[4],
-                "filename": dataset_fname,
-            }
+    def find_files(
+        self,
+        variable_id: str,
+        source_id: str,
+        years: Iterable[int] | None = None,
+    ) -> list[str]:
+        """
+        Find the files which match a variable and source
 
-        file_info = [parse_filename(fname) for fname in files]
+        Parameters
+        ----------
+        variable_id
+            Variable identifier
+        source_id
+            Source identifier
+        years
+            If provided, only the files which contain these years, or the
+            neighbouring years required to interpolate them, are returned
 
-        return pd.DataFrame(list(filter(lambda item: item is not None, file_info)))
+            Files where the time range couldn't be parsed from the filename are
+            always included
 
-    @lru_cache(maxsize=15)
-    def load(self, variable_id: str, source_id: str) -> xr.Dataset:
+        Returns
+        -------
+            Sorted list of matching filenames. May be empty
+        """
+        files = self.index.query(
+            self.paths, variable_id=variable_id, source_id=source_id
+        )
+        if years is not None and len(files):
+            files = files.loc[_filter_time_range(files, list(years))]
+
+        return list(files.filename)
+
+    def load(  # noqa: PLR0913
+        self,
+        variable_id: str,
+        source_id: str,
+        bbox: BoundingBox | None = None,
+        years: tuple[int, ...] | None = None,
+        sector: int | None = None,
+    ) -> xr.Dataset:
         """
         Load the input4MIPs data according to the variable and source name
 
@@ -109,31 +295,185 @@ class InputEmissionsDatabase:
             Variable identifier
         source_id
             Source identifier
+        bbox
+            If provided, only the data within this region is read
+
+            See :meth:`BoundingBox.select` for the handling of longitudes
+        years
+            If provided, only the data required to interpolate these years is
+            read
+
+            For each year, this is either the year itself or the closest available
+            years on either side. The two closest available years are used if a
+            year must be extrapolated. Only the files which overlap these years are
+            opened.
+        sector
+            If provided, only this sector index (see :attr:`SECTOR_MAP`) is read
+            and the sector dimension is dropped
+
         Returns
         -------
             All of the available data for the given variable and source identifiers
-        """
-        subset = self.available_data
 
-        if not len(self.available_data):
+            The result is cached in memory and shared between callers so it
+            shouldn't be modified
+        """
+        if not self.paths:
             raise ValueError(
                 "No input data has been found. "
                 "Set the 'SPAEMIS_INPUT_PATHS' environment variable",
             )
 
-        subset = subset[subset.source_id == source_id]
-        subset = subset[subset.variable_id == variable_id]
-
-        if len(subset) == 0:
+        key = (variable_id, source_id, bbox, years, sector, tuple(self.paths))
+        dataset = self.cache.get_or_load(
+            key, lambda: self._load(variable_id, source_id, bbox, years, sector)
+        )
+        logger.debug(f"Input data cache: {self.cache.stats}")
+        return dataset
+
+    def _load(  # noqa: PLR0913
+        self,
+        variable_id: str,
+        source_id: str,
+        bbox: BoundingBox | None,
+        years: tuple[int, ...] | None,
+        sector: int | None,
+    ) -> xr.Dataset:
+        files_to_load = self.find_files(variable_id, source_id, years)
+
+        if len(files_to_load) == 0:
             raise ValueError(
                 f"Could not find any matching data for source_id={source_id} variable_id={variable_id}"
             )
 
-        files_to_load = sorted(subset.filename.values)
         logger.info(f"Loading data from {len(files_to_load)} files: {files_to_load}")
 
-        data = [xr.open_dataset(fname) for fname in files_to_load]
-        return xr.concat(data, dim="time").sortby("time")
+        def _open(fname: str) -> xr.Dataset:
+            ds = xr.open_dataset(fname)
+            if sector is not None:
+                ds = ds.sel(sector=sector)
+            if bbox is not None:
+                ds = bbox.select(ds)
+            return ds
+
+        # The files are opened and their time axes decoded concurrently
+        num_threads = get_num_io_threads(len(files_to_load))
+        if num_threads > 1:
+            with create_executor("thread", num_threads) as pool:
+                data = list(pool.map(_open, files_to_load))
+        else:
+            data = [_open(fname) for fname in files_to_load]
+        dataset = xr.concat(data, dim="time").sortby("time")
+
+        if years is not None:
+            data_years = dataset["time"].dt.year.values
+            required = _get_neighbouring_years(data_years, years)
+            dataset = dataset.isel(time=np.flatnonzero(np.isin(data_years, required)))
+        return dataset
+
+    def load_annual_mean(  # noqa: PLR0913
+        self,
+        variable_id: str,
+        source_id: str,
+        bbox: BoundingBox | None = None,
+        years: tuple[int, ...] | None = None,
+        sector: int | None = None,
+    ) -> xr.DataArray:
+        """
+        Load the annual mean of the input4MIPs data for a variable and source
+
+        If the files have been converted using :meth:`ingest`, the precomputed
+        annual means are read from the ingested store. Otherwise, the means are
+        calculated from the monthly data returned by :meth:`load`.
+
+        Parameters
+        ----------
+        variable_id
+            Variable identifier
+        source_id
+            Source identifier
+        bbox
+            If provided, only the data within this region is read
+        years
+            If provided, only the years required to interpolate these years are
+            read
+        sector
+            If provided, only this sector index (see :attr:`SECTOR_MAP`) is read
+            and the sector dimension is dropped
+
+        Returns
+        -------
+            Annual mean values with a year dimension
+        """
+        variable_name = variable_id.replace("-", "_")
+        store = open_annual_mean_store(
+            variable_id,
+            source_id,
+            get_source_files_identity(self.find_files(variable_id, source_id)),
+        )
+        if store is None:
+            dataset = self.load(variable_id, source_id, bbox, years, sector)
+            return dataset[variable_name].groupby("time.year").mean()
+
+        logger.info(f"Loading ingested data for {variable_id} {source_id}")
+        if sector is not None:
+            store = store.sel(sector=sector)
+        if bbox is not None:
+            store = bbox.select(store)
+        if years is not None:
+            required = _get_neighbouring_years(store["year"].values, years)
+            store = store.sel(year=required)
+        return store[variable_name]
+
+    def ingest(self, variable_id: str, source_id: str, force: bool = False) -> bool:
+        """
+        Convert the files for a variable and source to an ingested store
+
+        See :mod:`spaemis.ingest` for more information. Requires the optional
+        ``zarr`` package (``pip install spaemis[zarr]``).
+
+        Parameters
+        ----------
+        variable_id
+            Variable identifier
+        source_id
+            Source identifier
+        force
+            If True, the store is recreated even if it is up to date
+
+        Raises
+        ------
+        ValueError
+            No files were found for the variable and source
+
+        Returns
+        -------
+            True if a store was written
+        """
+        files = self.find_files(variable_id, source_id)
+        if not files:
+            raise ValueError(
+                f"Could not find any matching data for source_id={source_id} "
+                f"variable_id={variable_id}"
+            )
+
+        source_files = get_source_files_identity(files)
+        if not force:
+            existing = open_annual_mean_store(variable_id, source_id, source_files)
+            if existing is not None:
+                existing.close()
+                logger.info(f"{variable_id} {source_id} is already up to date")
+                return False
+
+        path = get_store_path(variable_id, source_id)
+        logger.info(f"Ingesting {len(files)} files for {variable_id} {source_id}")
+        write_annual_mean_store(
+            self._load(variable_id, source_id, None, None, None),
+            variable_id.replace("-", "_"),
+            path,
+            source_files,
+        )
+        return True
 
 
 def initialize_database(options: list[str] | None = None) -> InputEmissionsDatabase:
@@ -158,20 +498,322 @@ def initialize_database(options: list[str] | None = None) -> InputEmissionsDatab
     return InputEmissionsDatabase(options)
 
 
-def _apply_filters(ts: scmdata.ScmRun, filters: list[dict[str, Any]]) -> scmdata.ScmRun:
+_database: InputEmissionsDatabase | None = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> InputEmissionsDatabase:
+    """
+    Get the global database of input emissions
+
+    The database is initialised using :func:`initialize_database` the first time
+    it is requested so that importing spaemis doesn't scan the input paths.
+
+    Returns
+    -------
+        Global emissions database
+    """
+    global _database  # noqa: PLW0603
+
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = initialize_database()
+    return _database
+
+
+def __getattr__(name: str) -> Any:
+    # ``spaemis.input_data.database`` is kept for backwards compatibility
+    if name == "database":
+        return get_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _write_feather(run: scmdata.ScmRun, path: str) -> None:
+    import pyarrow as pa
+    import pyarrow.feather
+
+    wide = run.timeseries()
+    meta_columns = list(wide.index.names)
+
+    df = wide.reset_index()
+    # Feather requires string column names
+    df.columns = [*meta_columns, *(pd.Timestamp(t).isoformat() for t in wide.columns)]
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, b"spaemis_meta": json.dumps(meta_columns).encode()}
+    )
+    pyarrow.feather.write_feather(table, path)
+
+
+def _read_feather(path: str) -> scmdata.ScmRun:
+    import pyarrow.feather
+
+    table = pyarrow.feather.read_table(path)
+    meta_columns = json.loads(table.schema.metadata[b"spaemis_meta"])
+
+    df = table.to_pandas().set_index(meta_columns)
+    df.columns = pd.to_datetime(df.columns)
+    return scmdata.ScmRun(df)
+
+
+def read_timeseries(path: str) -> scmdata.ScmRun:
+    """
+    Read a timeseries file
+
+    If the optional ``pyarrow`` package is installed (``pip install
+    spaemis[feather]``), the parsed timeseries are cached on disk as Feather files
+    (see :mod:`spaemis.disk_cache`) and reused until the file is modified.
+
+    Parameters
+    ----------
+    path
+        Path to a file which can be read by :class:`scmdata.ScmRun`
+
+    Returns
+    -------
+        Timeseries
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        return scmdata.ScmRun(path)
+
+    key = make_key(spaemis.__version__, get_file_identity(path))
+    cached = timeseries_cache.get(key, ".feather")
+    if cached is not None:
+        try:
+            return _read_feather(cached)
+        except (OSError, ValueError, KeyError, pyarrow.ArrowException):
+            logger.warning(f"Ignoring unreadable entry {cached}")
+
+    run = scmdata.ScmRun(path)
+    timeseries_cache.put(key, ".feather", lambda fname: _write_feather(run, fname))
+    return run
+
+
+def apply_filters(ts: scmdata.ScmRun, filters: list[dict[str, Any]]) -> scmdata.ScmRun:
+    """
+    Apply a sequence of filters to some timeseries
+
+    Parameters
+    ----------
+    ts
+        Timeseries to filter
+    filters
+        Keyword arguments for each call to :meth:`scmdata.ScmRun.filter`
+
+        The filters are applied in turn so the result only contains the timeseries
+        and times which match all of the filters
+
+    Returns
+    -------
+        Filtered copy of ``ts``
+    """
+    res = ts.copy()
     for f in filters:
-        ts = ts.filter(**f)
-    return ts
+        res = res.filter(**f)
+    return res
+
+
+# Filters on these attributes select time points
+_TIME_FILTERS = {"year", "month", "day", "hour", "time"}
+
+
+def _get_filters_key(filters: list[dict[str, Any]]) -> str:
+    # Canonical form of a list of filters which is independent of the order of the
+    # keys in each filter
+    return json.dumps(filters, sort_keys=True, default=str)
+
+
+@define(frozen=True, eq=False)
+class AnnualTimeseries:
+    """
+    Annual values of a single timeseries
+
+    Use :meth:`from_run` to create
+    """
+
+    run: scmdata.ScmRun
+    """Annual timeseries with a single row"""
+
+    first_year: int
+    """First year of the values"""
+
+    values: NDArray[np.float_]
+    """Value for each consecutive year starting from :attr:`first_year`"""
+
+    unit: str
+    """Unit of the values"""
+
+    @classmethod
+    def from_run(
+        cls, run: scmdata.ScmRun, source: str, filters: list[dict[str, Any]]
+    ) -> AnnualTimeseries:
+        """
+        Create from the result of filtering a source timeseries
+
+        Parameters
+        ----------
+        run
+            Filtered timeseries which have been resampled to annual values
+        source
+            Name of the source timeseries
+        filters
+            Filters which were applied to the source
+
+        Raises
+        ------
+        ValueError
+            ``run`` doesn't contain exactly one timeseries
+
+        Returns
+        -------
+            Annual values
+        """
+        if len(run) == 0:
+            raise ValueError(
+                f"No data matching {filters} was found in {source} input data"
+            )
+
+        if len(run) > 1:
+            raise ValueError(
+                f"More than one match was found for {filters} in {source} input data"
+            )
+
+        years = run["year"].values
+        # Resampling produces consecutive years
+        if len(years) and not np.array_equal(years, np.arange(years[0], years[-1] + 1)):
+            raise AssertionError("Expected annual values")
+
+        return cls(
+            run=run,
+            first_year=int(years[0]) if len(years) else 0,
+            values=run.values.squeeze(axis=0),
+            unit=run.get_unique_meta("unit", True),
+        )
+
+    def get_values(self, target_years: Iterable[int]) -> NDArray[np.float_]:
+        """
+        Get the values for a number of years
+
+        Parameters
+        ----------
+        target_years
+            Years to select
+
+        Raises
+        ------
+        ValueError
+            A year is not available
+
+        Returns
+        -------
+            Value for each of the target years
+        """
+        target_years = list(target_years)
+        positions = np.asarray(target_years, dtype=int) - self.first_year
+        for target_year, position in zip(target_years, positions):
+            if not 0 <= position < len(self.values):
+                raise ValueError(f"No timeseries data for year={target_year} available")
+        return cast(NDArray[np.float_], self.values[positions])
+
+
+class TimeseriesIndex(Mapping[str, scmdata.ScmRun]):
+    """
+    Collection of input timeseries with fast lookups of annual values
+
+    Each source timeseries is resampled to annual values when the index is
+    created. The result of each unique set of filters is stored so that looking up
+    the values for a slice doesn't require any operations on the timeseries.
+
+    An index behaves as a read-only mapping of the source timeseries
+    """
+
+    def __init__(self, timeseries: Mapping[str, scmdata.ScmRun]):
+        self._timeseries = dict(timeseries)
+        self._annual = {
+            name: self._resample(ts) for name, ts in self._timeseries.items()
+        }
+        self._lookups: dict[tuple[str, str], AnnualTimeseries] = {}
+
+    @staticmethod
+    def _resample(ts: scmdata.ScmRun) -> scmdata.ScmRun | None:
+        if not len(ts):
+            return None
+        try:
+            # This linearly interpolates the timeseries
+            return ts.resample("AS")
+        except scmdata.errors.InsufficientDataError:
+            return None
+
+    def __getitem__(self, name: str) -> scmdata.ScmRun:
+        return self._timeseries[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._timeseries)
+
+    def __len__(self) -> int:
+        return len(self._timeseries)
+
+    def get_annual(
+        self, source: str, filters: list[dict[str, Any]]
+    ) -> AnnualTimeseries:
+        """
+        Get the annual values of a single timeseries
+
+        Parameters
+        ----------
+        source
+            Name of the source timeseries
+        filters
+            Filters to apply to the source
+
+            These filters if applied must result in a single remaining timeseries
+
+        Raises
+        ------
+        ValueError
+            The source isn't available or the filters don't select a single
+            timeseries
+
+        Returns
+        -------
+            Annual values
+        """
+        key = (source, _get_filters_key(filters))
+        if key in self._lookups:
+            return self._lookups[key]
+
+        try:
+            ts = self._timeseries[source]
+        except KeyError as exc:
+            raise ValueError(f"Source dataset is not loaded: {source}") from exc
+
+        annual = self._annual[source]
+        if annual is None or any(_TIME_FILTERS.intersection(f) for f in filters):
+            # Filters on time change the points which are resampled
+            run = apply_filters(ts, filters).resample("AS")
+        else:
+            run = apply_filters(annual, filters)
+
+        result = AnnualTimeseries.from_run(run, source, filters)
+        self._lookups[key] = result
+        return result
 
 
 def load_timeseries(
     options: list[InputTimeseries], root_dir: str | None = None
-) -> dict[str, scmdata.ScmRun]:
+) -> TimeseriesIndex:
     """
     Load a set of input timeseries from disk
 
     Optionally, some additional filtering can be performed on these input timeseries
 
+    Each file is only read once, even if it is used by multiple timeseries, and
+    the files are read concurrently (see :func:`read_timeseries`).
+
     Parameters
     ----------
     options
@@ -185,20 +827,32 @@ def load_timeseries(
     -------
         Collection of loaded data
 
-        The keys are determined from the name of each ``InputTimeseries``
+        The keys are determined from the name of each ``InputTimeseries``. The
+        annual values of each timeseries are indexed for use by the scalers (see
+        :class:`TimeseriesIndex`).
     """
-    data = {}
-    for ts_config in options:
-        if ts_config.name in data:
-            raise ValueError(f"Duplicate input timeseries found: {ts_config.name}")
-        ts = _apply_filters(
-            scmdata.ScmRun(os.path.join(root_dir or ".", ts_config.path)),
-            ts_config.filters,
+    names = [ts_config.name for ts_config in options]
+    for name in names:
+        if names.count(name) > 1:
+            raise ValueError(f"Duplicate input timeseries found: {name}")
+
+    paths = list(
+        dict.fromkeys(
+            os.path.join(root_dir or ".", ts_config.path) for ts_config in options
         )
-
-        data[ts_config.name] = ts
-
-    return data
-
-
-database = initialize_database()
+    )
+    num_threads = get_num_io_threads(len(paths))
+    if num_threads > 1:
+        with create_executor("thread", num_threads) as pool:
+            runs = dict(zip(paths, pool.map(read_timeseries, paths)))
+    else:
+        runs = {path: read_timeseries(path) for path in paths}
+
+    return TimeseriesIndex(
+        {
+            ts_config.name: apply_filters(
+                runs[os.path.join(root_dir or ".", ts_config.path)], ts_config.filters
+            )
+            for ts_config in options
+        }
+    )
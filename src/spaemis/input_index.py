@@ -0,0 +1,318 @@
+"""
+Persistent index of a local input4MIPs data archive
+
+Scanning a full input4MIPs archive is slow as it contains many thousands of files.
+The :class:`InputIndex` stores the parsed filename tokens and time coverage of each
+file in an SQLite database along with the modification time of each directory.
+Only directories which have been modified since the last scan are listed again.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import pandas as pd
+
+from spaemis.config import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    filename TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    variable_id TEXT NOT NULL,
+    institute_id TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    start_year INTEGER,
+    end_year INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE INDEX IF NOT EXISTS files_variable_source ON files (variable_id, source_id);
+"""
+
+_FILE_COLUMNS = (
+    "variable_id",
+    "institute_id",
+    "source_id",
+    "filename",
+    "start_year",
+    "end_year",
+)
+_TIME_RANGE = re.compile(r"^(\d{4})\d*-(\d{4})\d*$")
+
+
+def get_default_index_path() -> str:
+    """
+    Get the default location of the index
+
+    Uses the ``SPAEMIS_INPUT_INDEX`` environment variable if set. Otherwise, the
+    index is stored in the cache directory (see :func:`spaemis.config.get_cache_dir`).
+
+    Returns
+    -------
+        Path to the SQLite database. ``":memory:"`` can be used to disable the
+        persistence of the index.
+    """
+    return os.environ.get("SPAEMIS_INPUT_INDEX") or os.path.join(
+        get_cache_dir(), "input4MIPs-index.sqlite"
+    )
+
+
+def parse_filename(dataset_fname: str) -> dict[str, Any] | None:
+    """
+    Parse the tokens of an input4MIPs filename
+
+    Parameters
+    ----------
+    dataset_fname
+        Filename of a dataset
+
+        For example,
+        ``CO-em-anthro_input4MIPs_emissions_ScenarioMIP_IAMC-MESSAGE-GLOBIOM-ssp245-1-1_gn_201501-210012.nc``
+
+    Returns
+    -------
+        Parsed tokens or None if the filename doesn't follow the input4MIPs
+        conventions
+
+        The start and end years are None if the time range can't be parsed
+    """
+    toks = os.path.splitext(os.path.basename(dataset_fname))[0].split("_")
+    if len(toks) != 7:  # noqa
+        return None
+
+    time_range = _TIME_RANGE.match(toks[6])
+
+    return {
+        "variable_id": toks[0],
+        "institute_id": toks[3],
+        "source_id": toks[4],
+        "filename": dataset_fname,
+        "start_year": int(time_range.group(1)) if time_range else None,
+        "end_year": int(time_range.group(2)) if time_range else None,
+    }
+
+
+def _get_prefix_range(path: str) -> tuple[str, str]:
+    # All paths within a directory sort between these bounds. The bounds allow for
+    # the index on the primary key to be used
+    prefix = os.path.join(path, "")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _remove_directory(conn: sqlite3.Connection, directory: str) -> None:
+    lower, upper = _get_prefix_range(directory)
+    conn.execute(
+        "DELETE FROM files WHERE filename >= ? AND filename < ?", (lower, upper)
+    )
+    conn.execute(
+        "DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+        (directory, lower, upper),
+    )
+
+
+class InputIndex:
+    """
+    Index of the input4MIPs files within a set of directories
+
+    The index is safe to share between threads. Multiple processes can use the same
+    index file.
+    """
+
+    def __init__(self, path: str | None = None):
+        self._path = path
+        self._lock = threading.RLock()
+        # The database is opened on first use
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def path(self) -> str:
+        """
+        Path to the SQLite database
+
+        Defaults to :func:`get_default_index_path` when the index is first used
+        """
+        if self._path is None:
+            self._path = get_default_index_path()
+        return self._path
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                return self._initialise(self.path)
+            except (OSError, sqlite3.Error):
+                logger.warning(
+                    f"Could not open index at {self.path}. Using an in-memory index",
+                    exc_info=True,
+                )
+        return self._initialise(":memory:")
+
+    @staticmethod
+    def _initialise(path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._connect()
+            with self._connection:
+                yield self._connection
+
+    def refresh(self, root_dir: str) -> None:
+        """
+        Update the index for the files within a directory
+
+        Only the directories which have been modified since the last refresh are
+        listed.
+
+        Parameters
+        ----------
+        root_dir
+            Directory to search recursively
+        """
+        root_dir = os.path.abspath(root_dir)
+
+        with self._transaction() as conn:
+            num_scanned = 0
+            pending: list[tuple[str, str | None]] = [(root_dir, None)]
+            while pending:
+                directory, parent = pending.pop()
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    _remove_directory(conn, directory)
+                    continue
+
+                row = conn.execute(
+                    "SELECT mtime_ns FROM directories WHERE path = ?", (directory,)
+                ).fetchone()
+                if row is not None and row[0] == mtime_ns:
+                    subdirs = [
+                        subdir
+                        for (subdir,) in conn.execute(
+                            "SELECT path FROM directories WHERE parent = ?",
+                            (directory,),
+                        )
+                    ]
+                else:
+                    subdirs = self._scan_directory(conn, directory, parent, mtime_ns)
+                    num_scanned += 1
+                pending.extend((subdir, directory) for subdir in subdirs)
+
+        logger.debug(f"Scanned {num_scanned} modified directories in {root_dir}")
+
+    @staticmethod
+    def _scan_directory(
+        conn: sqlite3.Connection,
+        directory: str,
+        parent: str | None,
+        mtime_ns: int,
+    ) -> list[str]:
+        files = []
+        subdirs = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(".nc"):
+                    file_info = parse_filename(entry.path)
+                    if file_info is not None:
+                        files.append(file_info)
+
+        # Remove any subdirectories which no longer exist
+        for (previous,) in conn.execute(
+            "SELECT path FROM directories WHERE parent = ?", (directory,)
+        ).fetchall():
+            if previous not in subdirs:
+                _remove_directory(conn, previous)
+
+        conn.execute("DELETE FROM files WHERE directory = ?", (directory,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO files "
+            "(filename, directory, variable_id, institute_id, source_id, "
+            "start_year, end_year) VALUES "
+            "(:filename, :directory, :variable_id, :institute_id, :source_id, "
+            ":start_year, :end_year)",
+            [{**file_info, "directory": directory} for file_info in files],
+        )
+        # The parent of a directory is retained if it is registered as a root
+        conn.execute(
+            "INSERT INTO directories (path, parent, mtime_ns) VALUES (?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET mtime_ns = excluded.mtime_ns, "
+            "parent = COALESCE(excluded.parent, directories.parent)",
+            (directory, parent, mtime_ns),
+        )
+        return subdirs
+
+    @staticmethod
+    def _where_within(root_dirs: Iterable[str]) -> tuple[str, list[Any]]:
+        clauses = []
+        params: list[Any] = []
+        for root_dir in root_dirs:
+            clauses.append("(filename >= ? AND filename < ?)")
+            params.extend(_get_prefix_range(os.path.abspath(root_dir)))
+        if not clauses:
+            return "0", []
+        return "(" + " OR ".join(clauses) + ")", params
+
+    def query(
+        self,
+        root_dirs: Iterable[str],
+        variable_id: str | None = None,
+        source_id: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        Query the indexed files
+
+        Parameters
+        ----------
+        root_dirs
+            Only files within these directories are included
+        variable_id
+            If provided, only include files for this variable
+        source_id
+            If provided, only include files for this source
+
+        Returns
+        -------
+            Parsed information about each matching file sorted by filename
+        """
+        where, params = self._where_within(root_dirs)
+        for column, value in (("variable_id", variable_id), ("source_id", source_id)):
+            if value is not None:
+                where += f" AND {column} = ?"
+                params.append(value)
+
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_FILE_COLUMNS)} FROM files "  # noqa: S608
+                f"WHERE {where} ORDER BY filename",
+                params,
+            ).fetchall()
+        return pd.DataFrame(rows, columns=list(_FILE_COLUMNS))
+
+    def close(self) -> None:
+        """
+        Close the underlying database connection
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -11,11 +11,13 @@ from collections.abc import Callable
 from typing import TYPE_CHECKING, Any, TypeVar
 
 import geopandas  # type: ignore
+import numpy as np
 import pandas as pd
 import xarray as xr
 from attrs import define, field
 from typing_extensions import Self
 
+from spaemis.cells import CellMask
 from spaemis.constants import RAW_DATA_DIR, TEST_DATA_DIR
 from spaemis.utils import clip_region, load_australia_boundary
 
@@ -69,6 +71,31 @@ class EmissionsInventory:
     )
     border_mask: geopandas.GeoDataFrame
     year: int
+    _cells: CellMask | None = field(init=False, default=None, eq=False, repr=False)
+
+    @property
+    def cells(self) -> CellMask:
+        """
+        Cells of the inventory grid within the border
+
+        Cells where the inventory has data are also included. The mask is only
+        calculated once.
+        """
+        if self._cells is None:
+            valid = np.zeros((self.data.lat.size, self.data.lon.size), dtype=bool)
+            for variable in self.data.data_vars.values():
+                valid |= (
+                    variable.notnull().any(dim="sector").transpose("lat", "lon").values
+                )
+
+            self._cells = CellMask.from_border(
+                self.data.lat.values, self.data.lon.values, self.border_mask, valid
+            )
+            logger.info(
+                f"{self._cells.size} / {valid.size} inventory cells are within the "
+                "border"
+            )
+        return self._cells
 
     @classmethod
     def load_from_directory(cls, data_directory: str, year: int, **kwargs: Any) -> Self:
@@ -292,6 +319,28 @@ class TestInventory(EmissionsInventory):
         return cls(data, border_mask=vic_border, year=2016)
 
 
+def get_inventory_directory(inventory: str, year: int) -> str:
+    """
+    Get the default directory containing the files for an inventory
+
+    Parameters
+    ----------
+    inventory
+        Inventory name
+    year
+        Year of inventory
+
+    Returns
+    -------
+        Directory within the ``SPAEMIS_INVENTORY_DIRECTORY`` environment variable
+        (defaults to ``data/raw/inventories``) for the inventory name and year
+    """
+    inventory_root_directory = os.environ.get(
+        "SPAEMIS_INVENTORY_DIRECTORY", os.path.join(RAW_DATA_DIR, "inventories")
+    )
+    return os.path.join(inventory_root_directory, inventory, str(year))
+
+
 @functools.lru_cache(5)
 def load_inventory(
     inventory: str, year: int, data_directory: str | None = None
@@ -323,12 +372,7 @@ def load_inventory(
         Could not determine the appropriate inventory to load
 
     """
-    inventory_root_directory = os.environ.get(
-        "SPAEMIS_INVENTORY_DIRECTORY", os.path.join(RAW_DATA_DIR, "inventories")
-    )
-    data_directory = data_directory or os.path.join(
-        inventory_root_directory, inventory, str(year)
-    )
+    data_directory = data_directory or get_inventory_directory(inventory, year)
     mapping = {
         ("test", 2016): TestInventory,
         ("victoria", 2016): VictoriaEPAInventory,
@@ -0,0 +1,323 @@
+"""
+Thread-safe in-process cache with a memory budget
+
+A :class:`MemoryCache` holds the results of expensive loads, such as the datasets
+returned by :meth:`spaemis.input_data.InputEmissionsDatabase.load`, in memory.
+
+The total size of the cached values is bounded rather than the number of entries.
+By default, all the caches in a process share a single :class:`MemoryBudget` so
+``SPAEMIS_CACHE_MAX_BYTES`` bounds the memory used by all of them combined. Once the
+budget is exceeded, the least recently used entries are evicted, irrespective of
+which cache they belong to. Evicted values which hold resources, such as the files
+backing a lazily loaded :class:`xarray.Dataset`, are closed. If multiple threads
+request the same missing key at once, the value is only loaded once and shared
+between all the callers.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, Generic, TypeVar
+
+from attrs import define, evolve
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_BYTES = 4 * 1024**3
+
+
+def get_default_max_bytes() -> int:
+    """
+    Get the default memory budget shared by the caches in a process
+
+    Uses the ``SPAEMIS_CACHE_MAX_BYTES`` environment variable if set. A value of 0
+    disables caching.
+
+    Returns
+    -------
+        Maximum size in bytes
+    """
+    return int(os.environ.get("SPAEMIS_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES)
+
+
+def get_nbytes(value: Any) -> int:
+    """
+    Get the size of a cached value
+
+    Parameters
+    ----------
+    value
+        Cached value
+
+    Returns
+    -------
+        ``value.nbytes`` if available otherwise 0
+
+        For lazily loaded xarray objects, this is the size once the data has been
+        read.
+    """
+    return int(getattr(value, "nbytes", 0))
+
+
+def _close(value: Any) -> None:
+    # Lazily loaded datasets keep their files open until they are closed
+    close = getattr(value, "close", None)
+    if callable(close):
+        close()
+
+
+@define
+class CacheStats:
+    """
+    Usage statistics of a :class:`MemoryCache`
+    """
+
+    hits: int = 0
+    """Number of requests which were served from the cache"""
+
+    misses: int = 0
+    """Number of requests which required a value to be loaded"""
+
+    evictions: int = 0
+    """Number of entries which have been removed to stay within the budget"""
+
+    entries: int = 0
+    """Current number of entries"""
+
+    nbytes: int = 0
+    """Current total size of the entries"""
+
+
+class MemoryBudget:
+    """
+    Memory budget shared between several :class:`MemoryCache` instances
+
+    The least recently used entries across all the caches are evicted once their
+    total size exceeds the budget. The caches sharing a budget also share a lock.
+
+    Parameters
+    ----------
+    max_bytes
+        Maximum total size of the entries in all the caches
+
+        If not provided, :func:`get_default_max_bytes` is used
+    """
+
+    def __init__(self, max_bytes: int | None = None):
+        self._max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self._entries: OrderedDict[
+            tuple[int, Hashable], tuple[weakref.ref[MemoryCache[Any]], int]
+        ] = OrderedDict()
+        self._nbytes = 0
+        self._released: list[int] = []
+
+    @property
+    def max_bytes(self) -> int:
+        """
+        Maximum total size of the entries
+
+        Defaults to :func:`get_default_max_bytes`
+        """
+        if self._max_bytes is None:
+            return get_default_max_bytes()
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Current total size of the entries in all the caches
+        """
+        with self.lock:
+            self._purge()
+            return self._nbytes
+
+    def _register(self, cache: MemoryCache[Any]) -> None:
+        # The entries of caches which are garbage collected are dropped lazily as
+        # the finalizer can run while the lock is held. They are dropped before a new
+        # cache is registered as the id of a collected cache may be reused
+        with self.lock:
+            self._purge()
+        weakref.finalize(cache, self._released.append, id(cache))
+
+    def _purge(self) -> None:
+        while self._released:
+            cache_id = self._released.pop()
+            for entry in [entry for entry in self._entries if entry[0] == cache_id]:
+                _, size = self._entries.pop(entry)
+                self._nbytes -= size
+
+    def _add(self, cache: MemoryCache[Any], key: Hashable, size: int) -> None:
+        self._purge()
+        self._entries[(id(cache), key)] = (weakref.ref(cache), size)
+        self._nbytes += size
+
+        while self._nbytes > self.max_bytes:
+            (_, evicted_key), (ref, _) = next(iter(self._entries.items()))
+            evicted_cache = ref()
+            if evicted_cache is None:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_size
+            else:
+                evicted_cache._evict(evicted_key)
+
+    def _touch(self, cache: MemoryCache[Any], key: Hashable) -> None:
+        self._entries.move_to_end((id(cache), key))
+
+    def _remove(self, cache: MemoryCache[Any], key: Hashable) -> None:
+        _, size = self._entries.pop((id(cache), key))
+        self._nbytes -= size
+
+
+default_budget = MemoryBudget()
+"""Budget shared by the caches which aren't given their own"""
+
+
+class MemoryCache(Generic[T]):
+    """
+    Least recently used cache bounded by the size of its values
+
+    Parameters
+    ----------
+    max_bytes
+        Maximum total size of the values in this cache
+
+        If not provided, the cache is only bounded by ``budget``
+    sizeof
+        Function which calculates the size of a value
+    budget
+        Budget shared with other caches
+
+        Defaults to :data:`default_budget`
+    """
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        sizeof: Callable[[T], int] = get_nbytes,
+        budget: MemoryBudget | None = None,
+    ):
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._budget = budget or default_budget
+        self._lock = self._budget.lock
+        self._budget._register(self)
+        self._entries: OrderedDict[Hashable, tuple[T, int]] = OrderedDict()
+        self._pending: dict[Hashable, Future[T]] = {}
+        self._stats = CacheStats()
+
+    @property
+    def max_bytes(self) -> int:
+        """
+        Memory budget of the cache
+
+        The smaller of the limit of this cache and the shared budget
+        """
+        if self._max_bytes is None:
+            return self._budget.max_bytes
+        return min(self._max_bytes, self._budget.max_bytes)
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        Snapshot of the usage statistics
+        """
+        with self._lock:
+            return evolve(self._stats)
+
+    def get_or_load(self, key: Hashable, load: Callable[[], T]) -> T:
+        """
+        Get a cached value, loading it if required
+
+        Parameters
+        ----------
+        key
+            Key identifying the value
+        load
+            Function which loads the value
+
+            If other threads request the same key while the value is being loaded,
+            they wait for the result instead of loading it again. Any exception
+            raised is propagated to all the waiting callers and nothing is cached.
+
+        Returns
+        -------
+            Cached or newly loaded value
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._budget._touch(self, key)
+                self._stats.hits += 1
+                return self._entries[key][0]
+
+            pending = self._pending.get(key)
+            if pending is None:
+                self._stats.misses += 1
+                future: Future[T] = Future()
+                self._pending[key] = future
+            else:
+                self._stats.hits += 1
+
+        if pending is not None:
+            return pending.result()
+
+        try:
+            value = load()
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._add(key, value)
+        future.set_result(value)
+        return value
+
+    def _add(self, key: Hashable, value: T) -> None:
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key} as it exceeds the memory budget")
+            return
+
+        self._entries[key] = (value, size)
+        self._stats.nbytes += size
+
+        while self._stats.nbytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+        # Entries of other caches sharing the budget may also be evicted
+        self._budget._add(self, key, size)
+        self._stats.entries = len(self._entries)
+
+    def _evict(self, key: Hashable) -> None:
+        value, size = self._entries.pop(key)
+        self._budget._remove(self, key)
+        self._stats.nbytes -= size
+        self._stats.evictions += 1
+        self._stats.entries = len(self._entries)
+        logger.debug(f"Evicted {key} from the memory cache")
+        _close(value)
+
+    def clear(self) -> None:
+        """
+        Remove all the cached values
+
+        The usage statistics are retained
+        """
+        with self._lock:
+            for key, (value, _) in self._entries.items():
+                self._budget._remove(self, key)
+                _close(value)
+            self._entries.clear()
+            self._stats.entries = 0
+            self._stats.nbytes = 0
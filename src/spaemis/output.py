@@ -0,0 +1,640 @@
+"""
+Storage of projected emissions
+
+The projections are calculated slice by slice. An output collects each slice as it
+is calculated and produces a Dataset with dimensions (sector, year, lat, lon) once
+all the slices have been calculated.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Iterator
+from typing import Any
+
+import netCDF4  # type: ignore
+import numpy as np
+import xarray as xr
+from attrs import define, field
+from numpy.typing import DTypeLike, NDArray
+
+from spaemis.cells import CellMask
+
+logger = logging.getLogger(__name__)
+
+
+@define
+class OutputCoords:
+    """
+    Coordinates of the output dataset
+    """
+
+    variables: list[str]
+    sectors: list[str]
+    years: list[int]
+    lat: xr.DataArray
+    lon: xr.DataArray
+    cells: CellMask | None = None
+    """
+    Valid cells of the (lat, lon) grid
+
+    If provided, slices can be written as vectors of the valid cells (see
+    :meth:`BaseOutput.write_cells`)
+    """
+
+    @property
+    def shape(self) -> tuple[int, int, int, int]:
+        """
+        Shape of each variable in the output dataset
+        """
+        return len(self.sectors), len(self.years), len(self.lat), len(self.lon)
+
+    @property
+    def coords(self) -> dict[str, Any]:
+        """
+        Coordinates for creating xarray objects
+        """
+        return dict(
+            sector=self.sectors,
+            year=self.years,
+            lat=self.lat,
+            lon=self.lon,
+        )
+
+    def get_index(self, sector: str, year: int) -> tuple[int, int]:
+        """
+        Get the position of a slice
+
+        Parameters
+        ----------
+        sector
+            Sector name
+        year
+            Year
+
+        Returns
+        -------
+            Index of the sector and year in the output
+        """
+        return self.sectors.index(sector), self.years.index(year)
+
+    def iter_blocks(
+        self, years: list[int], values: NDArray[np.float_]
+    ) -> Iterator[tuple[int, NDArray[np.float_]]]:
+        """
+        Iterate over the (lat, lon) blocks for each year of a slice
+
+        Parameters
+        ----------
+        years
+            Years of the data
+        values
+            Values with dimensions (year, lat, lon)
+
+        Raises
+        ------
+        ValueError
+            The shape of the values doesn't match the spatial coordinates
+
+        Returns
+        -------
+            Iterator of year and values for that year
+        """
+        shape = self.shape[2:]
+        for year, year_values in zip(years, values):
+            if year_values.shape != shape:
+                raise ValueError(f"Expected shape {shape}, got {year_values.shape}")
+            yield year, year_values
+
+
+@define
+class BaseOutput:
+    """
+    Destination for projected slices
+
+    :meth:`declare` must be called before any slices are written
+    """
+
+    _coords: OutputCoords | None = field(init=False, default=None)
+
+    @property
+    def coords(self) -> OutputCoords:
+        """
+        Declared coordinates of the output
+        """
+        if self._coords is None:
+            raise ValueError("Output coordinates have not been declared")
+        return self._coords
+
+    def declare(self, coords: OutputCoords) -> None:
+        """
+        Declare the coordinates of the output
+
+        Parameters
+        ----------
+        coords
+            Variables, sectors, years and spatial coordinates of the output
+        """
+        self._coords = coords
+
+    def write_slice(
+        self,
+        variable: str,
+        sector: str,
+        years: list[int],
+        values: NDArray[np.float_],
+    ) -> None:
+        """
+        Write a slice of projected data
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years of the data
+        values
+            Values with dimensions (year, lat, lon)
+        """
+        raise NotImplementedError
+
+    def write_cells(
+        self,
+        variable: str,
+        sector: str,
+        years: list[int],
+        values: NDArray[np.float_],
+    ) -> None:
+        """
+        Write a slice of projected data for the valid cells
+
+        By default, the cells are expanded onto the (lat, lon) grid and written
+        using :meth:`write_slice`.
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years of the data
+        values
+            Values with dimensions (year, cell)
+
+            The cells are defined by the ``cells`` of the declared coordinates
+        """
+        self.write_slice(variable, sector, years, self._get_cells().expand(values))
+
+    def _get_cells(self) -> CellMask:
+        cells = self.coords.cells
+        if cells is None:
+            raise ValueError("Output coordinates do not define any cells")
+        return cells
+
+    def to_dataset(self) -> xr.Dataset:
+        """
+        Get the projected data
+
+        Returns
+        -------
+            Dataset where each variable has dimensions of (sector, year, lat, lon)
+
+            Any slices which haven't been written are nan
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release any resources held by the output
+        """
+
+
+@define
+class InMemoryOutput(BaseOutput):
+    """
+    Store each slice as a separate block in memory
+
+    Blocks are only allocated for the slices that are written so memory usage
+    scales with the number of slices calculated rather than the size of the full
+    output dataset.
+
+    If the declared coordinates define the valid cells, each block only stores the
+    valid cells and is expanded onto the (lat, lon) grid when the dataset is
+    created.
+
+    By default, :meth:`to_dataset` copies the blocks into dense arrays and releases
+    them. If ``lazy`` is True, a dask-backed dataset is returned instead where the
+    missing slices are lazily filled with nans. This requires the optional ``dask``
+    package (``pip install spaemis[dask]``).
+    """
+
+    dtype: DTypeLike = np.float64
+    lazy: bool = False
+    _blocks: dict[tuple[str, str, int], NDArray[Any]] = field(init=False, factory=dict)
+    _dataset: xr.Dataset | None = field(init=False, default=None)
+
+    def declare(self, coords: OutputCoords) -> None:
+        """
+        Declare the coordinates of the output
+
+        Parameters
+        ----------
+        coords
+            Variables, sectors, years and spatial coordinates of the output
+        """
+        super().declare(coords)
+        self._blocks = {}
+        self._dataset = None
+
+    def write_slice(
+        self,
+        variable: str,
+        sector: str,
+        years: list[int],
+        values: NDArray[np.float_],
+    ) -> None:
+        """
+        Write a slice of projected data
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years of the data
+        values
+            Values with dimensions (year, lat, lon)
+        """
+        if self.coords.cells is not None:
+            self.write_cells(
+                variable, sector, years, self.coords.cells.compress(values)
+            )
+            return
+
+        self._check_writable()
+        for year, year_values in self.coords.iter_blocks(years, values):
+            self._blocks[(variable, sector, year)] = np.asarray(
+                year_values, dtype=self.dtype
+            )
+
+    def write_cells(
+        self,
+        variable: str,
+        sector: str,
+        years: list[int],
+        values: NDArray[np.float_],
+    ) -> None:
+        """
+        Write a slice of projected data for the valid cells
+
+        The valid cells are stored without being expanded onto the (lat, lon) grid
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years of the data
+        values
+            Values with dimensions (year, cell)
+        """
+        cells = self._get_cells()
+        self._check_writable()
+
+        for year, year_values in zip(years, values):
+            if year_values.shape != (cells.size,):
+                raise ValueError(
+                    f"Expected shape {(cells.size,)}, got {year_values.shape}"
+                )
+            self._blocks[(variable, sector, year)] = np.asarray(
+                year_values, dtype=self.dtype
+            )
+
+    def _check_writable(self) -> None:
+        if self._dataset is not None:
+            raise ValueError("Output has already been materialised")
+
+    def _to_lazy_block(self, block: NDArray[Any]) -> Any:
+        import dask
+        import dask.array as da
+
+        cells = self.coords.cells
+        if cells is None:
+            return da.from_array(block)
+        return da.from_delayed(
+            dask.delayed(cells.expand)(block), shape=cells.shape, dtype=self.dtype
+        )
+
+    def _to_lazy_array(self, variable: str) -> Any:
+        import dask.array as da
+
+        coords = self.coords
+        shape = coords.shape[2:]
+        missing = da.full(shape, np.nan, dtype=self.dtype, chunks=shape)
+
+        return da.stack(
+            [
+                da.stack(
+                    [
+                        self._to_lazy_block(self._blocks[(variable, sector, year)])
+                        if (variable, sector, year) in self._blocks
+                        else missing
+                        for year in coords.years
+                    ]
+                )
+                for sector in coords.sectors
+            ]
+        )
+
+    def _to_dense_array(self, variable: str) -> NDArray[Any]:
+        coords = self.coords
+        data = np.full(coords.shape, np.nan, dtype=self.dtype)
+
+        for i, sector in enumerate(coords.sectors):
+            for j, year in enumerate(coords.years):
+                # Release the blocks as they are copied
+                block = self._blocks.pop((variable, sector, year), None)
+                if block is None:
+                    continue
+                if coords.cells is None:
+                    data[i, j] = block
+                else:
+                    data[i, j].reshape(-1)[coords.cells.index] = block
+        return data
+
+    def to_dataset(self) -> xr.Dataset:
+        """
+        Get the projected data
+
+        Returns
+        -------
+            Dataset where each variable has dimensions of (sector, year, lat, lon)
+
+            Any slices which haven't been written are nan
+        """
+        if self._dataset is not None:
+            return self._dataset
+
+        coords = self.coords
+        to_array = self._to_lazy_array if self.lazy else self._to_dense_array
+        self._dataset = xr.Dataset(
+            data_vars={
+                variable: xr.DataArray(
+                    to_array(variable),
+                    coords=coords.coords,
+                    dims=("sector", "year", "lat", "lon"),
+                )
+                for variable in coords.variables
+            },
+            coords=coords.coords,
+        )
+        return self._dataset
+
+
+@define
+class NetCDFOutput(BaseOutput):
+    """
+    Stream slices into a netCDF file as they are calculated
+
+    The file and its variables are declared up front with a chunk per
+    (sector, year). Each slice is written into its region of the file and flushed
+    to disk so memory usage is bounded and partially complete runs can be inspected.
+    Any slices which haven't been written are nan.
+
+    If ``append`` is True, an existing file with matching coordinates is reused
+    rather than overwritten so that previously written slices are retained.
+    """
+
+    path: str
+    dtype: DTypeLike = np.float64
+    append: bool = False
+    _handle: Any = field(init=False, default=None)
+
+    def matches(self, coords: OutputCoords) -> bool:
+        """
+        Check if an existing file was declared with the same coordinates
+
+        Parameters
+        ----------
+        coords
+            Variables, sectors, years and spatial coordinates of the output
+
+        Returns
+        -------
+            True if the file exists and can be appended to
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with xr.open_dataset(self.path) as existing:
+                return bool(
+                    sorted(existing.data_vars) == sorted(coords.variables)
+                    and all(
+                        existing[name].dtype == np.dtype(self.dtype)
+                        for name in coords.variables
+                    )
+                    and all(
+                        np.array_equal(existing[name].values, np.asarray(coord))
+                        for name, coord in coords.coords.items()
+                    )
+                )
+        except (OSError, ValueError):
+            logger.exception(f"Could not read existing output file: {self.path}")
+            return False
+
+    def declare(self, coords: OutputCoords) -> None:
+        """
+        Create the netCDF file
+
+        Any existing file is overwritten unless ``append`` is True and the
+        existing file has matching coordinates.
+
+        Parameters
+        ----------
+        coords
+            Variables, sectors, years and spatial coordinates of the output
+        """
+        super().declare(coords)
+        self.close()
+
+        if self.append and self.matches(coords):
+            logger.info(f"Appending to existing output file: {self.path}")
+            self._handle = netCDF4.Dataset(self.path, mode="a")
+            return
+
+        logger.info(f"Creating output file: {self.path}")
+        handle = netCDF4.Dataset(self.path, mode="w")
+        for name, coord in coords.coords.items():
+            values = np.asarray(coord)
+            handle.createDimension(name, len(values))
+            if values.dtype.kind in "OU":
+                variable = handle.createVariable(name, str, (name,))
+                variable[:] = values.astype(object)
+            else:
+                variable = handle.createVariable(name, values.dtype, (name,))
+                variable[:] = values
+
+        _, _, num_lat, num_lon = coords.shape
+        for name in coords.variables:
+            handle.createVariable(
+                name,
+                np.dtype(self.dtype),
+                ("sector", "year", "lat", "lon"),
+                chunksizes=(1, 1, num_lat, num_lon),
+                fill_value=np.nan,
+                zlib=True,
+                complevel=1,
+            )
+        handle.sync()
+        self._handle = handle
+
+    def write_slice(
+        self,
+        variable: str,
+        sector: str,
+        years: list[int],
+        values: NDArray[np.float_],
+    ) -> None:
+        """
+        Write a slice of projected data into the file
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years of the data
+        values
+            Values with dimensions (year, lat, lon)
+        """
+        if self._handle is None:
+            raise ValueError("Output file is not open")
+
+        for year, year_values in self.coords.iter_blocks(years, values):
+            sector_index, year_index = self.coords.get_index(sector, year)
+            self._handle[variable][sector_index, year_index, :, :] = year_values
+        self._handle.sync()
+
+    def to_dataset(self) -> xr.Dataset:
+        """
+        Close the file and open the result
+
+        Returns
+        -------
+            Lazily loaded dataset where each variable has dimensions of
+            (sector, year, lat, lon)
+        """
+        self.close()
+        return xr.open_dataset(self.path)
+
+    def close(self) -> None:
+        """
+        Close the file if it is open
+        """
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+@define
+class ZarrOutput(BaseOutput):
+    """
+    Stream slices into a Zarr store as they are calculated
+
+    Requires the optional ``zarr`` package (``pip install spaemis[zarr]``).
+
+    The store is declared up front with a chunk per (sector, year) and each slice
+    is written into its region of the store. Any slices which haven't been written
+    are nan.
+    """
+
+    path: str
+    dtype: DTypeLike = np.float64
+    _group: Any = field(init=False, default=None)
+
+    def declare(self, coords: OutputCoords) -> None:
+        """
+        Create the Zarr store
+
+        Any existing store is overwritten
+
+        Parameters
+        ----------
+        coords
+            Variables, sectors, years and spatial coordinates of the output
+        """
+        import zarr
+
+        super().declare(coords)
+
+        logger.info(f"Creating output store: {self.path}")
+        group = zarr.open_group(self.path, mode="w")
+        for name, coord in coords.coords.items():
+            values = np.asarray(coord)
+            if values.dtype.kind == "O":
+                values = values.astype(str)
+            array = group.create_dataset(name, data=values)
+            # Used by xarray to determine the dimensions
+            array.attrs["_ARRAY_DIMENSIONS"] = [name]
+
+        _, _, num_lat, num_lon = coords.shape
+        for name in coords.variables:
+            array = group.create_dataset(
+                name,
+                shape=coords.shape,
+                chunks=(1, 1, num_lat, num_lon),
+                dtype=self.dtype,
+                fill_value=np.nan,
+            )
+            array.attrs["_ARRAY_DIMENSIONS"] = ["sector", "year", "lat", "lon"]
+        zarr.consolidate_metadata(self.path)
+        self._group = group
+
+    def write_slice(
+        self,
+        variable: str,
+        sector: str,
+        years: list[int],
+        values: NDArray[np.float_],
+    ) -> None:
+        """
+        Write a slice of projected data into the store
+
+        Parameters
+        ----------
+        variable
+            Variable name
+        sector
+            Sector name
+        years
+            Years of the data
+        values
+            Values with dimensions (year, lat, lon)
+        """
+        if self._group is None:
+            raise ValueError("Output store is not open")
+
+        for year, year_values in self.coords.iter_blocks(years, values):
+            sector_index, year_index = self.coords.get_index(sector, year)
+            self._group[variable][sector_index, year_index] = year_values
+
+    def to_dataset(self) -> xr.Dataset:
+        """
+        Open the result
+
+        Returns
+        -------
+            Lazily loaded dataset where each variable has dimensions of
+            (sector, year, lat, lon)
+        """
+        return xr.open_dataset(self.path, engine="zarr", chunks=None)
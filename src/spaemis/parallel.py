@@ -0,0 +1,192 @@
+"""
+Parallel execution helpers
+
+Projections are made up of many independent slices which can be farmed out to a
+pool of workers. Numerical libraries (BLAS, OpenMP, numexpr) spin up their own
+thread pools which oversubscribe the available cores when combined with a pool of
+workers so the number of native threads used by each worker is limited.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from collections.abc import Callable, Generator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Literal
+
+logger = logging.getLogger(__name__)
+
+ExecutorKind = Literal["serial", "thread", "process"]
+
+# Environment variables read by the common native threading libraries at startup
+NATIVE_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def get_num_workers(workers: int | None = None) -> int:
+    """
+    Get the number of workers to use
+
+    Parameters
+    ----------
+    workers
+        Requested number of workers
+
+        If not provided, the number of available CPUs is used
+
+    Returns
+    -------
+        Number of workers (at least 1)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def get_num_io_threads(num_tasks: int) -> int:
+    """
+    Get the number of threads used to read a set of files
+
+    Reading is largely bound by I/O latency so more threads than CPUs can be
+    useful. Uses the ``SPAEMIS_IO_THREADS`` environment variable if set. Otherwise
+    up to 8 threads are used.
+
+    Parameters
+    ----------
+    num_tasks
+        Number of files to read
+
+    Returns
+    -------
+        Number of threads (at least 1)
+    """
+    max_threads = int(os.environ.get("SPAEMIS_IO_THREADS") or 8)
+    return max(1, min(max_threads, num_tasks))
+
+
+def get_threads_per_worker(workers: int) -> int:
+    """
+    Get the number of native threads each worker can use without oversubscription
+
+    Parameters
+    ----------
+    workers
+        Number of concurrent workers
+
+    Returns
+    -------
+        Number of threads (at least 1)
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _limit_runtime_threads(num_threads: int) -> Any:
+    # threadpoolctl is an optional dependency (``pip install spaemis[threadpoolctl]``)
+    # which can limit thread pools that have already been initialised in the
+    # current process. The returned limiter restores the original limits
+    try:
+        from threadpoolctl import threadpool_limits  # type: ignore
+    except ImportError:
+        return None
+
+    return threadpool_limits(limits=num_threads)
+
+
+@contextmanager
+def limit_native_threads(num_threads: int) -> Generator[None, None, None]:
+    """
+    Temporarily limit the number of threads used by native libraries
+
+    The environment variables are inherited by any processes started in this context
+    and are read when the native libraries are initialised. Native thread pools which
+    are already running in this process, as used by a pool of threads, are only
+    limited if threadpoolctl is installed. The original values are restored on exit.
+
+    Parameters
+    ----------
+    num_threads
+        Maximum number of threads
+    """
+    previous = {key: os.environ.get(key) for key in NATIVE_THREAD_VARIABLES}
+    limiter = None
+    try:
+        for key in NATIVE_THREAD_VARIABLES:
+            os.environ[key] = str(num_threads)
+        limiter = _limit_runtime_threads(num_threads)
+        yield
+    finally:
+        if limiter is not None:
+            limiter.restore_original_limits()
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def initialise_worker_threads(num_threads: int) -> None:
+    """
+    Limit the number of native threads inside a worker
+
+    Parameters
+    ----------
+    num_threads
+        Maximum number of threads
+    """
+    for key in NATIVE_THREAD_VARIABLES:
+        os.environ[key] = str(num_threads)
+    _limit_runtime_threads(num_threads)
+
+
+def create_executor(
+    kind: ExecutorKind,
+    workers: int,
+    initializer: Callable[..., Any] | None = None,
+    initargs: tuple[Any, ...] = (),
+) -> Executor:
+    """
+    Create a pool of workers
+
+    Process pools use the "spawn" start method as the underlying HDF5/netCDF libraries
+    are not fork-safe.
+
+    Parameters
+    ----------
+    kind
+        Type of pool to create. Either "thread" or "process"
+    workers
+        Number of workers in the pool
+    initializer
+        Called at the start of each worker
+    initargs
+        Arguments passed to ``initializer``
+
+    Raises
+    ------
+    ValueError
+        An unknown type of executor was requested
+
+    Returns
+    -------
+        Executor ready for use
+    """
+    logger.info(f"Starting {kind} pool with {workers} workers")
+    if kind == "thread":
+        return ThreadPoolExecutor(
+            max_workers=workers, initializer=initializer, initargs=initargs
+        )
+    elif kind == "process":
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs,
+        )
+    raise ValueError(f"Unknown executor: {kind}")
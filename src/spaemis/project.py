@@ -1,18 +1,35 @@
 """
 Project a set of emissions into the future according to a set of scaling methods
 """
-import itertools
+import functools
 import logging
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from itertools import product
+from typing import Any
 
 import numpy as np
 import scmdata
 import xarray as xr
+from attrs import define
+from numpy.typing import NDArray
 
+from spaemis.checkpoint import RunCheckpoint, SliceKey
 from spaemis.config import DownscalingScenarioConfig, PointSource, VariableScalerConfig
+from spaemis.fingerprint import get_slice_fingerprints, hash_inventory, hash_timeseries
+from spaemis.input_data import get_database
 from spaemis.inventory import EmissionsInventory
+from spaemis.output import BaseOutput, InMemoryOutput, OutputCoords
+from spaemis.parallel import (
+    ExecutorKind,
+    create_executor,
+    get_num_workers,
+    get_threads_per_worker,
+    initialise_worker_threads,
+    limit_native_threads,
+)
 from spaemis.scaling import get_scaler_by_config
+from spaemis.scaling.base import SourceKey
+from spaemis.utils import allocate_points, clip_region
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +37,9 @@ logger = logging.getLogger(__name__)
 def scale_inventory(
     cfg: VariableScalerConfig,
     inventory: EmissionsInventory,
-    target_year: int,
-    timeseries: dict[str, scmdata.ScmRun],
+    target_year: int | list[int],
+    timeseries: Mapping[str, scmdata.ScmRun],
+    sources: Mapping[SourceKey, xr.DataArray] | None = None,
 ) -> xr.Dataset:
     """
     Scale a given variable/sector
@@ -33,9 +51,15 @@ def scale_inventory(
     inventory
         Emissions inventory
     target_year
-        Year the data will be scaled according to
+        Year or years the data will be scaled according to
+
+        If a list of years is provided all the years are scaled at once
     timeseries
         Timeseries for use by proxies
+    sources
+        Preloaded input4MIPs sources
+
+        Any sources which are required, but not present are loaded by the scaler
 
     Returns
     -------
@@ -54,89 +78,301 @@ def scale_inventory(
             )
         else:
             raise
-    scaled_field = get_scaler_by_config(cfg.method)(
-        data=field, inventory=inventory, target_year=target_year, timeseries=timeseries
+    target_years = [target_year] if isinstance(target_year, int) else target_year
+    scaled_field = get_scaler_by_config(cfg.method).scale_years(
+        data=field,
+        inventory=inventory,
+        target_years=target_years,
+        timeseries=timeseries,
+        sources=sources,
     )
 
     scaled_field["sector"] = cfg.sector
-    scaled_field["year"] = target_year
+    scaled_field["year"] = target_years
 
-    return scaled_field.expand_dims(["sector", "year"]).to_dataset(name=cfg.variable)
+    return (
+        scaled_field.expand_dims(["sector"])
+        .transpose("sector", "year", "lat", "lon")
+        .to_dataset(name=cfg.variable)
+    )
 
 
-def _create_output_data(
+def _get_output_coords(
     options: Iterable[tuple[str, str]],
     config: DownscalingScenarioConfig,
-    template: xr.Dataset,
-) -> xr.Dataset:
+    inventory: EmissionsInventory,
+) -> OutputCoords:
     unique_variables = sorted(set([variable for variable, _ in options]))
     unique_sectors = sorted(set([sector for _, sector in options]))
     unique_years = sorted(config.timeslices)
 
-    coords = dict(
-        sector=unique_sectors,
-        year=unique_years,
-        lat=template.lat,
-        lon=template.lon,
+    return OutputCoords(
+        variables=unique_variables,
+        sectors=unique_sectors,
+        years=unique_years,
+        lat=inventory.data.lat,
+        lon=inventory.data.lon,
+        cells=inventory.cells,
     )
 
-    return xr.Dataset(
-        data_vars={
-            variable: xr.DataArray(
-                np.nan, coords=coords, dims=("sector", "year", "lat", "lon")
-            )
-            for variable in unique_variables
-        },
-        coords=coords,
-    )
+
+def plan_source_loads(
+    scaling_configs: Iterable[VariableScalerConfig],
+) -> dict[SourceKey | None, list[VariableScalerConfig]]:
+    """
+    Group scaler configuration by the input4MIPs source that they require
+
+    Many scalers use the same input4MIPs source. Grouping the scalers allows for
+    each source to be loaded and preprocessed once.
+
+    Parameters
+    ----------
+    scaling_configs
+        Scaler configuration
+
+    Returns
+    -------
+        Scaler configuration grouped by source
+
+        Scalers which don't require any input4MIPs data are grouped under None. The
+        order of the configuration within each group is preserved.
+    """
+    plan: dict[SourceKey | None, list[VariableScalerConfig]] = {}
+
+    for variable_config in scaling_configs:
+        key = get_scaler_by_config(variable_config.method).source_key
+        plan.setdefault(key, []).append(variable_config)
+
+    return plan
 
 
-def _process_slice(
-    output_ds: xr.Dataset,
+def _load_sources(
+    plan: dict[SourceKey | None, list[VariableScalerConfig]],
     inventory: EmissionsInventory,
-    timeseries: scmdata.ScmRun,
+    years: Iterable[int],
+) -> dict[SourceKey, xr.DataArray]:
+    sources = {}
+    for key, consumers in plan.items():
+        if key is None:
+            continue
+        logger.info(f"Loading source {key} for {len(consumers)} scalers")
+        sources[key] = key.load(inventory, years=years)
+
+    if sources:
+        logger.info(f"Input data cache: {get_database().cache.stats}")
+    return sources
+
+
+@define
+class _SliceContext:
+    """
+    Inputs which are shared by every slice
+    """
+
+    inventory: EmissionsInventory
+    timeseries: Mapping[str, scmdata.ScmRun]
+    sources: Mapping[SourceKey, xr.DataArray]
+
+
+def _calculate_slice(
+    context: _SliceContext,
     variable_config: VariableScalerConfig,
-    year: int,
-) -> None:
+    years: list[int],
+) -> NDArray[np.float_]:
     logger.info(
-        "Processing variable=%s sector=%s year=%i",
+        "Processing variable=%s sector=%s years=%s",
         variable_config.variable,
         variable_config.sector,
-        year,
+        years,
     )
 
-    res = scale_inventory(variable_config, inventory, year, timeseries)
+    res = scale_inventory(
+        variable_config,
+        context.inventory,
+        years,
+        context.timeseries,
+        context.sources,
+    )
 
-    output_ds[variable_config.variable].loc[
-        dict(sector=variable_config.sector, year=year)
-    ] = (
+    # Only the cells within the border are retained
+    return context.inventory.cells.compress(
         res[variable_config.variable]
-        .sel(sector=variable_config.sector, year=year)
-        .values
-    )
-    total_emissions = (
-        output_ds[variable_config.variable]
-        .sel(sector=variable_config.sector, year=year)
-        .sum()
-        .values
+        .sel(sector=variable_config.sector, year=years)
+        .transpose("year", "lat", "lon")
+        .values,
     )
-    logger.info(f"Total: {total_emissions / 1000 / 1000} kt / yr")
 
 
-def calculate_projections(
+def _store_slice(
+    output: BaseOutput,
+    variable_config: VariableScalerConfig,
+    years: list[int],
+    values: NDArray[np.float_],
+) -> None:
+    # Write the whole block of years at once
+    output.write_cells(variable_config.variable, variable_config.sector, years, values)
+
+    total_emissions = np.nansum(values, axis=1)
+    for year, total in zip(years, total_emissions):
+        logger.info(f"Total {year}: {total / 1000 / 1000} kt / yr")
+
+
+def _get_fingerprints(
+    scaling_configs: Iterable[VariableScalerConfig],
+    years: list[int],
+    inventory: EmissionsInventory,
+    timeseries: Mapping[str, scmdata.ScmRun],
+) -> dict[tuple[str, str], dict[int, str]]:
+    inventory_hash = hash_inventory(inventory)
+    timeseries_hashes = {name: hash_timeseries(ts) for name, ts in timeseries.items()}
+
+    return {
+        (cfg.variable, cfg.sector): get_slice_fingerprints(
+            cfg, years, inventory_hash, timeseries_hashes
+        )
+        for cfg in scaling_configs
+    }
+
+
+def _get_remaining_slices(
+    plan: dict[SourceKey | None, list[VariableScalerConfig]],
+    years: list[int],
+    completed: dict[SliceKey, str | None],
+    fingerprints: dict[tuple[str, str], dict[int, str]],
+) -> list[tuple[VariableScalerConfig, list[int]]]:
+    # Only the years which haven't already been completed with the same inputs are
+    # calculated
+    options = []
+    for consumers in plan.values():
+        for variable_config in consumers:
+            key = (variable_config.variable, variable_config.sector)
+            slice_fingerprints = fingerprints.get(key, {})
+            missing_years = [
+                year
+                for year in years
+                if (*key, year) not in completed
+                or completed[(*key, year)] != slice_fingerprints.get(year)
+            ]
+            if missing_years:
+                options.append((variable_config, missing_years))
+    return options
+
+
+# State shared by the slices processed within a worker process
+_worker_state: dict[str, Any] = {}
+
+
+def _initialise_worker(
+    context: _SliceContext,
+    input_paths: list[str],
+    num_threads: int,
+) -> None:
+    initialise_worker_threads(num_threads)
+
+    # Paths registered at runtime aren't visible to newly spawned processes
+    for path in input_paths:
+        get_database().register_path(path)
+
+    _worker_state["context"] = context
+
+
+def _calculate_slice_in_worker(
+    variable_config: VariableScalerConfig, years: list[int]
+) -> NDArray[np.float_]:
+    return _calculate_slice(_worker_state["context"], variable_config, years)
+
+
+def _calculate_slices_in_parallel(
+    options: list[tuple[VariableScalerConfig, list[int]]],
+    context: _SliceContext,
+    executor: ExecutorKind,
+    workers: int,
+) -> Iterator[NDArray[np.float_]]:
+    num_threads = get_threads_per_worker(workers)
+    calculate: Callable[[VariableScalerConfig, list[int]], NDArray[np.float_]]
+    if executor == "process":
+        pool = create_executor(
+            executor,
+            workers,
+            initializer=_initialise_worker,
+            initargs=(context, list(get_database().paths), num_threads),
+        )
+        calculate = _calculate_slice_in_worker
+    else:
+        # Threads share the state of this process so the context is passed directly
+        # which allows multiple projections to be calculated concurrently
+        pool = create_executor(executor, workers)
+        calculate = functools.partial(_calculate_slice, context)
+
+    # Results are yielded in the same order as the options irrespective of the
+    # order in which the workers complete
+    with limit_native_threads(num_threads), pool:
+        yield from pool.map(
+            calculate,
+            [variable_config for variable_config, _ in options],
+            [years for _, years in options],
+        )
+
+
+def calculate_projections(  # noqa: PLR0913
     config: DownscalingScenarioConfig,
     inventory: EmissionsInventory,
-    timeseries: dict[str, scmdata.ScmRun],
+    timeseries: Mapping[str, scmdata.ScmRun],
+    executor: ExecutorKind = "serial",
+    workers: int | None = None,
+    output: BaseOutput | None = None,
+    checkpoint: RunCheckpoint | None = None,
 ) -> xr.Dataset:
     """
     Calculate a projected set of emissions according to some configuration
 
+    Each (variable, sector) slice is independent so the slices can optionally
+    be calculated by a pool of workers. All the timeslices for a given slice are
+    calculated at once. The results are assembled into the output dataset in a
+    deterministic order.
+
+    The scalers are grouped by the input4MIPs sources which they require (see
+    :func:`plan_source_loads`). Each source is loaded and preprocessed once and
+    shared by all the scalers in the group.
+
+    Only the cells within the inventory's border (see
+    :attr:`EmissionsInventory.cells`) are passed between workers and stored.
+    All other cells are nan in the output.
+
     Parameters
     ----------
     config
     inventory
     timeseries
         Optional timeseries
+    executor
+        How the slices are calculated
+
+        One of "serial", "thread" (a pool of threads) or "process" (a pool of
+        processes)
+    workers
+        Number of workers used when ``executor`` isn't "serial"
+
+        Defaults to the number of available CPUs
+    output
+        Where the calculated slices are stored
+
+        Defaults to an :class:`InMemoryOutput` which only allocates memory for the
+        slices which are calculated. An :class:`InMemoryOutput` with a dtype of
+        float32 can be used to halve the memory required. A :class:`NetCDFOutput`
+        or :class:`ZarrOutput` streams each slice to disk as it is calculated.
+    checkpoint
+        Record the completed slices so that an interrupted run can be resumed
+
+        If provided, the projections are written to the checkpoint's run directory
+        and any slices which were completed by a previous run with the same inputs
+        (see :mod:`spaemis.fingerprint`) are not recalculated. Cannot be combined
+        with ``output``.
+
+    Raises
+    ------
+    ValueError
+        Both ``output`` and ``checkpoint`` were provided
 
     Returns
     -------
@@ -164,13 +400,61 @@ def calculate_projections(
                 ),
             )
 
-    options = itertools.product(scaling_configs.values(), config.timeslices)
-    output_ds = _create_output_data(scaling_configs.keys(), config, inventory.data)
+    if output is not None and checkpoint is not None:
+        raise ValueError("Only one of output or checkpoint can be provided")
+
+    coords = _get_output_coords(scaling_configs.keys(), config, inventory)
+    completed: dict[SliceKey, str | None] = {}
+    fingerprints: dict[tuple[str, str], dict[int, str]] = {}
+    if checkpoint is not None:
+        output = checkpoint.create_output(coords)
+        completed = checkpoint.completed()
+        fingerprints = _get_fingerprints(
+            scaling_configs.values(), coords.years, inventory, timeseries
+        )
+    else:
+        output = output or InMemoryOutput()
+        output.declare(coords)
+
+    options = _get_remaining_slices(
+        plan_source_loads(scaling_configs.values()),
+        coords.years,
+        completed,
+        fingerprints,
+    )
+    if completed:
+        logger.info(f"Resuming run. {len(options)} slices to calculate")
+
+    # Sources are only loaded if a remaining slice requires them
+    context = _SliceContext(
+        inventory=inventory,
+        timeseries=timeseries,
+        sources=_load_sources(
+            plan_source_loads(variable_config for variable_config, _ in options),
+            inventory,
+            {year for _, years in options for year in years},
+        ),
+    )
 
-    for opt in options:
-        _process_slice(output_ds, inventory, timeseries, *opt)
+    workers = get_num_workers(workers)
+    if executor == "serial" or workers == 1:
+        results: Iterable[NDArray[np.float_]] = (
+            _calculate_slice(context, *opt) for opt in options
+        )
+    else:
+        results = _calculate_slices_in_parallel(options, context, executor, workers)
+
+    for (variable_config, slice_years), values in zip(options, results):
+        _store_slice(output, variable_config, slice_years, values)
+        if checkpoint is not None:
+            checkpoint.mark_complete(
+                variable_config.variable,
+                variable_config.sector,
+                slice_years,
+                fingerprints.get((variable_config.variable, variable_config.sector)),
+            )
 
-    return output_ds
+    return output.to_dataset()
 
 
 def _process_source(
@@ -182,23 +466,12 @@ def _process_source(
         raise NotImplementedError("Only unit of kg are supported")
 
     num_points = len(point_source.location)
-    d_lat = lat[1] - lat[0]
-    for location in point_source.location:
-        try:
-            # TODO: check that the correct cell is being choosen
-            field_location = field.sel(
-                lat=location[0],
-                lon=location[1],
-                method="nearest",
-                tolerance=np.abs(d_lat.values),
-            )
-
-            field.loc[field_location.lat, field_location.lon] += (
-                point_source.quantity / num_points
-            )
-        except KeyError:
-            # Value not in domain
-            pass
+    if num_points:
+        point_lat, point_lon = zip(*point_source.location)
+        values, _ = allocate_points(
+            lat, lon, point_lat, point_lon, value=point_source.quantity / num_points
+        )
+        field = field.copy(data=values)
 
     field["sector"] = point_source.sector
 
@@ -245,3 +518,45 @@ def calculate_point_sources(
         return xr.merge(slices)
 
     return xr.Dataset()
+
+
+def merge_point_sources(
+    projections: xr.Dataset,
+    point_sources: xr.Dataset,
+    inventory: EmissionsInventory,
+) -> xr.Dataset:
+    """
+    Add gridded point sources to a set of projections
+
+    Parameters
+    ----------
+    projections
+        Projected emissions from :func:`calculate_projections`
+
+        These data are nan outside of the inventory's border
+    point_sources
+        Gridded point sources from :func:`calculate_point_sources`
+
+        The point sources are added to each year of the projections
+    inventory
+        Emissions inventory
+
+        Any point sources outside of the inventory's border are ignored
+
+    Returns
+    -------
+        Dataset containing the union of variables and sectors from the projections
+        and point sources
+    """
+    merged, temp = xr.align(
+        projections.fillna(0), point_sources, join="outer", fill_value=0
+    )
+
+    for variable in temp.data_vars:
+        if variable not in merged.data_vars:
+            merged[variable] = temp[variable]
+        else:
+            merged[variable] += temp[variable]
+
+    del temp  # Save memory
+    return clip_region(merged, inventory.border_mask)
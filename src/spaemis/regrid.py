@@ -0,0 +1,541 @@
+"""
+Regridding with precomputed sparse weights
+
+Interpolating a field from one lat/lon grid onto another is a linear operation, so
+it can be expressed as a sparse matrix of weights which maps each cell of the
+source grid onto each target point. The weights only depend on the two grids, so
+they are calculated once per pair of grids and reused for every variable, sector
+and year. Applying the weights is then a single sparse matrix multiplication.
+
+Two methods are available:
+
+* bilinear - Bilinear interpolation of the source grid onto the target points (see
+  :func:`get_bilinear_regridder`). This matches ``xr.DataArray.interp``
+* conservative - Area-weighted average of the source cells overlapping each target
+  cell (see :func:`get_conservative_regridder`). This preserves the area integral
+  of a field, which is important when moving between grids of different
+  resolution
+
+Weights are cached in memory and on disk (see :class:`spaemis.disk_cache.DiskCache`).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Callable
+from typing import Any, Literal
+
+import numpy as np
+import scipy.sparse  # type: ignore
+import xarray as xr
+from attrs import define
+from numpy.typing import ArrayLike, NDArray
+
+import spaemis
+from spaemis.cells import CELL_DIM
+from spaemis.config import RegridMethod
+from spaemis.disk_cache import DiskCache, make_key
+from spaemis.memory_cache import MemoryCache
+from spaemis.utils import area_grid
+
+logger = logging.getLogger(__name__)
+
+# Regridding weights which are reused between runs
+weights_cache = DiskCache("regrid")
+
+
+@define(frozen=True, eq=False)
+class Regridder:
+    """
+    Sparse linear mapping from a source lat/lon grid onto a set of target points
+
+    Use :func:`get_bilinear_regridder` or :func:`get_conservative_regridder` to
+    create a regridder
+    """
+
+    weights: scipy.sparse.csr_matrix
+    """
+    Weights with shape (number of target points, number of source cells)
+
+    Source cells are flattened in row-major (lat, lon) order. Target points
+    outside of the source grid have no weights.
+    """
+
+    source_shape: tuple[int, int]
+    """Shape of the (lat, lon) source grid"""
+
+    target_dims: tuple[str, ...]
+    """Dimensions of the regridded data"""
+
+    target_shape: tuple[int, ...]
+    """Shape of the target dimensions"""
+
+    target_coords: dict[str, NDArray[np.float_]]
+    """Coordinates of the regridded data"""
+
+    normalise: bool = False
+    """
+    If True, the regridded values are the weighted mean of the non-nan source
+    cells
+
+    Otherwise, the weights are applied directly and any nan source cells with a
+    weight result in nan.
+    """
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the weights
+        """
+        return int(
+            self.weights.data.nbytes
+            + self.weights.indices.nbytes
+            + self.weights.indptr.nbytes
+        )
+
+    def regrid_values(self, values: NDArray[Any]) -> NDArray[np.float_]:
+        """
+        Regrid an array
+
+        Parameters
+        ----------
+        values
+            Array where the last two dimensions are the (lat, lon) source grid
+
+        Raises
+        ------
+        ValueError
+            ``values`` doesn't match the source grid
+
+        Returns
+        -------
+            Array where the last dimension is the target points
+
+            Target points outside of the source grid are nan
+        """
+        values = np.asarray(values, dtype=float)
+        if values.shape[-2:] != self.source_shape:
+            raise ValueError(
+                f"Expected grid of {self.source_shape}, got {values.shape[-2:]}"
+            )
+
+        other_shape = values.shape[:-2]
+        flat = values.reshape(-1, self.source_shape[0] * self.source_shape[1])
+        if self.normalise:
+            valid = ~np.isnan(flat)
+            total = np.asarray(self.weights @ np.where(valid, flat, 0).T, dtype=float)
+            weight = np.asarray(self.weights @ valid.T.astype(float))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                regridded = np.where(weight > 0, total / weight, np.nan).T
+        else:
+            regridded = np.asarray(self.weights @ flat.T, dtype=float).T
+
+        outside = np.diff(self.weights.indptr) == 0
+        regridded[:, outside] = np.nan
+
+        return regridded.reshape(*other_shape, -1)
+
+    def regrid(self, da: xr.DataArray) -> xr.DataArray:
+        """
+        Regrid a DataArray
+
+        Parameters
+        ----------
+        da
+            DataArray with lat and lon dimensions on the source grid
+
+        Returns
+        -------
+            DataArray where the lat and lon dimensions are replaced with
+            :attr:`target_dims`
+        """
+        other_dims = [dim for dim in da.dims if dim not in ("lat", "lon")]
+        da = da.transpose(*other_dims, "lat", "lon")
+
+        values = self.regrid_values(da.values)
+        coords: dict[Any, Any] = {
+            name: coord
+            for name, coord in da.coords.items()
+            if not set(coord.dims) & {"lat", "lon"} and name not in ("lat", "lon")
+        }
+        coords.update(self.target_coords)
+
+        return xr.DataArray(
+            values.reshape(*values.shape[:-1], *self.target_shape),
+            coords=coords,
+            dims=(*other_dims, *self.target_dims),
+            attrs=da.attrs,
+        )
+
+
+def _linear_weights(
+    source: NDArray[np.float_],
+    target: NDArray[np.float_],
+    side: Literal["left", "right"],
+) -> tuple[NDArray[np.intp], NDArray[np.intp], NDArray[np.float_], NDArray[np.bool_]]:
+    # Indices and weights of the two neighbouring source points of each target.
+    # ``side`` determines which pair of neighbours is used for targets which
+    # coincide with a source point
+    if len(source) < 2:  # noqa: PLR2004
+        raise ValueError("At least two source points are required")
+
+    order = np.argsort(source, kind="stable")
+    sorted_source = source[order]
+
+    lower = np.clip(
+        np.searchsorted(sorted_source, target, side=side) - 1, 0, len(source) - 2
+    )
+    upper = lower + 1
+    frac = (target - sorted_source[lower]) / (
+        sorted_source[upper] - sorted_source[lower]
+    )
+    inside = (target >= sorted_source[0]) & (target <= sorted_source[-1])
+
+    return order[lower], order[upper], frac, inside
+
+
+def _calculate_bilinear_weights(
+    source_lat: NDArray[np.float_],
+    source_lon: NDArray[np.float_],
+    target_lat: NDArray[np.float_],
+    target_lon: NDArray[np.float_],
+    side: Literal["left", "right"],
+) -> scipy.sparse.csr_matrix:
+    lat_lower, lat_upper, lat_frac, lat_inside = _linear_weights(
+        source_lat, target_lat, side
+    )
+    lon_lower, lon_upper, lon_frac, lon_inside = _linear_weights(
+        source_lon, target_lon, side
+    )
+    inside = lat_inside & lon_inside
+
+    rows = np.flatnonzero(inside)
+    lat_lower, lat_upper, lat_frac = lat_lower[rows], lat_upper[rows], lat_frac[rows]
+    lon_lower, lon_upper, lon_frac = lon_lower[rows], lon_upper[rows], lon_frac[rows]
+
+    nlon = len(source_lon)
+    corners = [
+        (lat_lower, lon_lower, (1 - lat_frac) * (1 - lon_frac)),
+        (lat_lower, lon_upper, (1 - lat_frac) * lon_frac),
+        (lat_upper, lon_lower, lat_frac * (1 - lon_frac)),
+        (lat_upper, lon_upper, lat_frac * lon_frac),
+    ]
+    weights = scipy.sparse.coo_matrix(
+        (
+            np.concatenate([weight for _, _, weight in corners]),
+            (
+                np.tile(rows, len(corners)),
+                np.concatenate([lat * nlon + lon for lat, lon, _ in corners]),
+            ),
+        ),
+        shape=(len(target_lat), len(source_lat) * nlon),
+    ).tocsr()
+    # Zero weights are retained so that nan values propagate in the same way as
+    # xarray's interp
+
+    return weights
+
+
+def _hash_array(values: NDArray[Any]) -> str:
+    return hashlib.blake2b(
+        np.ascontiguousarray(values, dtype=np.float64).tobytes()
+    ).hexdigest()
+
+
+_regridders: MemoryCache[Regridder] = MemoryCache(
+    max_bytes=512 * 1024**2, sizeof=lambda regridder: regridder.nbytes
+)
+
+
+def _get_weights(
+    key: str, calculate: Callable[[], scipy.sparse.csr_matrix]
+) -> scipy.sparse.csr_matrix:
+    path = weights_cache.get(key, ".npz")
+    if path is not None:
+        try:
+            return scipy.sparse.load_npz(path).tocsr()
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable entry {path}")
+
+    weights = calculate()
+
+    def _write(fname: str) -> None:
+        scipy.sparse.save_npz(fname, weights, compressed=False)
+
+    weights_cache.put(key, ".npz", _write)
+    return weights
+
+
+def get_bilinear_regridder(
+    source_lat: ArrayLike,
+    source_lon: ArrayLike,
+    target_lat: ArrayLike,
+    target_lon: ArrayLike,
+    points: bool = False,
+) -> Regridder:
+    """
+    Get a regridder which performs bilinear interpolation
+
+    The results are equivalent to
+    ``da.interp(lat=target_lat, lon=target_lon, method="linear")``. Target points
+    outside of the source grid are nan.
+
+    Parameters
+    ----------
+    source_lat
+        Latitude of the source grid
+    source_lon
+        Longitude of the source grid
+    target_lat
+        Latitude of the target grid or points
+    target_lon
+        Longitude of the target grid or points
+    points
+        If True, ``target_lat`` and ``target_lon`` are the coordinates of a set of
+        individual points and the regridded data has a ``cell`` dimension.
+        Otherwise, the target is the (lat, lon) grid defined by ``target_lat`` and
+        ``target_lon``
+
+    Returns
+    -------
+        Regridder for the pair of grids
+
+        Regridders are cached so the weights are only calculated once for a given
+        pair of grids
+    """
+    src_lat = np.asarray(source_lat, dtype=np.float64)
+    src_lon = np.asarray(source_lon, dtype=np.float64)
+    dst_lat = np.asarray(target_lat, dtype=np.float64)
+    dst_lon = np.asarray(target_lon, dtype=np.float64)
+
+    target_dims: tuple[str, ...]
+    target_shape: tuple[int, ...]
+    target_coords: dict[str, NDArray[np.float_]]
+    if points:
+        if dst_lat.shape != dst_lon.shape:
+            raise ValueError("Target latitude and longitude must have the same shape")
+        point_lat, point_lon = dst_lat, dst_lon
+        target_dims = (CELL_DIM,)
+        target_shape = dst_lat.shape
+        target_coords = {}
+    else:
+        point_lon, point_lat = (v.reshape(-1) for v in np.meshgrid(dst_lon, dst_lat))
+        target_dims = ("lat", "lon")
+        target_shape = (len(dst_lat), len(dst_lon))
+        target_coords = {"lat": dst_lat, "lon": dst_lon}
+
+    # xarray uses scipy's interp1d for each dimension when interpolating onto a
+    # grid and interpn when interpolating onto points. These differ in the pair of
+    # neighbours used for targets which coincide with a source point.
+    method = "bilinear-points" if points else "bilinear"
+    side: Literal["left", "right"] = "right" if points else "left"
+    key = make_key(
+        spaemis.__version__,
+        method,
+        *(_hash_array(v) for v in (src_lat, src_lon, dst_lat, dst_lon)),
+    )
+
+    def _calculate() -> scipy.sparse.csr_matrix:
+        logger.debug("Calculating bilinear regridding weights")
+        return _calculate_bilinear_weights(src_lat, src_lon, point_lat, point_lon, side)
+
+    def _load() -> Regridder:
+        return Regridder(
+            weights=_get_weights(key, _calculate),
+            source_shape=(len(src_lat), len(src_lon)),
+            target_dims=target_dims,
+            target_shape=target_shape,
+            target_coords=target_coords,
+        )
+
+    return _regridders.get_or_load(key, _load)
+
+
+def get_cell_bounds(centres: ArrayLike) -> NDArray[np.float_]:
+    """
+    Estimate the bounds of grid cells from their centres
+
+    The bounds are halfway between neighbouring centres. The outer bounds are
+    extrapolated using the spacing of the outermost cells.
+
+    Parameters
+    ----------
+    centres
+        Monotonic cell centres
+
+    Returns
+    -------
+        Cell bounds with length ``len(centres) + 1``
+    """
+    centres = np.asarray(centres, dtype=np.float64)
+    if len(centres) < 2:  # noqa: PLR2004
+        raise ValueError("At least two cells are required")
+
+    midpoints = (centres[1:] + centres[:-1]) / 2
+    return np.concatenate(
+        [
+            [centres[0] - (midpoints[0] - centres[0])],
+            midpoints,
+            [centres[-1] + (centres[-1] - midpoints[-1])],
+        ]
+    )
+
+
+def _overlaps(
+    source_bounds: NDArray[np.float_], target_bounds: NDArray[np.float_]
+) -> scipy.sparse.csr_matrix:
+    # Fraction of each source cell covered by each target cell along one dimension
+    source_lower = np.minimum(source_bounds[:-1], source_bounds[1:])
+    source_upper = np.maximum(source_bounds[:-1], source_bounds[1:])
+    target_lower = np.minimum(target_bounds[:-1], target_bounds[1:])
+    target_upper = np.maximum(target_bounds[:-1], target_bounds[1:])
+
+    # Only the source cells between the first and last candidates can overlap
+    order = np.argsort(source_lower, kind="stable")
+    first = np.searchsorted(source_upper[order], target_lower, side="right")
+    last = np.searchsorted(source_lower[order], target_upper, side="left")
+    counts = np.maximum(last - first, 0)
+
+    rows = np.repeat(np.arange(len(target_lower)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = order[np.repeat(first, counts) + offsets]
+
+    overlap = np.minimum(source_upper[cols], target_upper[rows]) - np.maximum(
+        source_lower[cols], target_lower[rows]
+    )
+    keep = overlap > 0
+
+    return scipy.sparse.csr_matrix(
+        (
+            overlap[keep] / (source_upper[cols] - source_lower[cols])[keep],
+            (rows[keep], cols[keep]),
+        ),
+        shape=(len(target_lower), len(source_lower)),
+    )
+
+
+def _calculate_conservative_weights(
+    source_lat: NDArray[np.float_],
+    source_lon: NDArray[np.float_],
+    target_lat: NDArray[np.float_],
+    target_lon: NDArray[np.float_],
+) -> scipy.sparse.csr_matrix:
+    lat_bounds = np.clip(get_cell_bounds(source_lat), -90, 90)
+    target_lat_bounds = np.clip(get_cell_bounds(target_lat), -90, 90)
+
+    # The overlap between two cells is separable in lat and lon. Weights are the
+    # area of each source cell which overlaps each target cell
+    weights = scipy.sparse.kron(
+        _overlaps(lat_bounds, target_lat_bounds),
+        _overlaps(get_cell_bounds(source_lon), get_cell_bounds(target_lon)),
+        format="csr",
+    )
+    areas = area_grid(source_lat, source_lon).values.reshape(-1)
+
+    return scipy.sparse.csr_matrix(weights @ scipy.sparse.diags(areas))
+
+
+def get_conservative_regridder(
+    source_lat: ArrayLike,
+    source_lon: ArrayLike,
+    target_lat: ArrayLike,
+    target_lon: ArrayLike,
+) -> Regridder:
+    """
+    Get a regridder which performs first-order conservative regridding
+
+    Each target cell is the area-weighted mean of the source cells which it
+    overlaps. The cell bounds are estimated from the cell centres (see
+    :func:`get_cell_bounds`) and the area of each source cell is calculated using
+    :func:`spaemis.utils.area_grid`.
+
+    Source cells which are nan are excluded from the mean. Target cells which
+    don't overlap any non-nan source cells are nan.
+
+    Parameters
+    ----------
+    source_lat
+        Latitude of the source grid
+    source_lon
+        Longitude of the source grid
+    target_lat
+        Latitude of the target grid
+    target_lon
+        Longitude of the target grid
+
+    Returns
+    -------
+        Regridder for the pair of grids
+
+        Regridders are cached so the weights are only calculated once for a given
+        pair of grids
+    """
+    src_lat = np.asarray(source_lat, dtype=np.float64)
+    src_lon = np.asarray(source_lon, dtype=np.float64)
+    dst_lat = np.asarray(target_lat, dtype=np.float64)
+    dst_lon = np.asarray(target_lon, dtype=np.float64)
+
+    key = make_key(
+        spaemis.__version__,
+        "conservative",
+        *(_hash_array(v) for v in (src_lat, src_lon, dst_lat, dst_lon)),
+    )
+
+    def _calculate() -> scipy.sparse.csr_matrix:
+        logger.debug("Calculating conservative regridding weights")
+        return _calculate_conservative_weights(src_lat, src_lon, dst_lat, dst_lon)
+
+    def _load() -> Regridder:
+        return Regridder(
+            weights=_get_weights(key, _calculate),
+            source_shape=(len(src_lat), len(src_lon)),
+            target_dims=("lat", "lon"),
+            target_shape=(len(dst_lat), len(dst_lon)),
+            target_coords={"lat": dst_lat, "lon": dst_lon},
+            normalise=True,
+        )
+
+    return _regridders.get_or_load(key, _load)
+
+
+def get_regridder(
+    method: RegridMethod,
+    source_lat: ArrayLike,
+    source_lon: ArrayLike,
+    target_lat: ArrayLike,
+    target_lon: ArrayLike,
+) -> Regridder:
+    """
+    Get a regridder from one lat/lon grid onto another
+
+    Parameters
+    ----------
+    method
+        Regridding method
+
+        See :func:`get_bilinear_regridder` and :func:`get_conservative_regridder`
+    source_lat
+        Latitude of the source grid
+    source_lon
+        Longitude of the source grid
+    target_lat
+        Latitude of the target grid
+    target_lon
+        Longitude of the target grid
+
+    Raises
+    ------
+    ValueError
+        Unknown regridding method
+
+    Returns
+    -------
+        Regridder for the pair of grids
+    """
+    if method == "bilinear":
+        return get_bilinear_regridder(source_lat, source_lon, target_lat, target_lon)
+    elif method == "conservative":
+        return get_conservative_regridder(
+            source_lat, source_lon, target_lat, target_lon
+        )
+    raise ValueError(f"Unknown regridding method: {method}")
@@ -1,22 +1,73 @@
 """
 Base class for scaling emissions
 """
+import logging
+from collections.abc import Iterable, Mapping
 
+import attrs
 import scmdata
 import xarray as xr
+from attrs import define
 
+import spaemis
 from spaemis.config import ScalerMethod
-from spaemis.input_data import SECTOR_MAP, database
+from spaemis.disk_cache import DiskCache, make_key
+from spaemis.input_data import SECTOR_MAP, BoundingBox, get_database
 from spaemis.inventory import EmissionsInventory
-from spaemis.utils import clip_region, weighted_annual_mean
+from spaemis.utils import (
+    clip_region,
+    get_file_identity,
+    hash_geometry,
+    weighted_annual_mean,
+)
 
+logger = logging.getLogger(__name__)
 
-def load_source(
+# Preprocessed annual mean sources
+source_cache = DiskCache("sources")
+
+# Margin (in degrees) around the region of interest which is loaded so that the
+# sources can be interpolated onto the edges of the inventory grid
+SOURCE_HALO = 1.0
+
+
+def get_source_bounds(
+    inventory: EmissionsInventory, halo: float = SOURCE_HALO
+) -> BoundingBox:
+    """
+    Get the region of the input4MIPs data required for an inventory
+
+    Parameters
+    ----------
+    inventory
+        Emissions inventory
+    halo
+        Margin in degrees added around the region
+
+    Returns
+    -------
+        Bounding box covering both the inventory grid and its border
+    """
+    lon_min, lat_min, lon_max, lat_max = inventory.border_mask.total_bounds
+    return BoundingBox.from_grid(
+        inventory.data.lat.values, inventory.data.lon.values, halo=halo
+    ).union(
+        BoundingBox(
+            lon_min=lon_min - halo,
+            lat_min=lat_min - halo,
+            lon_max=lon_max + halo,
+            lat_max=lat_max + halo,
+        )
+    )
+
+
+def load_source(  # noqa: PLR0913
     source_id: str,
     variable_id: str,
     sector: str,
     inventory: EmissionsInventory,
     weighted_temporal_mean: bool = False,
+    years: Iterable[int] | None = None,
 ) -> xr.DataArray:
     """
     Load and preprocess the appropriate input4MIPs data
@@ -34,30 +85,147 @@ def load_source(
     weighted_temporal_mean
         IF True, temporally weight the annual mean to capture the varying number
         of days in each month
+    years
+        Target years which will be interpolated from the source
+
+        If provided, only the years needed to interpolate the target years and
+        the inventory year are loaded. Otherwise, all the available years are
+        loaded.
 
     Returns
     -------
         Annual mean values over the same domain as the inventory data
+
+        The result is cached on disk (see :mod:`spaemis.disk_cache`) and reused
+        while the source files and the inventory's border are unchanged.
     """
-    dataset = database.load(source_id=source_id, variable_id=variable_id)
-    dataset = dataset.sel(sector=SECTOR_MAP.index(sector))
+    database = get_database()
+    bbox = get_source_bounds(inventory)
+    required_years = None if years is None else tuple(sorted({*years, inventory.year}))
+
+    key = make_key(
+        spaemis.__version__,
+        source_id,
+        variable_id,
+        sector,
+        weighted_temporal_mean,
+        hash_geometry(inventory.border_mask),
+        attrs.astuple(bbox),
+        required_years,
+        [
+            get_file_identity(fname)
+            for fname in database.find_files(variable_id, source_id, required_years)
+        ],
+    )
+    cached = source_cache.get_dataarray(key)
+    if cached is not None:
+        logger.info(f"Using cached source {source_id} {variable_id} {sector}")
+        return cached
 
     # The input4MIPS emissions are all in kg/m2/s so we take means rather than sums
-    variable_name = variable_id.replace("-", "_")
     if weighted_temporal_mean:
-        annual_mean = weighted_annual_mean(dataset, variable_name)
+        dataset = database.load(
+            source_id=source_id,
+            variable_id=variable_id,
+            bbox=bbox,
+            years=required_years,
+            sector=SECTOR_MAP.index(sector),
+        )
+        annual_mean = weighted_annual_mean(dataset, variable_id.replace("-", "_"))
     else:
-        annual_mean = dataset[variable_name].groupby("time.year").mean()
+        # Uses the precomputed annual means if the source has been ingested
+        annual_mean = database.load_annual_mean(
+            source_id=source_id,
+            variable_id=variable_id,
+            bbox=bbox,
+            years=required_years,
+            sector=SECTOR_MAP.index(sector),
+        )
 
-    clipped = clip_region(annual_mean, inventory.border_mask)
+    clipped = clip_region(annual_mean, inventory.border_mask).load()
+    source_cache.put_dataarray(key, clipped)
     return clipped
 
 
+@define(frozen=True)
+class SourceKey:
+    """
+    Identifies a preprocessed input4MIPs source
+
+    Scalers which share the same source key can share the result from
+    :func:`load_source`
+    """
+
+    source_id: str
+    variable_id: str
+    sector: str
+
+    def load(
+        self, inventory: EmissionsInventory, years: Iterable[int] | None = None
+    ) -> xr.DataArray:
+        """
+        Load the source
+
+        Parameters
+        ----------
+        inventory
+            Emissions inventory used to clip the source
+        years
+            Target years which will be interpolated from the source
+
+            See :func:`load_source`
+
+        Returns
+        -------
+            Annual mean values over the same domain as the inventory data
+        """
+        return load_source(
+            self.source_id, self.variable_id, self.sector, inventory, years=years
+        )
+
+
+def get_source(
+    key: SourceKey,
+    inventory: EmissionsInventory,
+    sources: Mapping[SourceKey, xr.DataArray] | None = None,
+    years: Iterable[int] | None = None,
+) -> xr.DataArray:
+    """
+    Get a source, reusing preloaded data if available
+
+    Parameters
+    ----------
+    key
+        Source of interest
+    inventory
+        Emissions inventory
+    sources
+        Preloaded sources
+
+        If ``key`` isn't present, the source is loaded using :func:`load_source`
+    years
+        Target years which will be interpolated from the source if it is loaded
+
+        Preloaded sources must already include these years
+
+    Returns
+    -------
+        Annual mean values over the same domain as the inventory data
+    """
+    if sources is not None and key in sources:
+        return sources[key]
+    return key.load(inventory, years=years)
+
+
 class BaseScaler:
     """
     Scaling calculator
 
     Used to modify a dataset using a scaling method
+
+    Scalers implement :meth:`__call__` which scales to a single year. Expensive
+    scalers should instead derive from :class:`BatchedScaler` so any loading or
+    regridding can be shared across all the target years.
     """
 
     def __call__(
@@ -66,7 +234,8 @@ class BaseScaler:
         data: xr.DataArray,
         inventory: EmissionsInventory,
         target_year: int,
-        timeseries: dict[str, scmdata.ScmRun],
+        timeseries: Mapping[str, scmdata.ScmRun] | None = None,
+        sources: Mapping[SourceKey, xr.DataArray] | None = None,
     ) -> xr.DataArray:
         """
         Run a scaler
@@ -81,6 +250,8 @@ class BaseScaler:
             Year to scale to
         timeseries
             Additional timeseries for use by the scaler if needed
+        sources
+            Preloaded input4MIPs sources for use by the scaler if needed
 
         Returns
         -------
@@ -88,6 +259,59 @@ class BaseScaler:
         """
         raise NotImplementedError
 
+    def scale_years(
+        self,
+        *,
+        data: xr.DataArray,
+        inventory: EmissionsInventory,
+        target_years: list[int],
+        timeseries: Mapping[str, scmdata.ScmRun] | None = None,
+        sources: Mapping[SourceKey, xr.DataArray] | None = None,
+    ) -> xr.DataArray:
+        """
+        Run a scaler for a number of target years
+
+        By default, the scaler is called once per target year.
+
+        Parameters
+        ----------
+        data
+            Data to scale
+        inventory
+            Emissions inventory
+        target_years
+            Years to scale to
+        timeseries
+            Additional timeseries for use by the scaler if needed
+        sources
+            Preloaded input4MIPs sources for use by the scaler if needed
+
+        Returns
+        -------
+            Scaled data with dimensions (year, lat, lon)
+        """
+        scaled = [
+            self(
+                data=data,
+                inventory=inventory,
+                target_year=target_year,
+                timeseries=timeseries,
+                sources=sources,
+            )
+            for target_year in target_years
+        ]
+
+        return xr.concat(scaled, dim="year").assign_coords(year=target_years)
+
+    @property
+    def source_key(self) -> SourceKey | None:
+        """
+        input4MIPs source used by the scaler
+
+        None if the scaler doesn't use any input4MIPs data
+        """
+        return None
+
     @classmethod
     def create_from_config(cls, method: ScalerMethod) -> "BaseScaler":
         """
@@ -103,3 +327,80 @@ class BaseScaler:
             New scaler instance configured according to the configuration
         """
         raise NotImplementedError
+
+
+class BatchedScaler(BaseScaler):
+    """
+    Scaler which scales to a number of target years at once
+
+    Subclasses implement :meth:`scale_years`. Scaling to a single year uses the
+    batched form with a single target year.
+    """
+
+    def __call__(
+        self,
+        *,
+        data: xr.DataArray,
+        inventory: EmissionsInventory,
+        target_year: int,
+        timeseries: Mapping[str, scmdata.ScmRun] | None = None,
+        sources: Mapping[SourceKey, xr.DataArray] | None = None,
+    ) -> xr.DataArray:
+        """
+        Run a scaler
+
+        Parameters
+        ----------
+        data
+            Data to scale
+        inventory
+            Emissions inventory
+        target_year
+            Year to scale to
+        timeseries
+            Additional timeseries for use by the scaler if needed
+        sources
+            Preloaded input4MIPs sources for use by the scaler if needed
+
+        Returns
+        -------
+            Scaled data
+        """
+        return self.scale_years(
+            data=data,
+            inventory=inventory,
+            target_years=[target_year],
+            timeseries=timeseries,
+            sources=sources,
+        ).sel(year=target_year, drop=True)
+
+    def scale_years(
+        self,
+        *,
+        data: xr.DataArray,
+        inventory: EmissionsInventory,
+        target_years: list[int],
+        timeseries: Mapping[str, scmdata.ScmRun] | None = None,
+        sources: Mapping[SourceKey, xr.DataArray] | None = None,
+    ) -> xr.DataArray:
+        """
+        Run a scaler for a number of target years
+
+        Parameters
+        ----------
+        data
+            Data to scale
+        inventory
+            Emissions inventory
+        target_years
+            Years to scale to
+        timeseries
+            Additional timeseries for use by the scaler if needed
+        sources
+            Preloaded input4MIPs sources for use by the scaler if needed
+
+        Returns
+        -------
+            Scaled data with dimensions (year, lat, lon)
+        """
+        raise NotImplementedError
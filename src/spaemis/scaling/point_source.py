@@ -6,9 +6,9 @@ Split a timeseries of emissions across a number of points
 """
 import logging
 import os
+from collections.abc import Mapping
 from typing import Any
 
-import numpy as np
 import pandas as pd
 import scmdata
 import xarray as xr
@@ -17,14 +17,36 @@ from attrs import define
 from spaemis.config import PointSourceMethod, ScalerMethod
 from spaemis.constants import RAW_DATA_DIR
 from spaemis.inventory import EmissionsInventory
-from spaemis.utils import clip_region
+from spaemis.utils import allocate_points, clip_region
 
-from .base import BaseScaler
-from .timeseries import apply_amount, get_timeseries_point
+from .base import BatchedScaler
+from .timeseries import _get_annual_amounts, apply_amount, get_annual_timeseries
 
 logger = logging.getLogger(__name__)
 
 
+def get_point_source_path(point_sources: str) -> str:
+    """
+    Get the location of a file of point sources
+
+    Parameters
+    ----------
+    point_sources
+        Filename of the point sources
+
+    Returns
+    -------
+        Path within the directory specified by the `SPAEMIS_POINT_SOURCE_DIRECTORY`
+        environment variable. This defaults to
+        `data/raw/configuration/point_sources`
+    """
+    point_source_directory = os.environ.get(
+        "SPAEMIS_POINT_SOURCE_DIRECTORY",
+        os.path.join(RAW_DATA_DIR, "configuration", "point_sources"),
+    )
+    return os.path.join(point_source_directory, point_sources)
+
+
 @define
 class Point:
     """
@@ -36,7 +58,7 @@ class Point:
 
 
 @define
-class PointSourceScaler(BaseScaler):
+class PointSourceScaler(BatchedScaler):
     """
     Split emissions across some point sources
     """
@@ -45,59 +67,48 @@ class PointSourceScaler(BaseScaler):
     source_timeseries: str
     source_filters: list[dict[str, Any]]
 
-    def __call__(
+    def scale_years(
         self,
         *,
         data: xr.DataArray,
         inventory: EmissionsInventory,
-        target_year: int,
-        timeseries: dict[str, scmdata.ScmRun],
+        target_years: list[int],
+        timeseries: Mapping[str, scmdata.ScmRun] | None = None,
         **kwargs: Any,
     ) -> xr.DataArray:
         """
-        Apply scaling
+        Apply scaling for a number of target years
 
         Parameters
         ----------
         data
             Timeseries to scale
         inventory
+        target_years
+            Years to scale to
         timeseries
             Timeseries data used by the proxy
         kwargs
 
         Returns
         -------
-        Scaled data
+        Scaled data with dimensions (year, lat, lon)
         """
-        ts = get_timeseries_point(
-            timeseries,
-            self.source_timeseries,
-            self.source_filters,
-            target_year=target_year,
+        annual = get_annual_timeseries(
+            timeseries or {}, self.source_timeseries, self.source_filters
         )
 
         scaled = data.copy()
         scaled = clip_region(scaled, inventory.border_mask)
-        scaled[:, :] = 0
 
         num_points = len(self.point_sources)
-        num_valid_points = 0
-        d_lat = scaled.lat[1] - scaled.lat[0]
-        for source in self.point_sources:
-            try:
-                field_location = scaled.sel(
-                    lat=source.lat,
-                    lon=source.lon,
-                    method="nearest",
-                    tolerance=np.abs(d_lat.values),
-                )
-
-                scaled.loc[field_location.lat, field_location.lon] += 1
-                num_valid_points += 1
-            except KeyError:
-                # Value not in domain
-                pass
+        field, num_valid_points = allocate_points(
+            scaled.lat,
+            scaled.lon,
+            [source.lat for source in self.point_sources],
+            [source.lon for source in self.point_sources],
+        )
+        scaled = scaled.copy(data=field)
 
         if num_points == 0:
             raise ValueError("No point sources are available")
@@ -106,8 +117,8 @@ class PointSourceScaler(BaseScaler):
         portion_in_domain = num_valid_points / float(num_points)
         logger.info(f"{num_valid_points} / {num_points} points sources are in domain.")
 
-        amount = ts.values.squeeze() * portion_in_domain
-        unit = ts.get_unique_meta("unit", True)
+        amount = _get_annual_amounts(annual, target_years) * portion_in_domain
+        unit = annual.unit
         return apply_amount(amount, unit, scaled)
 
     @classmethod
@@ -123,14 +134,7 @@ class PointSourceScaler(BaseScaler):
         if not isinstance(method, PointSourceMethod):
             raise TypeError("Incompatible configuration")
 
-        point_source_directory = os.environ.get(
-            "SPAEMIS_POINT_SOURCE_DIRECTORY",
-            os.path.join(RAW_DATA_DIR, "configuration", "point_sources"),
-        )
-
-        point_info = pd.read_csv(
-            os.path.join(point_source_directory, method.point_sources)
-        )
+        point_info = pd.read_csv(get_point_source_path(method.point_sources))
         points = [
             Point(lat=item["lat"], lon=item["lon"])
             for item in point_info.to_dict("records")
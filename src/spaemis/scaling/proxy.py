@@ -5,8 +5,11 @@ A proxy scaler uses a proxy (a 2d pattern) to disaggregate an emissions timeseri
 
 The proxy must cover the area of interest of the emissions timeseries
 """
+import glob
+import hashlib
 import logging
 import os
+from collections.abc import Callable, Mapping
 from typing import Any
 
 import numpy as np
@@ -14,16 +17,70 @@ import numpy.testing as npt
 import xarray as xr
 from attrs import define
 
-from spaemis.config import ProxyMethod, ScalerMethod
+import spaemis
+from spaemis.config import ProxyMethod, RegridMethod, ScalerMethod
 from spaemis.constants import PROCESSED_DATA_DIR
+from spaemis.disk_cache import DiskCache, make_key
 from spaemis.input_data import SECTOR_MAP
-from spaemis.inventory import EmissionsInventory, load_inventory
-from spaemis.utils import area_grid, clip_region, covers
-
-from .base import BaseScaler, load_source
+from spaemis.inventory import (
+    EmissionsInventory,
+    get_inventory_directory,
+    load_inventory,
+)
+from spaemis.memory_cache import MemoryCache
+from spaemis.regrid import get_regridder
+from spaemis.utils import (
+    area_grid,
+    clip_region,
+    covers,
+    get_file_identity,
+    get_grid_signature,
+    hash_geometry,
+)
+
+from .base import BatchedScaler, SourceKey, get_source
 
 logger = logging.getLogger(__name__)
 
+# Normalised proxy densities on the target grids
+proxy_cache = DiskCache("proxies")
+_proxies: MemoryCache[xr.DataArray] = MemoryCache()
+
+
+def get_proxy_path(proxy_name: str) -> str | None:
+    """
+    Get the precalculated file used by a proxy
+
+    See :func:`get_proxy` for the location of these files
+
+    Parameters
+    ----------
+    proxy_name
+        Name of proxy
+
+    Returns
+    -------
+        Path to the file containing the proxy or None if the proxy isn't read from
+        a file
+    """
+    root_dir = os.environ.get(
+        "SPAEMIS_PROXY_DIRECTORY", os.path.join(PROCESSED_DATA_DIR, "proxies")
+    )
+
+    proxies = {
+        "population": os.path.join(
+            root_dir,
+            "sedacs",
+            "popdynamics-base_year-2000-rev01-byr.nc",
+        ),
+        "residential_density": os.path.join(
+            root_dir,
+            "ga",
+            "NEXIS_Residential_Dwelling_Density.nc",
+        ),
+    }
+    return proxies.get(proxy_name.split("|")[0])
+
 
 def get_proxy(proxy_name: str, inventory: EmissionsInventory) -> xr.DataArray:
     """
@@ -58,27 +115,11 @@ def get_proxy(proxy_name: str, inventory: EmissionsInventory) -> xr.DataArray:
 
         The latitude/longitude grid of the proxy may differ depending on the choice
     """
-    root_dir = os.environ.get(
-        "SPAEMIS_PROXY_DIRECTORY", os.path.join(PROCESSED_DATA_DIR, "proxies")
-    )
-
     proxy_toks = proxy_name.split("|")
 
-    proxies = {
-        "population": os.path.join(
-            root_dir,
-            "sedacs",
-            "popdynamics-base_year-2000-rev01-byr.nc",
-        ),
-        "residential_density": os.path.join(
-            root_dir,
-            "ga",
-            "NEXIS_Residential_Dwelling_Density.nc",
-        ),
-    }
-
-    if proxy_toks[0] in proxies:
-        return xr.load_dataset(proxies[proxy_toks[0]])[proxy_toks[0]]
+    path = get_proxy_path(proxy_name)
+    if path is not None:
+        return xr.load_dataset(path)[proxy_toks[0]]
     elif proxy_toks[0] == "inventory":
         sector = proxy_toks[1]
         return inventory.data["NOx"].sel(sector=sector)
@@ -90,8 +131,178 @@ def get_proxy(proxy_name: str, inventory: EmissionsInventory) -> xr.DataArray:
     raise ValueError("Unknown proxy")
 
 
+def get_proxy_files(proxy_name: str) -> list[str]:
+    """
+    Get the files which are read by a proxy
+
+    Proxies derived from the current inventory don't read any files
+
+    Parameters
+    ----------
+    proxy_name
+        Name of proxy (see :func:`get_proxy`)
+
+    Returns
+    -------
+        Paths of the files used by the proxy
+    """
+    path = get_proxy_path(proxy_name)
+    if path is not None:
+        return [path]
+    elif proxy_name.split("|")[0] == "australian_inventory":
+        return sorted(
+            glob.glob(os.path.join(get_inventory_directory("australia", 2016), "*"))
+        )
+    return []
+
+
+# Identity of the proxies derived from the most recently used inventory
+_inventory_proxy_identities: tuple[EmissionsInventory | None, dict[str, str]] = (
+    None,
+    {},
+)
+
+
+def _hash_proxy(proxy: xr.DataArray) -> str:
+    hasher = hashlib.blake2b(get_grid_signature(proxy.lat, proxy.lon).encode())
+    hasher.update(np.ascontiguousarray(proxy.transpose("lat", "lon").values).tobytes())
+    return hasher.hexdigest()
+
+
+def _get_proxy_identity(proxy_name: str, inventory: EmissionsInventory) -> Any:
+    global _inventory_proxy_identities  # noqa: PLW0603
+
+    if proxy_name.split("|")[0] != "inventory":
+        return [get_file_identity(fname) for fname in get_proxy_files(proxy_name)]
+
+    # Proxies derived from the current inventory are identified by their content.
+    # The inventory isn't modified during a run so this is only hashed once
+    owner, identities = _inventory_proxy_identities
+    if owner is not inventory:
+        identities = {}
+        _inventory_proxy_identities = (inventory, identities)
+    if proxy_name not in identities:
+        identities[proxy_name] = _hash_proxy(get_proxy(proxy_name, inventory))
+    return identities[proxy_name]
+
+
+def _get_or_create(key: str, create: Callable[[], xr.DataArray]) -> xr.DataArray:
+    def _load() -> xr.DataArray:
+        cached = proxy_cache.get_dataarray(key)
+        if cached is not None:
+            return cached
+
+        da = create()
+        proxy_cache.put_dataarray(key, da)
+        return da
+
+    return _proxies.get_or_load(key, _load)
+
+
+def get_proxy_density(  # noqa: PLR0913
+    proxy_name: str,
+    inventory: EmissionsInventory,
+    lat: xr.DataArray,
+    lon: xr.DataArray,
+    regrid: RegridMethod = "bilinear",
+    clip_before_regrid: bool = False,
+) -> xr.DataArray:
+    """
+    Get the normalised density of a proxy on a target grid
+
+    The proxy is regridded onto the target grid and clipped to the border of the
+    inventory. The result is cached in memory and on disk using the identity of the
+    proxy, the target grid and the border so a proxy is only prepared once.
+
+    Parameters
+    ----------
+    proxy_name
+        Name of proxy (see :func:`get_proxy`)
+    inventory
+        Emissions inventory
+    lat
+        Latitude of the target grid
+    lon
+        Longitude of the target grid
+    regrid
+        Method used to regrid the proxy (see :func:`spaemis.regrid.get_regridder`)
+    clip_before_regrid
+        If True, the proxy is clipped to the border on its original grid and then
+        linearly interpolated onto the target grid
+
+    Returns
+    -------
+        Proxy density with dimensions (lat, lon) which sums to 1
+
+        The result is shared between callers so must not be modified
+    """
+    key = make_key(
+        spaemis.__version__,
+        "density",
+        proxy_name,
+        _get_proxy_identity(proxy_name, inventory),
+        get_grid_signature(lat, lon),
+        hash_geometry(inventory.border_mask),
+        regrid,
+        clip_before_regrid,
+    )
+
+    def _create() -> xr.DataArray:
+        logger.info(f"Preparing {proxy_name} proxy")
+        proxy = get_proxy(proxy_name, inventory=inventory)
+
+        if clip_before_regrid:
+            proxy_interp = clip_region(proxy, inventory.border_mask).interp(
+                lat=lat, lon=lon
+            )
+        else:
+            # proxy grid is regridded onto the target grid before clipping
+            regridder = get_regridder(regrid, proxy.lat, proxy.lon, lat, lon)
+            # The clipped proxy is interpolated onto the target grid again which
+            # also masks the cells next to the border
+            proxy_interp = clip_region(
+                regridder.regrid(proxy), inventory.border_mask
+            ).interp(lat=lat, lon=lon)
+
+        return proxy_interp / proxy_interp.sum()
+
+    return _get_or_create(key, _create)
+
+
+def get_proxy_share(proxy_name: str, inventory: EmissionsInventory) -> xr.DataArray:
+    """
+    Get the fraction of a proxy which is within the border of an inventory
+
+    The result is cached in the same way as :func:`get_proxy_density`
+
+    Parameters
+    ----------
+    proxy_name
+        Name of proxy (see :func:`get_proxy`)
+    inventory
+        Emissions inventory
+
+    Returns
+    -------
+        Scalar fraction of the proxy within the border
+    """
+    key = make_key(
+        spaemis.__version__,
+        "share",
+        proxy_name,
+        _get_proxy_identity(proxy_name, inventory),
+        hash_geometry(inventory.border_mask),
+    )
+
+    def _create() -> xr.DataArray:
+        proxy = get_proxy(proxy_name, inventory=inventory)
+        return clip_region(proxy, inventory.border_mask).sum() / proxy.sum()
+
+    return _get_or_create(key, _create)
+
+
 @define
-class ProxyScaler(BaseScaler):
+class ProxyScaler(BatchedScaler):
     """
     Combine global emissions with a proxy
 
@@ -103,73 +314,86 @@ class ProxyScaler(BaseScaler):
     variable_id: str
     source_id: str
     sector: str
+    regrid: RegridMethod = "bilinear"
 
-    def __call__(
+    def scale_years(
         self,
         *,
         data: xr.DataArray,
         inventory: EmissionsInventory,
-        target_year: int,
+        target_years: list[int],
+        sources: Mapping[SourceKey, xr.DataArray] | None = None,
         **kwargs: Any,
     ) -> xr.DataArray:
         """
-        Apply scaling
+        Apply scaling for a number of target years
+
+        The proxy density is only calculated once for all target years and is
+        reused by other scalers with the same proxy (see
+        :func:`get_proxy_density`)
 
         Parameters
         ----------
         data
             Timeseries to scale
         inventory
-        timeseries
-            Timeseries data used by the proxy
+        target_years
+            Years to scale to
+        sources
+            Preloaded input4MIPs sources
+
+            The source is loaded if not present
         kwargs
 
         Returns
         -------
-            Scaled data
+            Scaled data with dimensions (year, lat, lon)
         """
-        source = load_source(
-            self.source_id,
-            self.variable_id,
-            self.sector,
-            inventory,
-        )
+        source = get_source(self.source_key, inventory, sources, years=target_years)
         if tuple(sorted(source.dims)) != ("lat", "lon", "year"):  # type: ignore
             raise AssertionError(
                 f"Excepted only lat, lon and year dims. Got: {source.dims}"
             )
 
-        if not covers(source, "year", target_year):
-            logger.warning(
-                f"source {source.name} does not cover target year. Extrapolating"
-            )
+        for target_year in target_years:
+            if not covers(source, "year", target_year):
+                logger.warning(
+                    f"source {source.name} does not cover target year {target_year}. "
+                    "Extrapolating"
+                )
 
         if source.attrs["units"] != "kg m-2 s-1":
             raise AssertionError(f"Unexpected units: {source.attrs['units']}")
         areas = area_grid(source.lat, source.lon)
-        source_emissions = source.interp(year=target_year) * areas * 365 * 24 * 60 * 60
+        source_emissions = (
+            source.interp(year=list(target_years)) * areas * 365 * 24 * 60 * 60
+        )
         source_emissions.attrs["units"] = "kg / cell / yr"
 
-        total_emms = source_emissions.sum().values.squeeze()
-
-        lat = data.lat
-        lon = data.lon
+        total_emms = source_emissions.sum(dim=("lat", "lon"))
 
         # Calculate density map over the area of interest
-        # proxy grid is interpolated onto the target grid before clipping
-        proxy = get_proxy(self.proxy, inventory=inventory)
-
-        proxy_interp = clip_region(
-            proxy.interp(lat=lat, lon=lon), inventory.border_mask
-        ).interp(lat=lat, lon=lon)
-        proxy_density = proxy_interp / proxy_interp.sum()
+        proxy_density = get_proxy_density(
+            self.proxy, inventory, data.lat, data.lon, regrid=self.regrid
+        )
         npt.assert_allclose(proxy_density.sum().values, np.asarray(1))
 
-        scaled: xr.DataArray = total_emms * proxy_density  # type: ignore
+        scaled: xr.DataArray = (total_emms * proxy_density).transpose(
+            "year", "lat", "lon"
+        )
         scaled.attrs["units"] = "kg / cell / yr"
 
         return scaled
 
+    @property
+    def source_key(self) -> SourceKey:
+        """
+        input4MIPs source used by the scaler
+        """
+        return SourceKey(
+            source_id=self.source_id, variable_id=self.variable_id, sector=self.sector
+        )
+
     @classmethod
     def create_from_config(cls, method: ScalerMethod) -> "ProxyScaler":
         """
@@ -185,4 +409,5 @@ class ProxyScaler(BaseScaler):
             variable_id=method.variable_id,
             source_id=method.source_id,
             sector=method.sector,
+            regrid=method.regrid,
         )
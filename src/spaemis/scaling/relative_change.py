@@ -3,23 +3,26 @@ Scale using the relative change seen in input4MIPs
 """
 
 import logging
+from collections.abc import Mapping
 from typing import Any
 
 import xarray as xr
 from attrs import define
 
-from spaemis.config import RelativeChangeMethod, ScalerMethod
+from spaemis.cells import CELL_DIM
+from spaemis.config import RegridMethod, RelativeChangeMethod, ScalerMethod
 from spaemis.input_data import SECTOR_MAP
 from spaemis.inventory import EmissionsInventory
+from spaemis.regrid import get_bilinear_regridder, get_regridder
 from spaemis.utils import covers
 
-from .base import BaseScaler, load_source
+from .base import BatchedScaler, SourceKey, get_source
 
 logger = logging.getLogger(__name__)
 
 
 @define
-class RelativeChangeScaler(BaseScaler):
+class RelativeChangeScaler(BatchedScaler):
     """
     Apply the relative change from one timeseries
 
@@ -29,17 +32,24 @@ class RelativeChangeScaler(BaseScaler):
     variable_id: str
     source_id: str
     sector: str
+    regrid: RegridMethod = "bilinear"
 
-    def __call__(
+    def scale_years(
         self,
         *,
         data: xr.DataArray,
         inventory: EmissionsInventory,
-        target_year: int,
+        target_years: list[int],
+        sources: Mapping[SourceKey, xr.DataArray] | None = None,
         **kwargs: Any,
     ) -> xr.DataArray:
         """
-        Run a scaler
+        Run a scaler for a number of target years
+
+        The source data are loaded and regridded once for all target years using
+        precomputed regridding weights (see :mod:`spaemis.regrid`). If the data is
+        on the inventory grid, only the cells within the inventory's border are
+        scaled.
 
         Parameters
         ----------
@@ -47,19 +57,18 @@ class RelativeChangeScaler(BaseScaler):
             Data to scale
         inventory
             Emissions inventory
-        target_year
-            Year to scale to
+        target_years
+            Years to scale to
+        sources
+            Preloaded input4MIPs sources
+
+            The source is loaded if not present
 
         Returns
         -------
-            Scaled data
+            Scaled data with dimensions (year, lat, lon)
         """
-        source = load_source(
-            self.source_id,
-            self.variable_id,
-            self.sector,
-            inventory,
-        )
+        source = get_source(self.source_key, inventory, sources, years=target_years)
         if tuple(sorted(source.dims)) != ("lat", "lon", "year"):  # type: ignore
             raise AssertionError(
                 f"Excepted only lat, lon and year dims. Got: {source.dims}"
@@ -69,10 +78,12 @@ class RelativeChangeScaler(BaseScaler):
             logger.warning(
                 f"source {source.name} does not cover inventory year. Extrapolating"
             )
-        if not covers(source, "year", target_year):
-            logger.warning(
-                f"source {source.name} does not cover target year. Extrapolating"
-            )
+        for target_year in target_years:
+            if not covers(source, "year", target_year):
+                logger.warning(
+                    f"source {source.name} does not cover target year {target_year}. "
+                    "Extrapolating"
+                )
 
         # Get the target and inventory year data (extrapolating if necessary)
         inv_year_map = source.interp(
@@ -80,20 +91,53 @@ class RelativeChangeScaler(BaseScaler):
             kwargs={"fill_value": "extrapolate"},
         )
         target_year_map = source.interp(
-            year=target_year,
+            year=list(target_years),
             kwargs={"fill_value": "extrapolate"},
         )
 
         scale_factor = (target_year_map - inv_year_map) / inv_year_map
 
-        # Regrid using linear interpolation
-        scale_factor = scale_factor.interp(lat=data.lat, lon=data.lon)
-
-        scaled = data * (1 + scale_factor)
+        cells = inventory.cells
+        on_inventory_grid = cells.matches(data.lat, data.lon)
+        if self.regrid == "bilinear" and on_inventory_grid:
+            # Only the cells within the border are interpolated
+            scale_factor = get_bilinear_regridder(
+                source.lat, source.lon, cells.cell_lat, cells.cell_lon, points=True
+            ).regrid(scale_factor)
+        else:
+            scale_factor = get_regridder(
+                self.regrid, source.lat, source.lon, data.lat, data.lon
+            ).regrid(scale_factor)
+            if on_inventory_grid:
+                scale_factor = cells.compress_dataarray(
+                    scale_factor.where(xr.DataArray(cells.mask, dims=("lat", "lon")))
+                )
+
+        if not on_inventory_grid:
+            scaled = (data * (1 + scale_factor)).transpose("year", *data.dims)
+            scaled.attrs.update(data.attrs)
+
+            return scaled
+
+        # Only the cells within the border are scaled
+        data_cells = cells.compress_dataarray(data)
+
+        scaled = cells.expand_dataarray(
+            (data_cells * (1 + scale_factor)).transpose("year", CELL_DIM)
+        )
         scaled.attrs.update(data.attrs)
 
         return scaled
 
+    @property
+    def source_key(self) -> SourceKey:
+        """
+        input4MIPs source used by the scaler
+        """
+        return SourceKey(
+            source_id=self.source_id, variable_id=self.variable_id, sector=self.sector
+        )
+
     @classmethod
     def create_from_config(cls, method: ScalerMethod) -> "RelativeChangeScaler":
         """
@@ -109,4 +153,5 @@ class RelativeChangeScaler(BaseScaler):
             source_id=method.source_id,
             variable_id=method.variable_id,
             sector=method.sector,
+            regrid=method.regrid,
         )
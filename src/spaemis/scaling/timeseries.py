@@ -5,25 +5,27 @@ A proxy scaler uses a proxy (a 2d pattern) to disaggregate an emissions timeseri
 
 The proxy must cover the area of interest of the emissions timeseries
 """
+import functools
 import logging
+from collections.abc import Mapping
 from typing import Any
 
+import numpy as np
 import scmdata
 import xarray as xr
 from attrs import define
 
 from spaemis.config import ScalerMethod, TimeseriesMethod
-from spaemis.input_data import _apply_filters
+from spaemis.input_data import AnnualTimeseries, TimeseriesIndex, apply_filters
 from spaemis.inventory import EmissionsInventory
-from spaemis.unit_registry import convert_to_target_unit, unit_registry
-from spaemis.utils import clip_region
+from spaemis.unit_registry import get_unit_conversion, unit_registry
 
-from .base import BaseScaler
-from .proxy import get_proxy
+from .base import BatchedScaler
+from .proxy import get_proxy_density, get_proxy_share
 
 
 def get_timeseries_point(
-    timeseries: dict[str, scmdata.ScmRun],
+    timeseries: Mapping[str, scmdata.ScmRun],
     source: str,
     filters: list[dict[str, str]],
     target_year: int,
@@ -58,32 +60,114 @@ def get_timeseries_point(
 
         This object will retain the metadata of the filtered timeseries
     """
-    try:
-        ts = timeseries[source]
-    except KeyError as exc:
-        raise ValueError(f"Source dataset is not loaded: {source}") from exc
+    return get_timeseries_points(timeseries, source, filters, [target_year])
 
-    # This linearly interpolates the timeseries
-    ts = _apply_filters(ts, filters).resample("AS")
 
-    if len(ts) == 0:
-        raise ValueError(f"No data matching {filters} was found in {source} input data")
+def get_timeseries_points(
+    timeseries: Mapping[str, scmdata.ScmRun],
+    source: str,
+    filters: list[dict[str, str]],
+    target_years: list[int],
+) -> scmdata.ScmRun:
+    """
+    Extract values for a number of years according to some filters
 
-    if len(ts) > 1:
-        raise ValueError(
-            f"More than one match was found for {filters} in {source} input data"
-        )
+    Parameters
+    ----------
+    timeseries
+        Collection of loaded timeseries
+    source
+        Timeseries name
+    filters
+        Filter to apply to the selected timeseries
 
-    if target_year not in ts["year"].values:
-        raise ValueError(f"No timeseries data for year={target_year} available")
+        These filters if applied must result in a single remaining timeseries otherwise
+        a ``ValueError`` will be raised.
+    target_years
+        Years to extract
+
+        Must be contained in the targeted timeseries
+
+    Raises
+    ------
+    ValueError
+        If the selected data cannot be retrieved
 
-    ts = ts.filter(year=target_year)
+    Returns
+    -------
+        ScmRun with a containing a single timeseries and the requested years.
+
+        This object will retain the metadata of the filtered timeseries
+    """
+    annual = get_annual_timeseries(timeseries, source, filters)
+    # Check that the years are available
+    annual.get_values(target_years)
 
-    if ts.shape != (1, 1):
+    ts = annual.run.filter(year=target_years)
+
+    if ts.shape != (1, len(set(target_years))):
         raise AssertionError("Something went wrong when filtering timeseries")
     return ts
 
 
+def get_annual_timeseries(
+    timeseries: Mapping[str, scmdata.ScmRun],
+    source: str,
+    filters: list[dict[str, Any]],
+) -> AnnualTimeseries:
+    """
+    Get the annual values of a single timeseries according to some filters
+
+    If ``timeseries`` is a :class:`spaemis.input_data.TimeseriesIndex`, the
+    prepared values are looked up. Otherwise, the source timeseries is filtered and
+    resampled.
+
+    Parameters
+    ----------
+    timeseries
+        Collection of loaded timeseries
+    source
+        Timeseries name
+    filters
+        Filter to apply to the selected timeseries
+
+        These filters if applied must result in a single remaining timeseries otherwise
+        a ``ValueError`` will be raised.
+
+    Raises
+    ------
+    ValueError
+        If the selected data cannot be retrieved
+
+    Returns
+    -------
+        Annual values of the selected timeseries
+    """
+    if isinstance(timeseries, TimeseriesIndex):
+        return timeseries.get_annual(source, filters)
+
+    try:
+        ts = timeseries[source]
+    except KeyError as exc:
+        raise ValueError(f"Source dataset is not loaded: {source}") from exc
+
+    # This linearly interpolates the timeseries
+    return AnnualTimeseries.from_run(
+        apply_filters(ts, filters).resample("AS"), source, filters
+    )
+
+
+def _get_annual_amounts(
+    annual: AnnualTimeseries, target_years: list[int]
+) -> xr.DataArray:
+    return xr.DataArray(
+        annual.get_values(target_years),
+        coords={"year": list(target_years)},
+        dims=("year",),
+    )
+
+
+@functools.lru_cache(maxsize=256)
 def _check_unit(unit: str) -> None:
     pint_unit = unit_registry(unit)
 
@@ -98,7 +182,9 @@ def _check_unit(unit: str) -> None:
         raise ValueError(msg)
 
 
-def apply_amount(amount: float, unit: str, proxy: xr.DataArray) -> xr.DataArray:
+def apply_amount(
+    amount: float | xr.DataArray, unit: str, proxy: xr.DataArray
+) -> xr.DataArray:
     """
     Scale a known amount of emissions across a proxy
 
@@ -108,6 +194,9 @@ def apply_amount(amount: float, unit: str, proxy: xr.DataArray) -> xr.DataArray:
         Amount of stuff to allocate across the proxy
 
         The stuff is usually annual emissions of a given species and currently
+
+        If a DataArray with a year dimension is provided, the amount is applied for
+        each year.
     unit
         Unit of the stuff
 
@@ -121,27 +210,31 @@ def apply_amount(amount: float, unit: str, proxy: xr.DataArray) -> xr.DataArray:
     Returns
     -------
         DataArray with the same dimensions of ``proxy`` where the sum matches ``amount``
+
+        If ``amount`` has a year dimension, the result has dimensions (year, lat, lon)
     """
     # Verify units are [X] * [mass] / [time]
     _check_unit(unit)
 
-    logging.debug(f"applying {amount} {unit} using a proxy")
+    logging.debug(f"applying {np.asarray(amount)} {unit} using a proxy")
 
     # Adjust to kg X/yr
-    scale_factor = convert_to_target_unit(unit, target_unit="kg")
-    amount = amount * scale_factor.m
+    scale_factor, target_unit = get_unit_conversion(unit, target_unit="kg")
+    amount = amount * scale_factor
 
     # Calculate density map
     proxy_density = proxy / proxy.sum()
 
     scaled = amount * proxy_density
-    scaled.attrs["units"] = str(scale_factor.u) + " / cell"
+    if isinstance(amount, xr.DataArray):
+        scaled = scaled.transpose(*amount.dims, *proxy.dims)
+    scaled.attrs["units"] = target_unit + " / cell"
 
     return scaled
 
 
 @define
-class TimeseriesScaler(BaseScaler):
+class TimeseriesScaler(BatchedScaler):
     """
     Scale a spatial pattern using a timeseries
     """
@@ -151,50 +244,45 @@ class TimeseriesScaler(BaseScaler):
     source_timeseries: str
     source_filters: list[dict[str, Any]]
 
-    def __call__(
+    def scale_years(
         self,
         *,
         data: xr.DataArray,
         inventory: EmissionsInventory,
-        timeseries: dict[str, scmdata.ScmRun],
-        target_year: int,
+        target_years: list[int],
+        timeseries: Mapping[str, scmdata.ScmRun] | None = None,
         **kwargs: Any,
     ) -> xr.DataArray:
         """
-        Apply scaling
+        Apply scaling for a number of target years
 
         Parameters
         ----------
         data
             Timeseries to scale
         inventory
+        target_years
+            Years to scale to
         timeseries
             Timeseries data used by the proxy
         kwargs
 
         Returns
         -------
-            Scaled data
+            Scaled data with dimensions (year, lat, lon)
         """
-        ts = get_timeseries_point(
-            timeseries,
-            self.source_timeseries,
-            self.source_filters,
-            target_year=target_year,
+        annual = get_annual_timeseries(
+            timeseries or {}, self.source_timeseries, self.source_filters
         )
 
-        proxy_region = get_proxy(self.proxy_region, inventory=inventory)
-        proxy_region_clipped = clip_region(proxy_region, inventory.border_mask)
-        region_share = proxy_region_clipped.sum() / proxy_region.sum()
-
-        proxy = clip_region(
-            get_proxy(self.proxy, inventory=inventory), inventory.border_mask
+        region_share = get_proxy_share(self.proxy_region, inventory)
+        proxy_density = get_proxy_density(
+            self.proxy, inventory, data.lat, data.lon, clip_before_regrid=True
         )
-        proxy_interp = proxy.interp(lat=data.lat, lon=data.lon)
 
-        unit = ts.get_unique_meta("unit", True)
-        amount = ts.values.squeeze() * region_share
-        return apply_amount(amount, unit, proxy_interp)
+        amount = _get_annual_amounts(annual, target_years) * region_share
+        unit = annual.unit
+        return apply_amount(amount, unit, proxy_density)
 
     @classmethod
     def create_from_config(cls, method: ScalerMethod) -> "TimeseriesScaler":
@@ -5,6 +5,8 @@ Adds H2 related units if they haven't been previously registered
 """
 from __future__ import annotations
 
+import functools
+
 import pint
 from openscm_units import unit_registry  # type: ignore
 
@@ -64,4 +66,33 @@ def convert_to_target_unit(
     return correct_units
 
 
-__all__ = ["convert_to_target_unit", "unit_registry"]
+@functools.lru_cache(maxsize=256)
+def get_unit_conversion(initial_unit: str, target_unit: str) -> tuple[float, str]:
+    """
+    Get the cached scale factor required to convert between units
+
+    The conversion is only calculated by :func:`convert_to_target_unit` once for
+    each pair of units.
+
+    >>> scale_factor, unit = get_unit_conversion("Mt CH4/yr", target_unit="kg")
+    >>> ur.Quantity(12 * scale_factor, unit)
+
+    Parameters
+    ----------
+    initial_unit
+        Units of input
+    target_unit
+        The expected output
+
+        Any dimensions present in the initial_unit, but not in the target unit will
+        be kept the same.
+
+    Returns
+    -------
+        The required scale factor and the resulting unit
+    """
+    conversion = convert_to_target_unit(initial_unit, target_unit)
+    return float(conversion.m), str(conversion.u)
+
+
+__all__ = ["convert_to_target_unit", "get_unit_conversion", "unit_registry"]
@@ -1,10 +1,11 @@
 """
 General utility functions
 """
+import hashlib
 import os
 from collections.abc import Generator
 from contextlib import contextmanager
-from typing import TypeVar, cast
+from typing import Any, TypeVar, cast
 
 import geopandas  # type: ignore
 import numpy as np
@@ -13,9 +14,75 @@ import rioxarray  # noqa
 import xarray as xr
 from numpy.typing import ArrayLike, NDArray
 
+from spaemis.memory_cache import MemoryCache
+
 T = TypeVar("T", xr.DataArray, xr.Dataset)
 
 
+def _get_unique_nbytes(values: NDArray[Any]) -> int:
+    # Broadcast dimensions don't use any additional memory
+    return values.itemsize * int(
+        np.prod([size for size, stride in zip(values.shape, values.strides) if stride])
+    )
+
+
+# Cell areas of the grids which have been used in this process
+_cell_areas: MemoryCache[NDArray[np.float_]] = MemoryCache(
+    max_bytes=256 * 1024**2, sizeof=_get_unique_nbytes
+)
+
+
+def _calculate_cell_areas(
+    lat: NDArray[np.float_], lon: NDArray[np.float_]
+) -> NDArray[np.float_]:
+    # On a lat/lon grid the area is the product of a latitude factor and the
+    # longitudinal width of each cell
+    R = earth_radius(lat)
+    dlat = np.deg2rad(np.gradient(lat))
+    dlon = np.abs(np.deg2rad(np.gradient(lon)))
+    lat_factor = np.abs(dlat * R * R * np.cos(np.deg2rad(lat)))
+
+    area: NDArray[np.float_]
+    if np.allclose(dlon, dlon.mean(), rtol=1e-10, atol=0):
+        # Regular grids only vary with latitude
+        area = np.broadcast_to(
+            (lat_factor * dlon.mean())[:, np.newaxis], (len(lat), len(lon))
+        )
+    else:
+        area = np.outer(lat_factor, dlon)
+        area.flags.writeable = False
+    return area
+
+
+def get_cell_areas(lat: ArrayLike, lon: ArrayLike) -> NDArray[np.float_]:
+    """
+    Get the area of each cell of a lat/lon grid
+
+    The areas are only calculated once for each grid (see
+    :func:`get_grid_signature`). On grids with a constant longitude spacing, only
+    the latitude dependence is stored and it is broadcast along longitude.
+
+    Parameters
+    ----------
+    lat
+        Vector of latitude in degrees
+    lon
+        Vector of longitude in degrees
+
+    Returns
+    -------
+        Read-only array of the area of each cell in square meters with the shape
+        (lat, lon)
+    """
+    lat_values = np.asarray(lat, dtype=np.float64)
+    lon_values = np.asarray(lon, dtype=np.float64)
+
+    return _cell_areas.get_or_load(
+        get_grid_signature(lat_values, lon_values),
+        lambda: _calculate_cell_areas(lat_values, lon_values),
+    )
+
+
 def area_grid(lat: ArrayLike, lon: ArrayLike) -> xr.DataArray:
     """
     Calculate the area of each grid cell
@@ -33,24 +100,16 @@ def area_grid(lat: ArrayLike, lon: ArrayLike) -> xr.DataArray:
     -------
     area: grid-cell area in square-meters with dimensions, [lat,lon]
 
+        The values are a read-only view which is shared between calls for the same
+        grid (see :func:`get_cell_areas`)
+
     Notes
     -----
     Based on the function in
     https://github.com/chadagreene/CDT/blob/master/cdt/cdtarea.m
     """
-    xlon, ylat = np.meshgrid(lon, lat)
-    R = earth_radius(ylat)
-
-    dlat = np.deg2rad(np.gradient(ylat, axis=0))
-    dlon = np.deg2rad(np.gradient(xlon, axis=1))
-
-    dy = dlat * R
-    dx = dlon * R * np.cos(np.deg2rad(ylat))
-
-    area = np.abs(dy * dx)
-
     xda = xr.DataArray(
-        area,
+        get_cell_areas(lat, lon),
         dims=["lat", "lon"],
         coords={"lat": lat, "lon": lon},
         attrs={
@@ -124,6 +183,179 @@ def clip_region(da: T, boundary: geopandas.GeoDataFrame) -> T:
     )
 
 
+def hash_geometry(boundary: geopandas.GeoDataFrame) -> str:
+    """
+    Hash the geometry of a boundary
+
+    Parameters
+    ----------
+    boundary
+        Boundary as used by :func:`clip_region`
+
+    Returns
+    -------
+        Hex digest of the geometries and their CRS
+    """
+    hasher = hashlib.blake2b(str(boundary.crs).encode())
+    for geometry in boundary.geometry.to_wkb():
+        hasher.update(geometry)
+    return hasher.hexdigest()
+
+
+def get_grid_signature(lat: ArrayLike, lon: ArrayLike) -> str:
+    """
+    Hash the coordinates of a lat/lon grid
+
+    Parameters
+    ----------
+    lat
+        Latitude of the grid
+    lon
+        Longitude of the grid
+
+    Returns
+    -------
+        Hex digest which is the same for grids with identical coordinates
+    """
+    hasher = hashlib.blake2b()
+    for coord in (lat, lon):
+        values = np.ascontiguousarray(coord, dtype=np.float64)
+        hasher.update(str(values.shape).encode())
+        hasher.update(values.tobytes())
+    return hasher.hexdigest()
+
+
+def get_nearest_indices(
+    coords: ArrayLike, values: ArrayLike, tolerance: float
+) -> NDArray[np.intp]:
+    """
+    Find the index of the nearest coordinate for a number of values
+
+    Vectorised equivalent of ``pd.Index.get_indexer(method="nearest")`` which is
+    used by ``DataArray.sel(method="nearest")``. Values which are equally distant
+    from two coordinates are matched to the larger coordinate.
+
+    Parameters
+    ----------
+    coords
+        Monotonic coordinate values
+    values
+        Values to find
+    tolerance
+        Maximum distance between a value and the matched coordinate
+
+    Raises
+    ------
+    ValueError
+        ``coords`` is not monotonic
+
+    Returns
+    -------
+        Index of the nearest coordinate for each value or -1 if no coordinate is
+        within ``tolerance``
+    """
+    coord_values = np.asarray(coords, dtype=np.float64)
+    target = np.asarray(values, dtype=np.float64)
+    num_coords = len(coord_values)
+
+    if num_coords == 0:
+        return np.full(target.shape, -1, dtype=np.intp)
+
+    diffs = np.diff(coord_values)
+    descending = bool(np.all(diffs < 0)) and num_coords > 1
+    if not descending and not np.all(diffs > 0):
+        raise ValueError("coords must be monotonic increasing or decreasing")
+    if descending:
+        coord_values = coord_values[::-1]
+
+    right = np.searchsorted(coord_values, target, side="left")
+    left = right - 1
+    right_index = np.minimum(right, num_coords - 1)
+    left_index = np.maximum(left, 0)
+
+    right_distance = np.where(
+        right < num_coords, coord_values[right_index] - target, np.inf
+    )
+    left_distance = np.where(left >= 0, target - coord_values[left_index], np.inf)
+    use_left = left_distance < right_distance
+
+    index = np.where(use_left, left_index, right_index)
+    distance = np.where(use_left, left_distance, right_distance)
+    if descending:
+        index = num_coords - 1 - index
+
+    return np.where(distance <= tolerance, index, -1).astype(np.intp)
+
+
+def allocate_points(  # noqa: PLR0913
+    lat: ArrayLike,
+    lon: ArrayLike,
+    point_lat: ArrayLike,
+    point_lon: ArrayLike,
+    value: float = 1.0,
+    tolerance: float | None = None,
+) -> tuple[NDArray[np.float_], int]:
+    """
+    Add a value to the nearest grid cell of each point
+
+    Points which are further than ``tolerance`` from the nearest cell in either
+    latitude or longitude are outside of the domain and are ignored. Multiple
+    points in the same cell are accumulated.
+
+    Parameters
+    ----------
+    lat
+        Latitude of the grid
+    lon
+        Longitude of the grid
+    point_lat
+        Latitude of each point
+    point_lon
+        Longitude of each point
+    value
+        Value to add for each point
+    tolerance
+        Maximum distance between a point and the centre of a cell in degrees
+
+        Defaults to the absolute latitude spacing of the grid
+
+    Returns
+    -------
+        Array with the shape (lat, lon) and the number of points in the domain
+    """
+    lat_values = np.asarray(lat, dtype=np.float64)
+    lon_values = np.asarray(lon, dtype=np.float64)
+    if tolerance is None:
+        tolerance = float(np.abs(lat_values[1] - lat_values[0]))
+
+    lat_index = get_nearest_indices(lat_values, point_lat, tolerance)
+    lon_index = get_nearest_indices(lon_values, point_lon, tolerance)
+    in_domain = (lat_index >= 0) & (lon_index >= 0)
+
+    field = np.zeros((len(lat_values), len(lon_values)))
+    np.add.at(field, (lat_index[in_domain], lon_index[in_domain]), value)
+    return field, int(in_domain.sum())
+
+
+def get_file_identity(path: str) -> tuple[str, int, int]:
+    """
+    Get a cheap identity for a file
+
+    The contents of the file aren't read
+
+    Parameters
+    ----------
+    path
+        Path to the file
+
+    Returns
+    -------
+        Absolute path, modification time (ns) and size (bytes) of the file
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
 def weighted_annual_mean(
     ds: xr.Dataset, variable: str
 ) -> xr.DataArray:  # pragma: no cover
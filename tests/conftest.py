@@ -8,7 +8,7 @@ from click.testing import CliRunner
 
 from spaemis.config import DownscalingScenarioConfig, load_config
 from spaemis.constants import TEST_DATA_DIR
-from spaemis.input_data import database
+from spaemis.input_data import get_database
 from spaemis.inventory import EmissionsInventory, TestInventory
 
 
@@ -39,8 +39,28 @@ def inventory() -> EmissionsInventory:
 
 
 @pytest.fixture(autouse=True, scope="session")
-def setup_database():
-    database.register_path(os.path.join(TEST_DATA_DIR, "input4MIPs"))
+def cache_dir(tmp_path_factory):
+    # Keep any caches and ingested data out of the data directory
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    variables = {
+        "SPAEMIS_CACHE_DIR": cache_dir,
+        "SPAEMIS_INGEST_DIR": os.path.join(cache_dir, "ingested"),
+    }
+    previous = {key: os.environ.get(key) for key in variables}
+    os.environ.update(variables)
+
+    yield cache_dir
+
+    for key, value in previous.items():
+        if value is None:
+            os.environ.pop(key)
+        else:
+            os.environ[key] = value
+
+
+@pytest.fixture(autouse=True, scope="session")
+def setup_database(cache_dir):
+    get_database().register_path(os.path.join(TEST_DATA_DIR, "input4MIPs"))
 
 
 @pytest.fixture()
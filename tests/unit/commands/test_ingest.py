@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import re
+
+import pytest
+
+from spaemis.commands import cli
+from spaemis.constants import TEST_DATA_DIR
+from spaemis.ingest import get_store_path
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("zarr") is None, reason="zarr not installed"
+)
+
+
+@pytest.fixture()
+def ingest_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_INGEST_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_ingest_help(runner):
+    result = runner.invoke(cli, ["ingest", "--help"])
+    assert result.exit_code == 0
+    assert re.match(r"Usage: ", result.output)
+
+
+def test_ingest(runner, ingest_dir):
+    args = [
+        "ingest",
+        "--path",
+        os.path.join(TEST_DATA_DIR, "input4MIPs"),
+        "--variable-id",
+        "CO-em-anthro",
+        "--variable-id",
+        "NOx-em-anthro",
+    ]
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    assert f"Ingested 2 of 2 sources into {ingest_dir}" in result.output
+
+    for variable_id in ["CO-em-anthro", "NOx-em-anthro"]:
+        assert os.path.exists(
+            get_store_path(variable_id, "IAMC-MESSAGE-GLOBIOM-ssp245-1-1")
+        )
+    assert not os.path.exists(ingest_dir / "CH4-em-anthro")
+
+    # Stores which are up to date are skipped
+    result = runner.invoke(cli, args)
+    assert "Ingested 0 of 2 sources" in result.output
+
+    result = runner.invoke(cli, [*args, "--force"])
+    assert "Ingested 2 of 2 sources" in result.output
+
+
+def test_ingest_missing(runner, ingest_dir):
+    result = runner.invoke(cli, ["ingest", "--source-id", "unknown"])
+    assert result.exit_code == 1
+    assert "No matching input4MIPs data found" in result.output
@@ -0,0 +1,86 @@
+import os
+import re
+
+import pytest
+import xarray as xr
+
+import spaemis.project
+from spaemis.commands import cli
+from spaemis.constants import OUTPUT_VERSION
+
+
+@pytest.fixture()
+def runs_dir(tmp_path, mocker):
+    runs_dir = tmp_path / "runs"
+    mocker.patch("spaemis.config.RUNS_DIR", str(runs_dir))
+    return runs_dir
+
+
+def test_run_help(runner):
+    result = runner.invoke(cli, ["run", "--help"])
+    assert result.exit_code == 0
+    assert re.match(r"Usage: ", result.output)
+
+
+@pytest.mark.parametrize("output_format", ["memory", "netcdf"])
+def test_run(runner, runs_dir, config_file, output_format):
+    result = runner.invoke(
+        cli, ["run", "-c", config_file, "--output-format", output_format]
+    )
+    assert result.exit_code == 0, result.output
+
+    output_dir = runs_dir / "test-config" / "outputs" / "test"
+    assert (runs_dir / "test-config" / "inputs" / "scenarios").exists()
+    assert (output_dir / "2040").exists()
+
+    res = xr.load_dataset(output_dir / f"{OUTPUT_VERSION}_test_projections.nc")
+    assert res["year"].values.tolist() == [2020, 2040, 2060]
+    assert "H2" in res.data_vars
+
+    # Results aren't overwritten unless forced
+    result = runner.invoke(cli, ["run", "-c", config_file])
+    assert result.exit_code == 1
+    assert "Use --force to overwrite" in result.output
+
+    result = runner.invoke(cli, ["run", "--force", "-c", config_file])
+    assert result.exit_code == 0, result.output
+
+
+def test_run_resume(runner, runs_dir, config_file, mocker):
+    result = runner.invoke(cli, ["run", "--resume", "-c", config_file])
+    assert result.exit_code == 0, result.output
+    assert (runs_dir / "test-config" / "run" / "completed.jsonl").exists()
+
+    mock_calculate = mocker.patch("spaemis.project._calculate_slice")
+    result = runner.invoke(cli, ["run", "--resume", "-c", config_file])
+    assert result.exit_code == 0, result.output
+    mock_calculate.assert_not_called()
+
+
+def test_run_resume_missing_output(runner, runs_dir, config_file, mocker):
+    result = runner.invoke(cli, ["run", "--resume", "-c", config_file])
+    assert result.exit_code == 0, result.output
+    os.remove(runs_dir / "test-config" / "run" / "projections.nc")
+
+    # All slices are recalculated rather than left empty
+    mock_calculate = mocker.patch(
+        "spaemis.project._calculate_slice", wraps=spaemis.project._calculate_slice
+    )
+    result = runner.invoke(cli, ["run", "--resume", "-c", config_file])
+    assert result.exit_code == 0, result.output
+    mock_calculate.assert_called()
+
+
+@pytest.mark.parametrize("output_format", ["memory", "netcdf", "zarr"])
+def test_run_resume_output_format(runner, runs_dir, config_file, output_format):
+    result = runner.invoke(
+        cli, ["run", "--resume", "--output-format", output_format, "-c", config_file]
+    )
+    assert result.exit_code == 2
+    assert "--output-format can't be used with --resume" in result.output
+
+
+def test_run_profile(runner, runs_dir, config_file):
+    result = runner.invoke(cli, ["run", "--profile", "-c", config_file])
+    assert result.exit_code == 0, result.output
+    assert os.path.exists(runs_dir / "test-config" / "profile.prof")
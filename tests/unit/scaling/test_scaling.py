@@ -2,11 +2,15 @@ import logging
 import os
 import re
 
+import attrs
+import numpy as np
 import numpy.testing as npt
 import pytest
 import scmdata
+import scmdata.testing
 import xarray as xr
 
+import spaemis.input_data
 from spaemis.config import (
     ConstantScaleMethod,
     PointSourceMethod,
@@ -14,7 +18,10 @@ from spaemis.config import (
     TimeseriesMethod,
 )
 from spaemis.constants import RAW_DATA_DIR
+from spaemis.input_data import SECTOR_MAP, TimeseriesIndex, get_database
+from spaemis.inventory import TestInventory
 from spaemis.scaling import (
+    BaseScaler,
     ConstantScaler,
     PointSourceScaler,
     ProxyScaler,
@@ -23,8 +30,89 @@ from spaemis.scaling import (
     get_scaler,
     get_scaler_by_config,
 )
+from spaemis.scaling.base import (
+    BatchedScaler,
+    get_source_bounds,
+    load_source,
+    source_cache,
+)
+from spaemis.scaling.proxy import (
+    _proxies,
+    get_proxy,
+    get_proxy_density,
+    get_proxy_files,
+    get_proxy_share,
+)
 from spaemis.scaling.timeseries import get_timeseries_point
 from spaemis.unit_registry import unit_registry as ur
+from spaemis.utils import clip_region
+
+
+def test_load_source(inventory):
+    res = load_source(
+        "IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+        "NOx-em-anthro",
+        "Industrial Sector",
+        inventory,
+    )
+
+    # Only the region around the inventory is read, but the result is unchanged
+    full = get_database().load("NOx-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1")
+    exp = clip_region(
+        full["NOx_em_anthro"]
+        .sel(sector=SECTOR_MAP.index("Industrial Sector"))
+        .groupby("time.year")
+        .mean(),
+        inventory.border_mask,
+    )
+    xr.testing.assert_identical(res, exp)
+
+    bbox = get_source_bounds(inventory)
+    assert bbox.lon_min <= inventory.data.lon.min() - 1
+    assert bbox.lat_max >= inventory.data.lat.max() + 1
+
+
+def test_load_source_years(inventory):
+    args = (
+        "IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+        "NOx-em-anthro",
+        "Industrial Sector",
+        inventory,
+    )
+    full = load_source(*args)
+
+    res = load_source(*args, years=[2040, 2042])
+
+    # The neighbouring years are loaded along with the inventory year
+    assert res["year"].values.tolist() == [2015, 2020, 2040, 2050]
+    xr.testing.assert_identical(res, full.sel(year=[2015, 2020, 2040, 2050]))
+
+
+def test_load_source_cached(inventory, mocker):
+    args = (
+        "IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+        "CO-em-anthro",
+        "Energy Sector",
+        inventory,
+    )
+    source_cache.clear()
+    mock_load = mocker.patch.object(
+        spaemis.input_data.InputEmissionsDatabase,
+        "load",
+        wraps=get_database().load,
+    )
+
+    exp = load_source(*args)
+    assert mock_load.call_count == 1
+
+    # The second load is read from the cache
+    res = load_source(*args)
+    assert mock_load.call_count == 1
+    xr.testing.assert_identical(res, exp)
+
+    # Changing the inputs creates a new entry
+    load_source(*args, weighted_temporal_mean=True)
+    assert mock_load.call_count == 2
 
 
 def test_get_scaler_missing():
@@ -44,6 +132,139 @@ def test_get_scaler_by_config():
     assert res.scaling_factor == 0.1
 
 
+def test_scaler_not_implemented(inventory):
+    class IncompleteScaler(BaseScaler):
+        pass
+
+    class IncompleteBatchedScaler(BatchedScaler):
+        pass
+
+    data = inventory.data["NOx"].sel(sector="industry")
+    for scaler in [IncompleteScaler(), IncompleteBatchedScaler()]:
+        with pytest.raises(NotImplementedError):
+            scaler(data=data, inventory=inventory, target_year=2020)
+        with pytest.raises(NotImplementedError):
+            scaler.scale_years(data=data, inventory=inventory, target_years=[2020])
+
+
+@pytest.fixture()
+def proxy_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_CACHE_DIR", str(tmp_path))
+    _proxies.clear()
+    yield tmp_path
+    _proxies.clear()
+
+
+def test_get_proxy_density(inventory, mocker, proxy_cache_dir):
+    data = inventory.data["NOx"].sel(sector="industry")
+    mock_get_proxy = mocker.patch("spaemis.scaling.proxy.get_proxy", wraps=get_proxy)
+
+    res = get_proxy_density(
+        "population", inventory, data.lat, data.lon, clip_before_regrid=True
+    )
+
+    proxy = clip_region(get_proxy("population", inventory), inventory.border_mask)
+    exp = proxy.interp(lat=data.lat, lon=data.lon)
+    xr.testing.assert_allclose(res, exp / exp.sum())
+    npt.assert_allclose(res.sum(), 1)
+
+    # Reused within the process
+    assert (
+        get_proxy_density(
+            "population", inventory, data.lat, data.lon, clip_before_regrid=True
+        )
+        is res
+    )
+    assert mock_get_proxy.call_count == 1
+
+    # Loaded from disk by other processes
+    _proxies.clear()
+    xr.testing.assert_allclose(
+        get_proxy_density(
+            "population", inventory, data.lat, data.lon, clip_before_regrid=True
+        ),
+        res,
+    )
+    assert mock_get_proxy.call_count == 1
+
+    # Different grids are prepared separately
+    get_proxy_density(
+        "population",
+        inventory,
+        data.lat[:10],
+        data.lon[:10],
+        clip_before_regrid=True,
+    )
+    assert mock_get_proxy.call_count == 2
+
+
+def test_get_proxy_density_inventory(inventory, mocker, proxy_cache_dir):
+    data = inventory.data["NOx"].sel(sector="industry")
+    mock_get_proxy = mocker.patch("spaemis.scaling.proxy.get_proxy", wraps=get_proxy)
+
+    res = get_proxy_density("inventory|industry", inventory, data.lat, data.lon)
+
+    # The proxy is clipped and interpolated again which masks the border cells
+    exp = clip_region(
+        data.interp(lat=data.lat, lon=data.lon), inventory.border_mask
+    ).interp(lat=data.lat, lon=data.lon)
+    xr.testing.assert_allclose(res, exp / exp.sum())
+    assert int(res.notnull().sum()) == 1894
+
+    # The proxy is only read to identify and prepare it once
+    assert get_proxy_density("inventory|industry", inventory, data.lat, data.lon) is res
+    get_proxy_share("inventory|industry", inventory)
+    assert mock_get_proxy.call_count == 3
+    get_proxy_share("inventory|industry", inventory)
+    assert mock_get_proxy.call_count == 3
+
+    # The proxy is identified by the content of the inventory
+    other = TestInventory.load_from_directory("", 1)
+    other.data["NOx"].loc[dict(sector="industry")] *= 2
+    assert get_proxy_density("inventory|industry", other, data.lat, data.lon) is not res
+
+
+def test_get_proxy_density_regrid_then_clip(inventory, proxy_cache_dir):
+    data = inventory.data["NOx"].sel(sector="industry")
+
+    res = get_proxy_density("population", inventory, data.lat, data.lon)
+
+    proxy = get_proxy("population", inventory)
+    exp = clip_region(
+        proxy.interp(lat=data.lat, lon=data.lon), inventory.border_mask
+    ).interp(lat=data.lat, lon=data.lon)
+    xr.testing.assert_allclose(res, exp / exp.sum())
+    assert int(res.notnull().sum()) == 1868
+
+
+def test_get_proxy_files(monkeypatch, tmp_path):
+    monkeypatch.setenv("SPAEMIS_PROXY_DIRECTORY", str(tmp_path / "proxies"))
+    monkeypatch.setenv("SPAEMIS_INVENTORY_DIRECTORY", str(tmp_path / "inventories"))
+    inventory_dir = tmp_path / "inventories" / "australia" / "2016"
+    inventory_dir.mkdir(parents=True)
+    (inventory_dir / "b.nc").touch()
+    (inventory_dir / "a.nc").touch()
+
+    assert get_proxy_files("population") == [
+        str(tmp_path / "proxies" / "sedacs" / "popdynamics-base_year-2000-rev01-byr.nc")
+    ]
+    assert get_proxy_files("australian_inventory|ENE") == [
+        str(inventory_dir / "a.nc"),
+        str(inventory_dir / "b.nc"),
+    ]
+    assert get_proxy_files("inventory|industry") == []
+
+
+def test_get_proxy_share(inventory, proxy_cache_dir):
+    res = get_proxy_share("population", inventory)
+
+    proxy = get_proxy("population", inventory)
+    exp = clip_region(proxy, inventory.border_mask).sum() / proxy.sum()
+    xr.testing.assert_allclose(res, exp)
+    assert 0 < res < 1
+    assert get_proxy_share("population", inventory) is res
+
+
 class TestConstantScaler:
     def test_create_default(self):
         res = ConstantScaler.create_from_config(ConstantScaleMethod())
@@ -68,6 +289,19 @@ class TestRelativeScaler:
         assert res.source_id == "source"
         assert res.variable_id == "variable"
         assert res.sector == "Industrial Sector"
+        assert res.regrid == "bilinear"
+
+    def test_create_conservative(self):
+        res = RelativeChangeScaler.create_from_config(
+            RelativeChangeMethod(
+                source_id="source",
+                variable_id="variable",
+                sector="Industrial Sector",
+                regrid="conservative",
+            )
+        )
+
+        assert res.regrid == "conservative"
 
     def test_create_missing_sector(self):
         with pytest.raises(ValueError, match="Unknown input4MIPs sector: not-a-sector"):
@@ -96,6 +330,47 @@ class TestRelativeScaler:
         assert res.shape == data.shape
         assert ur.Unit(res.attrs["units"]) == ur.Unit("kg NOx/yr/cell")
 
+    def test_scale_years(self, inventory):
+        scaler = RelativeChangeScaler(
+            source_id="IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+            variable_id="NOx-em-anthro",
+            sector="Industrial Sector",
+        )
+        data = inventory.data["NOx"].sel(sector="industry")
+
+        res = scaler.scale_years(
+            data=data, inventory=inventory, target_years=[2020, 2040]
+        )
+        assert res.dims == ("year", "lat", "lon")
+        assert res["year"].values.tolist() == [2020, 2040]
+
+        # Matches scaling each year separately
+        exp = BaseScaler.scale_years(
+            scaler, data=data, inventory=inventory, target_years=[2020, 2040]
+        )
+        xr.testing.assert_allclose(res, exp)
+
+    def test_scale_years_conservative(self, inventory):
+        scaler = RelativeChangeScaler(
+            source_id="IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+            variable_id="NOx-em-anthro",
+            sector="Industrial Sector",
+            regrid="conservative",
+        )
+        data = inventory.data["NOx"].sel(sector="industry")
+
+        res = scaler.scale_years(
+            data=data, inventory=inventory, target_years=[2020, 2040]
+        )
+        assert res.dims == ("year", "lat", "lon")
+
+        bilinear = attrs.evolve(scaler, regrid="bilinear").scale_years(
+            data=data, inventory=inventory, target_years=[2020, 2040]
+        )
+        # Nan source cells are ignored rather than propagated
+        assert (res.notnull() | bilinear.isnull()).all()
+        assert not np.allclose(res.fillna(0), bilinear.fillna(0))
+
 
 class TestTimeseriesScaler:
     def test_create(self):
@@ -137,6 +412,37 @@ class TestTimeseriesScaler:
         assert res.shape == data.shape
         assert ur.Unit(res.attrs["units"]) == ur.Unit("kg H2/yr/cell")
 
+    def test_scale_years(self, inventory, loaded_timeseries):
+        scaler = TimeseriesScaler(
+            proxy="population",
+            proxy_region="population",
+            source_timeseries="emissions",
+            source_filters=[
+                {
+                    "variable": "Emissions|H2|Transportation Sector",
+                }
+            ],
+        )
+        data = inventory.data["NOx"].sel(sector="industry")
+
+        res = scaler.scale_years(
+            data=data,
+            inventory=inventory,
+            target_years=[2020, 2040],
+            timeseries=loaded_timeseries,
+        )
+        assert res.dims == ("year", "lat", "lon")
+
+        exp = BaseScaler.scale_years(
+            scaler,
+            data=data,
+            inventory=inventory,
+            target_years=[2020, 2040],
+            timeseries=loaded_timeseries,
+        )
+        xr.testing.assert_allclose(res, exp)
+        assert res.attrs["units"] == exp.attrs["units"]
+
     def test_run_inventory(self, inventory, loaded_timeseries):
         scaler = TimeseriesScaler(
             proxy="inventory|industry",
@@ -191,6 +497,17 @@ class TestTimeseriesScaler:
         assert res.shape == data.shape
         assert ur.Unit(res.attrs["units"]) == ur.Unit("kg H2/yr/cell")
 
+    def test_timeseries_index(self, loaded_timeseries):
+        filters = [{"variable": "Emissions|H2|Transportation Sector"}]
+        index = TimeseriesIndex(loaded_timeseries)
+
+        for year in [2020, 2035]:
+            scmdata.testing.assert_scmdf_almost_equal(
+                get_timeseries_point(index, "emissions", filters, year),
+                get_timeseries_point(loaded_timeseries, "emissions", filters, year),
+                check_ts_names=False,
+            )
+
     def test_run_failed_too_many(self, loaded_timeseries):
         with pytest.raises(ValueError, match="More than one match was found for"):
             get_timeseries_point(
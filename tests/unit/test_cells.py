@@ -0,0 +1,88 @@
+import logging
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+import xarray as xr
+
+from spaemis.cells import CellMask
+
+
+@pytest.fixture()
+def cells():
+    lat = np.array([-38.0, -37.0, -36.0])
+    lon = np.array([144.0, 145.0, 146.0, 147.0])
+    return CellMask(lat=lat, lon=lon, index=np.array([1, 5, 6, 11]))
+
+
+def test_mask(cells):
+    exp = np.zeros((3, 4), dtype=bool)
+    exp[0, 1] = exp[1, 1] = exp[1, 2] = exp[2, 3] = True
+
+    assert cells.shape == (3, 4)
+    assert cells.size == 4
+    npt.assert_array_equal(cells.mask, exp)
+    npt.assert_allclose(cells.cell_lat, [-38.0, -37.0, -37.0, -36.0])
+    npt.assert_allclose(cells.cell_lon, [145.0, 145.0, 146.0, 147.0])
+
+
+def test_compress_expand(cells):
+    values = np.arange(24.0).reshape(2, 3, 4)
+    values[:, ~cells.mask] = np.nan
+
+    compressed = cells.compress(values)
+    assert compressed.shape == (2, 4)
+    npt.assert_allclose(compressed[0], [1, 5, 6, 11])
+
+    npt.assert_allclose(cells.expand(compressed), values)
+    assert cells.expand(compressed.astype(np.float32)).dtype == np.float32
+    assert cells.expand(np.arange(4)).dtype == np.float64
+
+
+def test_compress_invalid(cells):
+    with pytest.raises(ValueError, match="Expected grid"):
+        cells.compress(np.ones((4, 3)))
+    with pytest.raises(ValueError, match="Expected 4 cells"):
+        cells.expand(np.ones(3))
+
+
+def test_compress_dropped(cells, caplog):
+    values = np.zeros((3, 4))
+    with caplog.at_level(logging.WARNING):
+        cells.compress(values)
+    assert not caplog.records
+
+    values[0, 0] = 2
+    with caplog.at_level(logging.WARNING):
+        cells.compress(values)
+    assert "Dropping 2.0 from 8 cells" in caplog.text
+
+
+def test_dataarray(cells):
+    da = xr.DataArray(
+        np.arange(24.0).reshape(3, 4, 2),
+        coords={"lat": cells.lat, "lon": cells.lon, "year": [2020, 2040]},
+        dims=("lat", "lon", "year"),
+        attrs={"units": "kg"},
+    )
+    da = da.where(xr.DataArray(cells.mask, dims=("lat", "lon")))
+
+    compressed = cells.compress_dataarray(da)
+    assert compressed.dims == ("year", "cell")
+    assert compressed.attrs == {"units": "kg"}
+    assert compressed["year"].values.tolist() == [2020, 2040]
+
+    res = cells.expand_dataarray(compressed)
+    xr.testing.assert_identical(res, da.transpose("year", "lat", "lon"))
+
+
+def test_inventory_cells(inventory):
+    cells = inventory.cells
+    assert inventory.cells is cells
+    assert cells.matches(inventory.data.lat, inventory.data.lon)
+    assert 0 < cells.size < inventory.data.lat.size * inventory.data.lon.size
+
+    # All the inventory data is within the valid cells
+    for variable in inventory.data.data_vars.values():
+        outside = variable.transpose("sector", "lat", "lon").values[:, ~cells.mask]
+        assert np.isnan(outside).all()
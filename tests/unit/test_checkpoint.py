@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+from spaemis.checkpoint import RunCheckpoint
+from spaemis.output import OutputCoords
+
+
+def _coords(years=(2020, 2030)):
+    return OutputCoords(
+        variables=["CO"],
+        sectors=["industry"],
+        years=list(years),
+        lat=xr.DataArray([-38.0, -37.9], dims="lat"),
+        lon=xr.DataArray([145.0, 145.1, 145.2], dims="lon"),
+    )
+
+
+def test_mark_complete(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path / "run"))
+    assert checkpoint.completed() == {}
+
+    checkpoint.mark_complete("CO", "industry", [2020, 2030], {2020: "abc"})
+    assert checkpoint.completed() == {
+        ("CO", "industry", 2020): "abc",
+        ("CO", "industry", 2030): None,
+    }
+
+    # The latest record is used
+    checkpoint.mark_complete("CO", "industry", [2020], {2020: "def"})
+    assert checkpoint.completed()[("CO", "industry", 2020)] == "def"
+
+
+def test_malformed_record(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    checkpoint.mark_complete("CO", "industry", [2020])
+    with open(checkpoint.log_path, "a") as fh:
+        fh.write('{"variable": "CO", "sec')
+
+    assert checkpoint.completed() == {("CO", "industry", 2020): None}
+
+
+def test_create_output_resume(tmp_path):
+    coords = _coords()
+    values = np.ones((2, 2, 3))
+
+    checkpoint = RunCheckpoint(str(tmp_path))
+    output = checkpoint.create_output(coords)
+    output.write_slice("CO", "industry", [2020], values[:1])
+    checkpoint.mark_complete("CO", "industry", [2020])
+    output.close()
+
+    output = RunCheckpoint(str(tmp_path)).create_output(coords)
+    res = output.to_dataset()
+    np.testing.assert_allclose(res["CO"].sel(year=2020).squeeze(), 1)
+    assert np.isnan(res["CO"].sel(year=2030)).all()
+    res.close()
+    assert checkpoint.completed() == {("CO", "industry", 2020): None}
+
+
+def test_create_output_carry_over(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    output = checkpoint.create_output(_coords())
+    output.write_slice("CO", "industry", [2020, 2030], np.ones((2, 2, 3)))
+    checkpoint.mark_complete("CO", "industry", [2020, 2030], {2020: "a", 2030: "b"})
+    output.close()
+
+    # Slices for years which are still required are copied to the new output
+    output = checkpoint.create_output(_coords(years=(2020, 2040)))
+    res = output.to_dataset()
+    assert res["year"].values.tolist() == [2020, 2040]
+    np.testing.assert_allclose(res["CO"].sel(year=2020).squeeze(), 1)
+    assert np.isnan(res["CO"].sel(year=2040)).all()
+    res.close()
+
+    assert checkpoint.completed() == {("CO", "industry", 2020): "a"}
+    assert not os.path.exists(checkpoint.previous_output_path)
+
+
+def test_create_output_no_resume(tmp_path):
+    RunCheckpoint(str(tmp_path)).create_output(_coords()).close()
+    RunCheckpoint(str(tmp_path)).mark_complete("CO", "industry", [2020])
+
+    checkpoint = RunCheckpoint(str(tmp_path), resume=False)
+    checkpoint.create_output(_coords()).close()
+    assert checkpoint.completed() == {}
+
+
+def test_create_output_missing(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    output = checkpoint.create_output(_coords())
+    output.write_slice("CO", "industry", [2020], np.ones((1, 2, 3)))
+    checkpoint.mark_complete("CO", "industry", [2020])
+    output.close()
+
+    # The completed slices are discarded as their values have been lost
+    os.remove(checkpoint.output_path)
+    output = RunCheckpoint(str(tmp_path)).create_output(_coords())
+    output.close()
+    assert checkpoint.completed() == {}
+    assert os.path.exists(checkpoint.output_path)
+
+
+def test_create_output_unreadable(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    output = checkpoint.create_output(_coords())
+    output.write_slice("CO", "industry", [2020], np.ones((1, 2, 3)))
+    checkpoint.mark_complete("CO", "industry", [2020])
+    output.close()
+
+    # Truncate the output file
+    with open(checkpoint.output_path, "r+b") as fh:
+        fh.truncate(100)
+
+    output = RunCheckpoint(str(tmp_path)).create_output(_coords(years=(2020, 2040)))
+    res = output.to_dataset()
+    assert res["year"].values.tolist() == [2020, 2040]
+    assert np.isnan(res["CO"]).all()
+    res.close()
+    assert checkpoint.completed() == {}
@@ -1,10 +1,14 @@
 import os
 
 import pytest
+from cattrs.errors import ClassValidationError
 
 from spaemis.config import (
     ConstantScaleMethod,
     DownscalingScenarioConfig,
+    ProxyMethod,
+    RelativeChangeMethod,
+    ScalerDefinition,
     ScalerMethod,
     converter,
     load_config,
@@ -58,3 +62,51 @@ def test_scaler_unstructure(config):
     res = converter.unstructure(scaler)
 
     assert res["method"]["name"] == scaler.method.name
+
+
+def test_structuring_regrid():
+    def structure(**kwargs):
+        return converter.structure(
+            {
+                "name": "proxy",
+                "source_id": "source",
+                "variable_id": "variable",
+                "sector": "Industrial Sector",
+                "proxy": "population",
+                **kwargs,
+            },
+            ScalerMethod,
+        )
+
+    res = structure()
+    assert isinstance(res, ProxyMethod)
+    assert res.regrid == "bilinear"
+
+    assert structure(regrid="conservative").regrid == "conservative"
+
+    with pytest.raises(ClassValidationError):
+        structure(regrid="nearest")
+
+
+def test_scalers_csv_blank_options(tmp_path):
+    fname = tmp_path / "scalers.csv"
+    fname.write_text(
+        "variable,sector,scaler_name,scaler_variable_id,scaler_source_id,"
+        "scaler_sector,scaler_proxy,scaler_regrid\n"
+        "NOx,industry,relative_change,NOx-em-anthro,source,Industrial Sector,,\n"
+        "CO,industry,proxy,CO-em-anthro,source,Industrial Sector,population,"
+        "conservative\n"
+        "H2,industry,constant,,,,,\n"
+    )
+
+    res = ScalerDefinition(source_files=[str(fname)]).scalers
+
+    assert res[0].method == RelativeChangeMethod(
+        source_id="source",
+        variable_id="NOx-em-anthro",
+        sector="Industrial Sector",
+    )
+    assert res[0].method.regrid == "bilinear"
+    assert isinstance(res[1].method, ProxyMethod)
+    assert res[1].method.regrid == "conservative"
+    assert res[2].method == ConstantScaleMethod()
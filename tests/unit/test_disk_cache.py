@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from spaemis.disk_cache import DiskCache, get_default_max_bytes, make_key
+
+
+@pytest.fixture()
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_CACHE_DIR", str(tmp_path))
+    return DiskCache("test", max_bytes=100)
+
+
+def write_bytes(size):
+    def _write(path):
+        with open(path, "wb") as fh:
+            fh.write(b"0" * size)
+
+    return _write
+
+
+def test_make_key():
+    assert make_key("a", 1, [1, 2]) == make_key("a", 1, [1, 2])
+    assert make_key("a", 1, [1, 2]) != make_key("a", 1, [2, 1])
+    assert make_key({"b": 1, "a": 2}) == make_key({"a": 2, "b": 1})
+
+
+def test_default_max_bytes(monkeypatch):
+    monkeypatch.setenv("SPAEMIS_DISK_CACHE_MAX_BYTES", "10")
+    assert get_default_max_bytes() == 10
+    assert DiskCache("test").max_bytes == 10
+
+    monkeypatch.setenv("SPAEMIS_DISK_CACHE_MAX_BYTES", "0")
+    assert not DiskCache("test").enabled
+
+
+def test_get_put(cache, tmp_path):
+    assert cache.get("key", ".bin") is None
+
+    path = cache.put("key", ".bin", write_bytes(10))
+    assert path == os.path.join(tmp_path, "test", "key.bin")
+    assert cache.get("key", ".bin") == path
+    assert os.listdir(cache.directory) == ["key.bin"]
+
+
+def test_put_failed(cache):
+    def _write(path):
+        raise OSError("failed")
+
+    assert cache.put("key", ".bin", _write) is None
+    assert cache.get("key", ".bin") is None
+    # The temporary file is removed
+    assert os.listdir(cache.directory) == []
+
+
+def test_evict_lru(cache):
+    for i, key in enumerate(["a", "b", "c"]):
+        path = cache.put(key, ".bin", write_bytes(40))
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+
+    # c is added, but a was the least recently used
+    assert sorted(os.listdir(cache.directory)) == ["b.bin", "c.bin"]
+
+    # Using b means that c is evicted next
+    cache.get("b", ".bin")
+    cache.put("d", ".bin", write_bytes(40))
+    assert sorted(os.listdir(cache.directory)) == ["b.bin", "d.bin"]
+
+
+def test_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_CACHE_DIR", str(tmp_path))
+    cache = DiskCache("test", max_bytes=0)
+
+    assert cache.put("key", ".bin", write_bytes(10)) is None
+    assert not os.path.exists(cache.directory)
+
+
+@pytest.mark.parametrize("name", ["emissions", None])
+def test_dataarray(cache, name):
+    cache = DiskCache("test")
+    da = xr.DataArray(
+        np.arange(6, dtype=float).reshape(2, 3),
+        coords={"year": [2015, 2020], "lat": [-1.0, 0.0, 1.0]},
+        dims=("year", "lat"),
+        attrs={"units": "kg m-2 s-1"},
+        name=name,
+    )
+
+    assert cache.get_dataarray("key") is None
+    cache.put_dataarray("key", da)
+
+    xr.testing.assert_identical(cache.get_dataarray("key"), da)
+
+
+def test_clear(cache):
+    cache.put("a", ".bin", write_bytes(10))
+    cache.clear()
+
+    assert cache.get("a", ".bin") is None
@@ -0,0 +1,117 @@
+import os
+
+import attrs
+
+from spaemis.config import ConstantScaleMethod, PointSourceMethod, TimeseriesMethod
+from spaemis.fingerprint import (
+    get_file_identity,
+    get_slice_fingerprints,
+    hash_inventory,
+    hash_timeseries,
+)
+
+
+def _get_fingerprints(config, inventory, timeseries, scaler_config=None):
+    return get_slice_fingerprints(
+        scaler_config or config.scalers.scalers[0],
+        [2020, 2040],
+        hash_inventory(inventory),
+        {name: hash_timeseries(ts) for name, ts in timeseries.items()},
+    )
+
+
+def test_file_identity(tmp_path):
+    fname = tmp_path / "test.txt"
+    fname.write_text("a")
+    path, mtime, size = get_file_identity(str(fname))
+
+    assert path == str(fname)
+    assert size == 1
+
+    fname.write_text("ab")
+    os.utime(fname, ns=(mtime + 10, mtime + 10))
+    assert get_file_identity(str(fname)) == (str(fname), mtime + 10, 2)
+
+
+def test_hash_inventory(inventory):
+    exp = hash_inventory(inventory)
+    assert hash_inventory(inventory) == exp
+
+    modified = attrs.evolve(inventory, data=inventory.data.copy(deep=True))
+    modified.data["CO"].values[:] = 1.0
+    assert hash_inventory(modified) != exp
+
+
+def test_hash_timeseries(loaded_timeseries):
+    ts = next(iter(loaded_timeseries.values()))
+    exp = hash_timeseries(ts)
+    assert hash_timeseries(ts.copy()) == exp
+    assert hash_timeseries(ts * 2) != exp
+
+
+def test_slice_fingerprints(config, inventory, loaded_timeseries):
+    exp = _get_fingerprints(config, inventory, loaded_timeseries)
+    assert list(exp) == [2020, 2040]
+    assert exp[2020] != exp[2040]
+    assert _get_fingerprints(config, inventory, loaded_timeseries) == exp
+
+    # Changing the method changes the fingerprint
+    scaler_config = attrs.evolve(
+        config.scalers.scalers[0], method=ConstantScaleMethod(scale_factor=2)
+    )
+    res = _get_fingerprints(config, inventory, loaded_timeseries, scaler_config)
+    assert res[2020] != exp[2020]
+
+
+def test_slice_fingerprints_source_files(config, inventory, loaded_timeseries, mocker):
+    exp = _get_fingerprints(config, inventory, loaded_timeseries)
+
+    mocker.patch(
+        "spaemis.fingerprint.get_file_identity",
+        side_effect=lambda fname: (fname, 0, 0),
+    )
+    res = _get_fingerprints(config, inventory, loaded_timeseries)
+    assert res != exp
+
+
+def test_slice_fingerprints_proxy_files(
+    config, inventory, loaded_timeseries, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("SPAEMIS_PROXY_DIRECTORY", str(tmp_path))
+    fname = tmp_path / "sedacs" / "popdynamics-base_year-2000-rev01-byr.nc"
+    fname.parent.mkdir()
+    fname.write_text("a")
+
+    scaler_config = attrs.evolve(
+        config.scalers.scalers[0],
+        method=TimeseriesMethod(
+            proxy="population", source_timeseries="emissions", source_filters=[]
+        ),
+    )
+    exp = _get_fingerprints(config, inventory, loaded_timeseries, scaler_config)
+
+    # Modifying the proxy changes the fingerprint
+    fname.write_text("ab")
+    res = _get_fingerprints(config, inventory, loaded_timeseries, scaler_config)
+    assert res[2020] != exp[2020]
+
+
+def test_slice_fingerprints_point_sources(
+    config, inventory, loaded_timeseries, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("SPAEMIS_POINT_SOURCE_DIRECTORY", str(tmp_path))
+    fname = tmp_path / "points.csv"
+    fname.write_text("lat,lon\n-37.8,145.0\n")
+
+    scaler_config = attrs.evolve(
+        config.scalers.scalers[0],
+        method=PointSourceMethod(
+            point_sources="points.csv", source_timeseries="emissions", source_filters=[]
+        ),
+    )
+    exp = _get_fingerprints(config, inventory, loaded_timeseries, scaler_config)
+
+    # Modifying the point sources changes the fingerprint
+    fname.write_text("lat,lon\n-37.8,145.0\n-38.0,145.5\n")
+    res = _get_fingerprints(config, inventory, loaded_timeseries, scaler_config)
+    assert res[2020] != exp[2020]
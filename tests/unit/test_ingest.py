@@ -0,0 +1,101 @@
+import importlib.util
+import logging
+import os
+import shutil
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from spaemis.constants import TEST_DATA_DIR
+from spaemis.ingest import get_source_files_identity, get_store_path
+from spaemis.input_data import BoundingBox, InputEmissionsDatabase
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("zarr") is None, reason="zarr not installed"
+)
+
+VARIABLE_ID = "CH4-em-anthro"
+SOURCE_ID = "IAMC-MESSAGE-GLOBIOM-ssp245-1-1"
+
+
+@pytest.fixture()
+def database(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_INGEST_DIR", str(tmp_path / "ingested"))
+
+    # Copy the source so that it can be modified
+    archive = tmp_path / "archive"
+    archive.mkdir()
+    fname = InputEmissionsDatabase(
+        os.path.join(TEST_DATA_DIR, "input4MIPs")
+    ).find_files(VARIABLE_ID, SOURCE_ID)[0]
+    shutil.copy(fname, archive)
+
+    return InputEmissionsDatabase(str(archive))
+
+
+def test_get_store_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_INGEST_DIR", str(tmp_path))
+
+    assert get_store_path(VARIABLE_ID, SOURCE_ID) == os.path.join(
+        tmp_path, VARIABLE_ID, f"{SOURCE_ID}.zarr"
+    )
+
+
+def test_ingest(database):
+    exp = database.load_annual_mean(VARIABLE_ID, SOURCE_ID)
+
+    assert database.ingest(VARIABLE_ID, SOURCE_ID)
+    path = get_store_path(VARIABLE_ID, SOURCE_ID)
+    assert os.path.exists(os.path.join(path, ".zmetadata"))
+
+    store = xr.open_zarr(path)
+    assert store["CH4_em_anthro"].dims == ("year", "sector", "lat", "lon")
+    assert store["CH4_em_anthro"].encoding["chunks"] == (1, 1, 90, 80)
+    assert store.attrs["source_files"] == get_source_files_identity(
+        database.find_files(VARIABLE_ID, SOURCE_ID)
+    )
+
+    res = database.load_annual_mean(VARIABLE_ID, SOURCE_ID)
+    xr.testing.assert_allclose(res.transpose(*exp.dims), exp)
+    assert res.attrs["units"] == exp.attrs["units"]
+
+
+def test_ingest_up_to_date(database):
+    assert database.ingest(VARIABLE_ID, SOURCE_ID)
+    assert not database.ingest(VARIABLE_ID, SOURCE_ID)
+    assert database.ingest(VARIABLE_ID, SOURCE_ID, force=True)
+
+
+def test_ingest_missing(database):
+    with pytest.raises(ValueError, match="Could not find any matching data"):
+        database.ingest("other", SOURCE_ID)
+
+
+def test_load_annual_mean_subset(database):
+    kwargs = dict(
+        bbox=BoundingBox(lon_min=140, lat_min=-40, lon_max=150, lat_max=-30),
+        years=(2016, 2040),
+        sector=2,
+    )
+    exp = database.load_annual_mean(VARIABLE_ID, SOURCE_ID, **kwargs)
+    assert exp["year"].values.tolist() == [2015, 2020, 2040]
+
+    database.ingest(VARIABLE_ID, SOURCE_ID)
+    res = database.load_annual_mean(VARIABLE_ID, SOURCE_ID, **kwargs)
+
+    assert "sector" not in res.dims
+    xr.testing.assert_allclose(res.transpose(*exp.dims), exp)
+
+
+def test_load_annual_mean_out_of_date(database, caplog):
+    database.ingest(VARIABLE_ID, SOURCE_ID)
+
+    # Modifying a source file invalidates the store
+    fname = database.find_files(VARIABLE_ID, SOURCE_ID)[0]
+    os.utime(fname, ns=(0, 0))
+
+    with caplog.at_level(logging.WARNING):
+        res = database.load_annual_mean(VARIABLE_ID, SOURCE_ID, sector=0)
+    assert "is out of date" in caplog.text
+    assert np.isfinite(res.values).any()
@@ -1,17 +1,31 @@
 import logging
 import os
+import pickle
+import shutil
+import subprocess
+import sys
 
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
 import pytest
 import scmdata
 import scmdata.testing
 import xarray as xr
 
+import spaemis.input_data
 from spaemis.config import InputTimeseries
 from spaemis.constants import TEST_DATA_DIR
 from spaemis.input_data import (
+    BoundingBox,
     InputEmissionsDatabase,
+    TimeseriesIndex,
+    _get_neighbouring_years,
+    apply_filters,
+    get_database,
     initialize_database,
     load_timeseries,
+    read_timeseries,
 )
 
 TEST_INPUT_DATA = os.path.join(TEST_DATA_DIR, "input4MIPs")
@@ -31,6 +45,213 @@ def test_emissions_database(inp):
     assert "CH4_em_anthro" in ch4_data.data_vars
 
 
+def test_database_find_files():
+    database = InputEmissionsDatabase(TEST_INPUT_DATA)
+
+    res = database.find_files(
+        variable_id="CH4-em-anthro", source_id="IAMC-MESSAGE-GLOBIOM-ssp245-1-1"
+    )
+    assert len(res) == 1
+    assert os.path.basename(res[0]).startswith("CH4-em-anthro_input4MIPs")
+
+    assert database.find_files(variable_id="CH4-em-anthro", source_id="other") == []
+
+
+def test_database_load_bbox():
+    database = InputEmissionsDatabase(TEST_INPUT_DATA)
+    full = database.load("CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1")
+
+    bbox = BoundingBox(lon_min=140.0, lat_min=-40.2, lon_max=150.0, lat_max=-30.0)
+    res = database.load("CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1", bbox)
+
+    assert res["lon"].values.tolist() == list(np.arange(140.5, 150))
+    assert res["lat"].values.tolist() == list(np.arange(-39.5, -30))
+    xr.testing.assert_identical(
+        res["CH4_em_anthro"],
+        full["CH4_em_anthro"].sel(lat=slice(-40.2, -30), lon=slice(140, 150)),
+    )
+
+
+def make_global_dataset(lon):
+    return xr.Dataset(
+        {
+            "emissions": xr.DataArray(
+                np.arange(3 * len(lon)).reshape(3, len(lon)),
+                coords={"lat": [-1.0, 0.0, 1.0], "lon": lon},
+                dims=("lat", "lon"),
+            )
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "lon,bbox_lon,exp_lon",
+    [
+        (np.arange(0.5, 360), (-3, 3), [-2.5, -1.5, -0.5, 0.5, 1.5, 2.5]),
+        (np.arange(0.5, 360), (357, 363), [357.5, 358.5, 359.5, 360.5, 361.5, 362.5]),
+        (
+            np.arange(-179.5, 180),
+            (177, 183),
+            [177.5, 178.5, 179.5, 180.5, 181.5, 182.5],
+        ),
+        (
+            np.arange(-179.5, 180),
+            (-183, -177),
+            [-182.5, -181.5, -180.5, -179.5, -178.5, -177.5],
+        ),
+        (np.arange(-179.5, 180), (10, 12), [10.5, 11.5]),
+    ],
+)
+def test_bbox_select_wraparound(lon, bbox_lon, exp_lon):
+    ds = make_global_dataset(lon)
+    bbox = BoundingBox(
+        lon_min=bbox_lon[0], lat_min=-0.5, lon_max=bbox_lon[1], lat_max=1.0
+    )
+
+    res = bbox.select(ds)
+
+    assert res["lat"].values.tolist() == [0.0, 1.0]
+    assert res["lon"].values.tolist() == exp_lon
+    # Values are taken from the equivalent longitude in the original dataset
+    exp = ds["emissions"].sel(
+        lat=[0.0, 1.0], lon=(np.array(exp_lon) - lon[0]) % 360 + lon[0]
+    )
+    npt.assert_array_equal(res["emissions"].values, exp.values)
+
+
+def test_bbox_select_global():
+    ds = make_global_dataset(np.arange(0.5, 360))
+    bbox = BoundingBox(lon_min=-180, lat_min=-90, lon_max=180, lat_max=90)
+
+    xr.testing.assert_identical(bbox.select(ds), ds)
+
+
+def test_bbox_from_grid():
+    res = BoundingBox.from_grid([-10, -20], [140, 150, 145], halo=1)
+    assert res == BoundingBox(lon_min=139, lat_min=-21, lon_max=151, lat_max=-9)
+
+    res = BoundingBox.from_grid([89.5], [0], halo=1)
+    assert res.lat_max == 90
+
+    assert res.union(BoundingBox(-10, 0, 1, 1)) == BoundingBox(-10, 0, 1, 90)
+
+
+@pytest.mark.parametrize(
+    "required,exp",
+    [
+        ([2015], [2015]),
+        ([2016], [2015, 2020]),
+        ([2016, 2040], [2015, 2020, 2040]),
+        ([2010], [2015, 2020]),
+        ([2101], [2050, 2100]),
+    ],
+)
+def test_get_neighbouring_years(required, exp):
+    assert (
+        _get_neighbouring_years([2015, 2020, 2030, 2040, 2050, 2100], required) == exp
+    )
+
+
+@pytest.fixture()
+def archive(tmp_path):
+    time_ranges = ["175001-201412", "201501-210012", "unknown"]
+    for time_range in time_ranges:
+        fname = (
+            "CH4-em-anthro_input4MIPs_emissions_CMIP_CEDS-2017-05-18_gn_"
+            f"{time_range}.nc"
+        )
+        (tmp_path / fname).touch()
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "years,exp",
+    [
+        (None, ["175001-201412", "201501-210012", "unknown"]),
+        ([2014], ["175001-201412", "unknown"]),
+        ([2020, 2050], ["201501-210012", "unknown"]),
+        ([2014, 2015], ["175001-201412", "201501-210012", "unknown"]),
+        ([1700], ["175001-201412", "unknown"]),
+        ([2200], ["201501-210012", "unknown"]),
+    ],
+)
+def test_database_find_files_years(archive, years, exp):
+    database = InputEmissionsDatabase(archive)
+
+    res = database.find_files("CH4-em-anthro", "CEDS-2017-05-18", years=years)
+    assert [os.path.splitext(fname)[0].split("_")[-1] for fname in res] == exp
+
+
+def test_database_load_years_sector():
+    database = InputEmissionsDatabase(TEST_INPUT_DATA)
+    full = database.load("CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1")
+
+    res = database.load(
+        "CH4-em-anthro",
+        "IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+        years=(2016, 2040),
+        sector=2,
+    )
+
+    assert "sector" not in res["CH4_em_anthro"].dims
+    assert sorted(set(res["time"].dt.year.values)) == [2015, 2020, 2040]
+    xr.testing.assert_identical(
+        res["CH4_em_anthro"],
+        full["CH4_em_anthro"]
+        .sel(sector=2)
+        .isel(time=full["time"].dt.year.isin([2015, 2020, 2040])),
+    )
+
+
+def test_database_load_cached():
+    database = InputEmissionsDatabase(TEST_INPUT_DATA)
+
+    res = database.load("CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1")
+    assert database.load("CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1") is res
+    assert database.load("CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1", sector=1)
+
+    stats = database.cache.stats
+    assert (stats.hits, stats.misses, stats.entries) == (1, 2, 2)
+    assert (
+        stats.nbytes
+        == res.nbytes
+        + database.load(
+            "CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1", sector=1
+        ).nbytes
+    )
+
+
+@pytest.mark.parametrize("threads", ["1", "4"])
+def test_database_load_multiple_files(tmp_path, monkeypatch, threads):
+    monkeypatch.setenv("SPAEMIS_IO_THREADS", threads)
+    source = xr.open_dataset(
+        InputEmissionsDatabase(TEST_INPUT_DATA).find_files(
+            "CH4-em-anthro", "IAMC-MESSAGE-GLOBIOM-ssp245-1-1"
+        )[0]
+    )
+    # Split the source into a file per decade
+    for decade in range(2010, 2110, 10):
+        ds = source.sel(time=source["time"].dt.year // 10 == decade // 10)
+        if not ds.sizes["time"]:
+            continue
+        years = ds["time"].dt.year
+        ds.to_netcdf(
+            tmp_path / "CH4-em-anthro_input4MIPs_emissions_ScenarioMIP_test_gn_"
+            f"{int(years.min())}01-{int(years.max())}12.nc"
+        )
+    database = InputEmissionsDatabase(str(tmp_path))
+
+    res = database.load("CH4-em-anthro", "test", years=(2040, 2071), sector=1)
+
+    assert sorted(set(res["time"].dt.year.values)) == [2040, 2070, 2080]
+    xr.testing.assert_allclose(
+        res["CH4_em_anthro"],
+        source["CH4_em_anthro"]
+        .sel(sector=1)
+        .isel(time=source["time"].dt.year.isin([2040, 2070, 2080])),
+    )
+
+
 def test_database_register_overlapping(caplog):
     database = InputEmissionsDatabase(TEST_INPUT_DATA)
     assert database.paths == [TEST_INPUT_DATA]
@@ -78,6 +299,23 @@ def test_initialize_data(monkeypatch, paths):
     assert res.paths == list(paths)
 
 
+def test_get_database():
+    res = get_database()
+
+    assert res is get_database()
+    assert res is spaemis.input_data.database
+    assert os.path.join(TEST_DATA_DIR, "input4MIPs") in res.paths
+
+
+def test_database_not_initialised_on_import():
+    # The input paths shouldn't be scanned when spaemis is imported
+    code = (
+        "import spaemis.input_data, spaemis.scaling, spaemis.project; "
+        "assert spaemis.input_data._database is None"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)  # noqa: S603
+
+
 def test_load_timeseries():
     res = load_timeseries(
         [
@@ -101,6 +339,7 @@ def test_load_timeseries():
 
     exp = scmdata.ScmRun(os.path.join(TEST_DATA_DIR, "config", "emissions_country.csv"))
 
+    assert isinstance(res, TimeseriesIndex)
     scmdata.testing.assert_scmdf_almost_equal(
         res["test"], exp, check_ts_names=False, allow_unordered=True
     )
@@ -121,6 +360,172 @@ def test_load_timeseries():
     )
 
 
+def test_load_timeseries_shared_file(mocker):
+    mock_read = mocker.patch(
+        "spaemis.input_data.read_timeseries", wraps=read_timeseries
+    )
+
+    res = load_timeseries(
+        [
+            InputTimeseries(name="test", path="emissions_country.csv", filters=[]),
+            InputTimeseries(name="test2", path="emissions_country.csv", filters=[]),
+        ],
+        root_dir=os.path.join(TEST_DATA_DIR, "config"),
+    )
+
+    # The file is only read once, but each timeseries is independent
+    assert mock_read.call_count == 1
+    assert res["test"] is not res["test2"]
+    res["test"]["extra"] = "value"
+    assert "extra" not in res["test2"].meta_attributes
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        [],
+        [{}],
+        [dict(region="World", keep=False)],
+        [dict(variable="Emissions|H2|*"), dict(region=["AUS", "World"])],
+        [dict(variable="Emissions|H2|*"), dict(year=range(2020, 2050))],
+        [dict(year=2030, keep=False), dict(variable="Emissions|CO|*")],
+        [dict(variable="Emissions|H2|*"), dict(variable="Emissions|CO|*")],
+        [dict(variable="*", keep=False)],
+        # Filters used by the configurations
+        [dict(region="AUS"), dict(variable="Emissions|H2|Industrial Sector")],
+        [dict(region="AUS"), dict(variable="Emissions|H2|*")],
+        [dict(variable="*|Transportation Sector", region="AUS")],
+        [dict(variable="Emissions|*|Energy Sector"), dict(year=2030, keep=False)],
+    ],
+)
+def test_apply_filters(filters):
+    ts = scmdata.ScmRun(os.path.join(TEST_DATA_DIR, "config", "emissions_country.csv"))
+
+    exp = ts
+    for f in filters:
+        exp = exp.filter(**f)
+
+    res = apply_filters(ts, filters)
+    assert res is not ts
+    assert res.shape == exp.shape
+    if len(exp):
+        scmdata.testing.assert_scmdf_almost_equal(
+            res, exp, check_ts_names=False, allow_unordered=True
+        )
+
+
+def test_apply_filters_keep_invalid():
+    ts = scmdata.ScmRun(os.path.join(TEST_DATA_DIR, "config", "emissions_country.csv"))
+
+    with pytest.raises(ValueError, match="If keep==False"):
+        apply_filters(ts, [dict(region="World", year=2030, keep=False)])
+
+
+def test_read_timeseries_cached(tmp_path, mocker):
+    pytest.importorskip("pyarrow")
+    fname = tmp_path / "emissions_country.csv"
+    shutil.copy(os.path.join(TEST_DATA_DIR, "config", "emissions_country.csv"), fname)
+    mock_run = mocker.patch("scmdata.ScmRun", wraps=scmdata.ScmRun)
+
+    exp = read_timeseries(str(fname))
+    res = read_timeseries(str(fname))
+
+    # The second read uses the cached copy
+    assert [
+        c.args for c in mock_run.call_args_list if c.args and isinstance(c.args[0], str)
+    ] == [(str(fname),)]
+    scmdata.testing.assert_scmdf_almost_equal(res, exp, check_ts_names=False)
+    pd.testing.assert_frame_equal(res.meta, exp.meta)
+
+    # Modifying the file invalidates the cache
+    os.utime(fname, ns=(0, 0))
+    read_timeseries(str(fname))
+    assert [
+        c.args for c in mock_run.call_args_list if c.args and isinstance(c.args[0], str)
+    ][-1] == (str(fname),)
+
+
+@pytest.fixture()
+def timeseries_index():
+    ts = scmdata.ScmRun(os.path.join(TEST_DATA_DIR, "config", "emissions_country.csv"))
+    return TimeseriesIndex({"emissions": ts, "empty": ts.filter(region="unknown")})
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        [dict(variable="Emissions|H2|Transportation Sector", region="AUS")],
+        [
+            dict(region="AUS"),
+            dict(variable="Emissions|H2|*"),
+            dict(variable="*Industrial*"),
+        ],
+        [
+            dict(
+                variable="Emissions|H2|Transportation Sector",
+                region="AUS",
+                year=range(2030, 2060),
+            )
+        ],
+    ],
+)
+def test_timeseries_index(timeseries_index, filters):
+    res = timeseries_index.get_annual("emissions", filters)
+
+    exp = apply_filters(timeseries_index["emissions"], filters).resample("AS")
+    scmdata.testing.assert_scmdf_almost_equal(res.run, exp, check_ts_names=False)
+    npt.assert_allclose(res.values, exp.values.squeeze())
+    assert res.first_year == exp["year"].min()
+    assert res.unit == exp.get_unique_meta("unit", True)
+
+    npt.assert_allclose(
+        res.get_values([2040, 2035]),
+        exp.filter(year=[2040, 2035]).values.squeeze()[::-1],
+    )
+
+    # Subsequent lookups are reused
+    assert timeseries_index.get_annual("emissions", filters) is res
+    assert (
+        timeseries_index.get_annual(
+            "emissions", [dict(reversed(f.items())) for f in filters]
+        )
+        is res
+    )
+
+
+def test_timeseries_index_mapping(timeseries_index):
+    assert list(timeseries_index) == ["emissions", "empty"]
+    assert len(timeseries_index) == 2
+    assert "emissions" in timeseries_index
+    assert timeseries_index.get("unknown") is None
+
+    # Can be sent to other processes
+    res = pickle.loads(pickle.dumps(timeseries_index))  # noqa: S301
+    npt.assert_allclose(
+        res.get_annual(
+            "emissions", [dict(variable="*H2|Industrial*", region="AUS")]
+        ).values,
+        timeseries_index.get_annual(
+            "emissions", [dict(variable="*H2|Industrial*", region="AUS")]
+        ).values,
+    )
+
+
+def test_timeseries_index_invalid(timeseries_index):
+    with pytest.raises(ValueError, match="Source dataset is not loaded: unknown"):
+        timeseries_index.get_annual("unknown", [])
+    with pytest.raises(ValueError, match="No data matching"):
+        timeseries_index.get_annual("empty", [])
+    with pytest.raises(ValueError, match="More than one match"):
+        timeseries_index.get_annual("emissions", [dict(region="AUS")])
+
+    res = timeseries_index.get_annual(
+        "emissions", [dict(variable="Emissions|H2|Transportation Sector", region="AUS")]
+    )
+    with pytest.raises(ValueError, match="No timeseries data for year=2101"):
+        res.get_values([2020, 2101])
+
+
 def test_load_timeseries_duplicate():
     with pytest.raises(ValueError, match="Duplicate input timeseries found: test"):
         load_timeseries(
@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+from spaemis.input_index import InputIndex, get_default_index_path, parse_filename
+
+FNAME = "{variable}_input4MIPs_emissions_ScenarioMIP_IAMC-{source}_gn_{time}.nc"
+
+
+def _create_file(root, variable="CO-em-anthro", source="ssp245", time="201501-210012"):
+    directory = root / variable / "gn"
+    directory.mkdir(parents=True, exist_ok=True)
+    fname = directory / FNAME.format(variable=variable, source=source, time=time)
+    fname.touch()
+    return str(fname)
+
+
+@pytest.fixture()
+def index(tmp_path):
+    index = InputIndex(str(tmp_path / "index.sqlite"))
+    yield index
+    index.close()
+
+
+def test_parse_filename():
+    fname = FNAME.format(
+        variable="CO-em-anthro",
+        source="MESSAGE-GLOBIOM-ssp245-1-1",
+        time="201501-210012",
+    )
+    res = parse_filename(f"/data/{fname}")
+    assert res == {
+        "variable_id": "CO-em-anthro",
+        "institute_id": "ScenarioMIP",
+        "source_id": "IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+        "filename": f"/data/{fname}",
+        "start_year": 2015,
+        "end_year": 2100,
+    }
+
+    assert parse_filename("CO-em-anthro_input4MIPs.nc") is None
+    assert parse_filename("a_b_c_d_e_f_fx.nc")["start_year"] is None
+
+
+def test_default_index_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("SPAEMIS_CACHE_DIR", str(tmp_path))
+    assert get_default_index_path() == str(tmp_path / "input4MIPs-index.sqlite")
+
+    monkeypatch.setenv("SPAEMIS_INPUT_INDEX", ":memory:")
+    assert get_default_index_path() == ":memory:"
+
+
+def test_refresh(index, tmp_path):
+    root = tmp_path / "archive"
+    exp = [
+        _create_file(root),
+        _create_file(root, variable="NOx-em-anthro"),
+        _create_file(root, source="ssp119"),
+    ]
+    (root / "notes.txt").touch()
+
+    index.refresh(str(root))
+
+    res = index.query([str(root)])
+    assert res.filename.tolist() == sorted(exp)
+    assert res.start_year.tolist() == [2015] * 3
+
+    res = index.query([str(root)], variable_id="CO-em-anthro", source_id="IAMC-ssp119")
+    assert res.filename.tolist() == [exp[2]]
+
+    # Only files within the requested paths are returned
+    assert not len(index.query([str(tmp_path / "other")]))
+    assert not len(index.query([]))
+
+
+def test_refresh_incremental(index, tmp_path, mocker):
+    root = tmp_path / "archive"
+    _create_file(root)
+    _create_file(root, variable="NOx-em-anthro")
+    index.refresh(str(root))
+
+    mock_scan = mocker.spy(InputIndex, "_scan_directory")
+    index.refresh(str(root))
+    mock_scan.assert_not_called()
+
+    # Adding a file only rescans the modified directory
+    new_file = _create_file(root, variable="NOx-em-anthro", source="ssp119")
+    index.refresh(str(root))
+    assert mock_scan.call_count == 1
+    assert new_file in index.query([str(root)]).filename.tolist()
+
+    # Removed directories are removed from the index
+    os.remove(new_file)
+    os.remove(_create_file(root, variable="NOx-em-anthro"))
+    os.rmdir(root / "NOx-em-anthro" / "gn")
+    os.rmdir(root / "NOx-em-anthro")
+    index.refresh(str(root))
+    assert index.query([str(root)]).variable_id.tolist() == ["CO-em-anthro"]
+
+
+def test_refresh_persistent(tmp_path, mocker):
+    root = tmp_path / "archive"
+    exp = _create_file(root)
+    InputIndex(str(tmp_path / "index.sqlite")).refresh(str(root))
+
+    mock_scan = mocker.spy(InputIndex, "_scan_directory")
+    index = InputIndex(str(tmp_path / "index.sqlite"))
+    index.refresh(str(root))
+
+    mock_scan.assert_not_called()
+    assert index.query([str(root)]).filename.tolist() == [exp]
+
+
+def test_refresh_nested(index, tmp_path):
+    root = tmp_path / "archive"
+    _create_file(root)
+    index.refresh(str(root / "CO-em-anthro"))
+    index.refresh(str(root))
+
+    # Modifying the nested root doesn't break the parent
+    exp = _create_file(root, source="ssp119")
+    index.refresh(str(root / "CO-em-anthro"))
+    index.refresh(str(root))
+    assert exp in index.query([str(root)]).filename.tolist()
+
+
+def test_refresh_missing(index, tmp_path):
+    index.refresh(str(tmp_path / "missing"))
+    assert not len(index.query([str(tmp_path / "missing")]))
+
+
+def test_unwritable_index(tmp_path, caplog):
+    (tmp_path / "file").touch()
+    index = InputIndex(str(tmp_path / "file" / "index.sqlite"))
+
+    root = tmp_path / "archive"
+    exp = _create_file(root)
+    index.refresh(str(root))
+
+    assert "Using an in-memory index" in caplog.text
+    assert index.query([str(root)]).filename.tolist() == [exp]
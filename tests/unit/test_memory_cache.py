@@ -0,0 +1,164 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from spaemis.memory_cache import (
+    CacheStats,
+    MemoryBudget,
+    MemoryCache,
+    get_default_max_bytes,
+    get_nbytes,
+)
+
+
+def test_default_max_bytes(monkeypatch):
+    monkeypatch.setenv("SPAEMIS_CACHE_MAX_BYTES", "100")
+    assert get_default_max_bytes() == 100
+    assert MemoryCache().max_bytes == 100
+
+
+def test_get_nbytes():
+    assert get_nbytes(np.zeros(10)) == 80
+    assert get_nbytes("abc") == 0
+
+
+def test_get_or_load():
+    cache = MemoryCache(max_bytes=100)
+
+    assert cache.get_or_load("a", lambda: np.zeros(2)).tolist() == [0, 0]
+    # The value isn't loaded again
+    assert cache.get_or_load("a", lambda: np.ones(2)).tolist() == [0, 0]
+
+    assert cache.stats == CacheStats(
+        hits=1, misses=1, evictions=0, entries=1, nbytes=16
+    )
+
+
+def test_evict_lru():
+    cache = MemoryCache(max_bytes=100)
+
+    cache.get_or_load("a", lambda: np.zeros(5))
+    cache.get_or_load("b", lambda: np.zeros(5))
+    # a is now the most recently used
+    cache.get_or_load("a", lambda: np.zeros(5))
+    cache.get_or_load("c", lambda: np.zeros(5))
+
+    assert cache.stats.evictions == 1
+    assert cache.stats.nbytes == 80
+    assert cache.get_or_load("a", lambda: np.ones(5))[0] == 0
+    assert cache.get_or_load("b", lambda: np.ones(5))[0] == 1
+
+
+def test_too_large():
+    cache = MemoryCache(max_bytes=10)
+
+    cache.get_or_load("a", lambda: np.zeros(5))
+
+    assert cache.stats == CacheStats(misses=1)
+
+
+def test_disabled():
+    cache = MemoryCache(max_bytes=0)
+
+    assert cache.get_or_load("a", lambda: np.zeros(5))[0] == 0
+    assert cache.get_or_load("a", lambda: np.ones(5))[0] == 1
+
+
+def test_failed_load():
+    cache = MemoryCache(max_bytes=100)
+
+    def _fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        cache.get_or_load("a", _fail)
+
+    # Failures aren't cached
+    assert cache.get_or_load("a", lambda: np.zeros(1))[0] == 0
+
+
+def test_single_flight():
+    cache = MemoryCache(max_bytes=1000)
+    calls = []
+    started = threading.Event()
+
+    def _load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return np.zeros(5)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("a", _load)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 4
+    assert all(res is results[0] for res in results)
+    assert cache.stats.misses == 1
+    assert cache.stats.hits == 3
+
+
+def test_clear():
+    cache = MemoryCache(max_bytes=100)
+    cache.get_or_load("a", lambda: np.zeros(2))
+
+    cache.clear()
+
+    assert cache.stats == CacheStats(misses=1)
+    assert cache.get_or_load("a", lambda: np.ones(2))[0] == 1
+
+
+def test_shared_budget():
+    budget = MemoryBudget(max_bytes=100)
+    first = MemoryCache(budget=budget)
+    second = MemoryCache(max_bytes=60, budget=budget)
+
+    second.get_or_load("a", lambda: np.zeros(5))
+    first.get_or_load("b", lambda: np.zeros(5))
+    assert budget.nbytes == 80
+
+    # The least recently used entry of any cache is evicted
+    first.get_or_load("c", lambda: np.zeros(5))
+    assert budget.nbytes == 80
+    assert second.stats == CacheStats(misses=1, evictions=1)
+    assert first.stats.entries == 2
+
+    # The limit of an individual cache still applies
+    first.clear()
+    second.get_or_load("d", lambda: np.zeros(5))
+    second.get_or_load("e", lambda: np.zeros(5))
+    assert second.stats == CacheStats(misses=3, evictions=2, entries=1, nbytes=40)
+    assert budget.nbytes == 40
+
+
+def test_shared_budget_collected():
+    budget = MemoryBudget(max_bytes=100)
+    cache = MemoryCache(budget=budget)
+    cache.get_or_load("a", lambda: np.zeros(5))
+
+    del cache
+    assert budget.nbytes == 0
+
+
+def test_close_evicted(mocker):
+    cache = MemoryCache(max_bytes=100)
+    first, second, third = (mocker.Mock(nbytes=60) for _ in range(3))
+
+    cache.get_or_load("a", lambda: first)
+    cache.get_or_load("b", lambda: second)
+    first.close.assert_called_once()
+    second.close.assert_not_called()
+
+    cache.get_or_load("c", lambda: third)
+    cache.clear()
+    second.close.assert_called_once()
+    third.close.assert_called_once()
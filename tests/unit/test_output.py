@@ -0,0 +1,185 @@
+import importlib.util
+import os
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+import xarray as xr
+
+from spaemis.cells import CellMask
+from spaemis.output import InMemoryOutput, NetCDFOutput, OutputCoords, ZarrOutput
+
+HAS_DASK = importlib.util.find_spec("dask") is not None
+HAS_ZARR = importlib.util.find_spec("zarr") is not None
+
+
+@pytest.fixture()
+def coords():
+    return OutputCoords(
+        variables=["CO", "NOx"],
+        sectors=["industry", "rail"],
+        years=[2020, 2040],
+        lat=xr.DataArray(np.arange(3.0), dims="lat"),
+        lon=xr.DataArray(np.arange(4.0), dims="lon"),
+    )
+
+
+@pytest.mark.parametrize(
+    "lazy",
+    [
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(not HAS_DASK, reason="dask not installed"),
+        ),
+        False,
+    ],
+)
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_in_memory_output(coords, lazy, dtype):
+    output = InMemoryOutput(dtype=dtype, lazy=lazy)
+    output.declare(coords)
+
+    values = np.ones((2, 3, 4))
+    values[1] = 2
+    output.write_slice("CO", "rail", [2020, 2040], values)
+
+    res = output.to_dataset()
+    assert list(res.data_vars) == ["CO", "NOx"]
+    assert res["CO"].dims == ("sector", "year", "lat", "lon")
+    assert res["CO"].dtype == dtype
+
+    npt.assert_allclose(res["CO"].sel(sector="rail", year=2020), 1)
+    npt.assert_allclose(res["CO"].sel(sector="rail", year=2040), 2)
+    assert res["CO"].sel(sector="industry").isnull().all()
+    assert res["NOx"].isnull().all()
+
+    # Materialised datasets are reused
+    assert output.to_dataset() is res
+    with pytest.raises(ValueError, match="Output has already been materialised"):
+        output.write_slice("CO", "industry", [2020], values[:1])
+
+
+def test_in_memory_output_only_stores_written_blocks(coords):
+    output = InMemoryOutput(lazy=False)
+    output.declare(coords)
+    output.write_slice("CO", "rail", [2020], np.ones((1, 3, 4)))
+
+    assert list(output._blocks) == [("CO", "rail", 2020)]
+
+
+def test_in_memory_output_wrong_shape(coords):
+    output = InMemoryOutput()
+    output.declare(coords)
+
+    with pytest.raises(ValueError, match=r"Expected shape \(3, 4\), got \(4, 3\)"):
+        output.write_slice("CO", "rail", [2020], np.ones((1, 4, 3)))
+
+
+def test_in_memory_output_undeclared():
+    with pytest.raises(ValueError, match="Output coordinates have not been declared"):
+        InMemoryOutput().write_slice("CO", "rail", [2020], np.ones((1, 4, 3)))
+
+
+@pytest.mark.parametrize(
+    "output_cls,fname",
+    [
+        (NetCDFOutput, "output.nc"),
+        pytest.param(
+            ZarrOutput,
+            "output.zarr",
+            marks=pytest.mark.skipif(not HAS_ZARR, reason="zarr not installed"),
+        ),
+    ],
+)
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_streaming_output(coords, tmp_path, output_cls, fname, dtype):
+    path = str(tmp_path / fname)
+    output = output_cls(path, dtype=dtype)
+    output.declare(coords)
+    assert os.path.exists(path)
+
+    values = np.ones((2, 3, 4))
+    values[1] = 2
+    output.write_slice("CO", "rail", [2020, 2040], values)
+
+    res = output.to_dataset()
+    assert list(res.data_vars) == ["CO", "NOx"]
+    assert res["sector"].values.tolist() == coords.sectors
+    assert res["year"].values.tolist() == coords.years
+    assert res["CO"].dims == ("sector", "year", "lat", "lon")
+    assert res["CO"].dtype == dtype
+
+    npt.assert_allclose(res["CO"].sel(sector="rail", year=2020), 1)
+    npt.assert_allclose(res["CO"].sel(sector="rail", year=2040), 2)
+    assert res["CO"].sel(sector="industry").isnull().all()
+    assert res["NOx"].isnull().all()
+    res.close()
+
+
+def test_netcdf_output_inspect_partial(coords, tmp_path):
+    path = str(tmp_path / "output.nc")
+    output = NetCDFOutput(path)
+    output.declare(coords)
+    output.write_slice("NOx", "industry", [2040], np.full((1, 3, 4), 3.0))
+
+    # Slices are flushed to disk as they are written
+    output.close()
+    with xr.open_dataset(path) as res:
+        npt.assert_allclose(res["NOx"].sel(sector="industry", year=2040), 3)
+        assert res["NOx"].sel(year=2020).isnull().all()
+
+
+def test_netcdf_output_closed(coords, tmp_path):
+    output = NetCDFOutput(str(tmp_path / "output.nc"))
+    with pytest.raises(ValueError, match="Output file is not open"):
+        output.write_slice("NOx", "industry", [2040], np.full((1, 3, 4), 3.0))
+
+
+@pytest.mark.parametrize(
+    "lazy",
+    [
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(not HAS_DASK, reason="dask not installed"),
+        ),
+        False,
+    ],
+)
+def test_in_memory_output_cells(coords, lazy):
+    cells = CellMask(
+        lat=coords.lat.values, lon=coords.lon.values, index=np.array([1, 5, 6])
+    )
+    coords.cells = cells
+    output = InMemoryOutput(lazy=lazy)
+    output.declare(coords)
+
+    output.write_cells("CO", "rail", [2020, 2040], np.array([[1, 2, 3], [4, 5, 6]]))
+    # Dense slices are compressed
+    output.write_slice("NOx", "rail", [2020], np.ones((1, 3, 4)))
+    assert output._blocks[("NOx", "rail", 2020)].shape == (3,)
+
+    with pytest.raises(ValueError, match="Expected shape"):
+        output.write_cells("CO", "rail", [2020], np.ones((1, 4)))
+
+    res = output.to_dataset()
+    exp = np.full((3, 4), np.nan)
+    exp[0, 1], exp[1, 1], exp[1, 2] = 4, 5, 6
+    npt.assert_allclose(res["CO"].sel(sector="rail", year=2040), exp)
+    assert res["NOx"].sel(sector="rail", year=2020).sum() == 3
+    assert res["CO"].sel(sector="industry").isnull().all()
+
+
+def test_netcdf_output_cells(coords, tmp_path):
+    coords.cells = CellMask(
+        lat=coords.lat.values, lon=coords.lon.values, index=np.array([0, 11])
+    )
+    output = NetCDFOutput(str(tmp_path / "output.nc"))
+    output.declare(coords)
+    output.write_cells("CO", "rail", [2020], np.array([[1.0, 2.0]]))
+
+    res = output.to_dataset()
+    values = res["CO"].sel(sector="rail", year=2020).values
+    assert values[0, 0] == 1
+    assert values[2, 3] == 2
+    assert np.isnan(values).sum() == 10
+    res.close()
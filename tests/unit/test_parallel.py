@@ -0,0 +1,79 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from spaemis.parallel import (
+    NATIVE_THREAD_VARIABLES,
+    create_executor,
+    get_num_io_threads,
+    get_num_workers,
+    get_threads_per_worker,
+    limit_native_threads,
+)
+
+
+def test_limit_native_threads(monkeypatch):
+    monkeypatch.setenv("OMP_NUM_THREADS", "8")
+    monkeypatch.delenv("MKL_NUM_THREADS", raising=False)
+
+    with limit_native_threads(2):
+        for key in NATIVE_THREAD_VARIABLES:
+            assert os.environ[key] == "2"
+
+    assert os.environ["OMP_NUM_THREADS"] == "8"
+    assert "MKL_NUM_THREADS" not in os.environ
+
+
+def test_limit_native_threads_runtime(monkeypatch, mocker):
+    # Thread pools which are already running are limited via threadpoolctl
+    threadpoolctl = mocker.MagicMock()
+    monkeypatch.setitem(sys.modules, "threadpoolctl", threadpoolctl)
+
+    with limit_native_threads(2):
+        threadpoolctl.threadpool_limits.assert_called_once_with(limits=2)
+        limiter = threadpoolctl.threadpool_limits.return_value
+        limiter.restore_original_limits.assert_not_called()
+
+    limiter.restore_original_limits.assert_called_once()
+
+
+def test_limit_native_threads_without_threadpoolctl(monkeypatch):
+    monkeypatch.setitem(sys.modules, "threadpoolctl", None)
+
+    with limit_native_threads(2):
+        assert os.environ["OMP_NUM_THREADS"] == "2"
+
+
+def test_get_num_workers(mocker):
+    mocker.patch("os.cpu_count", return_value=6)
+
+    assert get_num_workers() == 6
+    assert get_num_workers(2) == 2
+    assert get_num_workers(0) == 1
+    assert get_threads_per_worker(4) == 1
+    assert get_threads_per_worker(3) == 2
+
+
+def test_get_num_io_threads(monkeypatch):
+    monkeypatch.delenv("SPAEMIS_IO_THREADS", raising=False)
+    assert get_num_io_threads(20) == 8
+    assert get_num_io_threads(3) == 3
+    assert get_num_io_threads(0) == 1
+
+    monkeypatch.setenv("SPAEMIS_IO_THREADS", "2")
+    assert get_num_io_threads(20) == 2
+
+
+@pytest.mark.parametrize(
+    "kind,exp", [("thread", ThreadPoolExecutor), ("process", ProcessPoolExecutor)]
+)
+def test_create_executor(kind, exp):
+    with create_executor(kind, 1) as executor:
+        assert isinstance(executor, exp)
+
+
+def test_create_executor_unknown():
+    with pytest.raises(ValueError, match="Unknown executor: other"):
+        create_executor("other", 1)
@@ -1,19 +1,32 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import numpy.testing as npt
 import pytest
+import scmdata
 import xarray as xr
 
+import spaemis.project
+from spaemis.checkpoint import RunCheckpoint
 from spaemis.config import (
     ConstantScaleMethod,
     PointSource,
     VariableScalerConfig,
     converter,
 )
+from spaemis.output import InMemoryOutput, NetCDFOutput
 from spaemis.project import (
+    _calculate_slice,
     _process_source,
     calculate_point_sources,
     calculate_projections,
+    merge_point_sources,
+    plan_source_loads,
     scale_inventory,
 )
+from spaemis.scaling.base import SourceKey, load_source
+from spaemis.utils import clip_region
 
 
 def test_scale_inventory_missing_variable(inventory):
@@ -63,6 +76,27 @@ def test_scale_inventory_constant(inventory):
     xr.testing.assert_allclose(exp_data.to_dataset(name=config.variable), res)
 
 
+def test_scale_inventory_multiple_years(inventory):
+    config = converter.structure(
+        {
+            "variable": "CO",
+            "sector": "rail",
+            "method": {"name": "constant", "scale_factor": 2},
+        },
+        VariableScalerConfig,
+    )
+    res = scale_inventory(config, inventory, [2030, 2040], {})
+    assert res["CO"].dims == ("sector", "year", "lat", "lon")
+    assert res["year"].values.tolist() == [2030, 2040]
+
+    exp = inventory.data["CO"].sel(sector="rail") * 2
+    for year in [2030, 2040]:
+        xr.testing.assert_allclose(
+            res["CO"].sel(sector="rail", year=year, drop=True),
+            exp.drop_vars("sector"),
+        )
+
+
 def test_scale_inventory_relative(inventory):
     config = converter.structure(
         {
@@ -112,6 +146,218 @@ def test_calculate_projections(config, inventory, loaded_timeseries):
     assert res["H2"].shape == res["CO"].shape
 
 
+def test_plan_source_loads(config):
+    config.scalers.scalers.append(
+        converter.structure(
+            {
+                "variable": "CO",
+                "sector": "motor_vehicles",
+                "method": {
+                    "name": "relative_change",
+                    "variable_id": "NOx-em-anthro",
+                    "source_id": "IAMC-MESSAGE-GLOBIOM-ssp245-1-1",
+                    "sector": "Industrial Sector",
+                },
+            },
+            VariableScalerConfig,
+        )
+    )
+    res = plan_source_loads(config.scalers.scalers)
+
+    nox_industry = SourceKey(
+        "IAMC-MESSAGE-GLOBIOM-ssp245-1-1", "NOx-em-anthro", "Industrial Sector"
+    )
+    assert len(res) == 4
+    assert [(cfg.variable, cfg.sector) for cfg in res[nox_industry]] == [
+        ("NOx", "industry"),
+        ("CO", "motor_vehicles"),
+    ]
+    assert [(cfg.variable, cfg.sector) for cfg in res[None]] == [("H2", "industry")]
+
+
+def test_calculate_projections_loads_sources_once(
+    config, inventory, loaded_timeseries, mocker
+):
+    mock_load = mocker.patch("spaemis.scaling.base.load_source", wraps=load_source)
+    calculate_projections(config, inventory, loaded_timeseries)
+
+    # One call per unique source
+    assert mock_load.call_count == 3
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_calculate_projections_parallel(config, inventory, loaded_timeseries, executor):
+    exp = calculate_projections(config, inventory, loaded_timeseries)
+    res = calculate_projections(
+        config, inventory, loaded_timeseries, executor=executor, workers=2
+    )
+
+    xr.testing.assert_identical(res, exp)
+
+
+def test_calculate_projections_threads_environment(
+    config, inventory, loaded_timeseries, mocker, monkeypatch
+):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    mock_initialise = mocker.patch("spaemis.project._initialise_worker")
+
+    calculate_projections(
+        config, inventory, loaded_timeseries, executor="thread", workers=2
+    )
+
+    # Threads don't modify the process-wide state once the pool is finished
+    mock_initialise.assert_not_called()
+    assert "OMP_NUM_THREADS" not in os.environ
+    assert "context" not in spaemis.project._worker_state
+
+
+def test_calculate_projections_threads_concurrent(config, inventory, loaded_timeseries):
+    emissions = loaded_timeseries["emissions"]
+    doubled = {"emissions": scmdata.ScmRun(emissions.timeseries() * 2)}
+
+    # Each call keeps its own inputs when thread pools run at the same time
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [
+            pool.submit(
+                calculate_projections,
+                config,
+                inventory,
+                timeseries,
+                executor="thread",
+                workers=2,
+            )
+            for timeseries in (loaded_timeseries, doubled)
+        ]
+        res = [future.result() for future in futures]
+
+    xr.testing.assert_identical(
+        res[0], calculate_projections(config, inventory, loaded_timeseries)
+    )
+    xr.testing.assert_identical(
+        res[1], calculate_projections(config, inventory, doubled)
+    )
+
+
+def test_calculate_projections_float32(config, inventory, loaded_timeseries):
+    exp = calculate_projections(config, inventory, loaded_timeseries)
+    res = calculate_projections(
+        config, inventory, loaded_timeseries, output=InMemoryOutput(dtype="float32")
+    )
+
+    assert res["CO"].dtype == np.float32
+    xr.testing.assert_allclose(res.astype(float), exp, rtol=1e-6)
+
+
+def test_calculate_projections_streaming(
+    config, inventory, loaded_timeseries, tmp_path
+):
+    exp = calculate_projections(config, inventory, loaded_timeseries)
+
+    output = NetCDFOutput(str(tmp_path / "projections.nc"))
+    res = calculate_projections(config, inventory, loaded_timeseries, output=output)
+
+    xr.testing.assert_allclose(res, exp)
+    res.close()
+
+
+def test_calculate_projections_resume(
+    config, inventory, loaded_timeseries, tmp_path, mocker
+):
+    exp = calculate_projections(config, inventory, loaded_timeseries)
+
+    checkpoint = RunCheckpoint(str(tmp_path / "run"))
+    res = calculate_projections(
+        config, inventory, loaded_timeseries, checkpoint=checkpoint
+    )
+    xr.testing.assert_allclose(res, exp)
+    res.close()
+    num_slices = len(checkpoint.completed())
+    assert num_slices > 0
+
+    # Forget about a single slice
+    with open(checkpoint.log_path) as fh:
+        lines = fh.readlines()
+    with open(checkpoint.log_path, "w") as fh:
+        fh.writelines(lines[:-1])
+
+    mock_calculate = mocker.patch(
+        "spaemis.project._calculate_slice", wraps=_calculate_slice
+    )
+    res = calculate_projections(
+        config, inventory, loaded_timeseries, checkpoint=checkpoint
+    )
+    xr.testing.assert_allclose(res, exp)
+    res.close()
+
+    mock_calculate.assert_called_once()
+    assert len(mock_calculate.call_args[0][2]) == 1
+    assert len(checkpoint.completed()) == num_slices
+
+
+def test_calculate_projections_incremental(
+    config, inventory, loaded_timeseries, tmp_path, mocker
+):
+    checkpoint = RunCheckpoint(str(tmp_path / "run"))
+    calculate_projections(
+        config, inventory, loaded_timeseries, checkpoint=checkpoint
+    ).close()
+
+    # Modify a single scaler
+    scaler_config = config.scalers.scalers[0]
+    scaler_config.method = ConstantScaleMethod(scale_factor=2)
+
+    mock_calculate = mocker.patch(
+        "spaemis.project._calculate_slice", wraps=_calculate_slice
+    )
+    res = calculate_projections(
+        config, inventory, loaded_timeseries, checkpoint=checkpoint
+    )
+
+    mock_calculate.assert_called_once()
+    assert mock_calculate.call_args[0][1] == scaler_config
+    xr.testing.assert_allclose(
+        res[scaler_config.variable]
+        .sel(sector=scaler_config.sector, year=2040)
+        .reset_coords("year", drop=True),
+        2 * inventory.data[scaler_config.variable].sel(sector=scaler_config.sector),
+    )
+    res.close()
+
+
+def test_calculate_projections_no_resume(
+    config, inventory, loaded_timeseries, tmp_path, mocker
+):
+    checkpoint = RunCheckpoint(str(tmp_path / "run"))
+    res = calculate_projections(
+        config, inventory, loaded_timeseries, checkpoint=checkpoint
+    )
+    res.close()
+    num_slices = len(checkpoint.completed()) // len(config.timeslices)
+
+    mock_calculate = mocker.patch(
+        "spaemis.project._calculate_slice", wraps=_calculate_slice
+    )
+    checkpoint = RunCheckpoint(str(tmp_path / "run"), resume=False)
+    calculate_projections(
+        config, inventory, loaded_timeseries, checkpoint=checkpoint
+    ).close()
+
+    assert mock_calculate.call_count == num_slices
+
+
+def test_calculate_projections_output_and_checkpoint(
+    config, inventory, loaded_timeseries, tmp_path
+):
+    with pytest.raises(ValueError, match="Only one of output or checkpoint"):
+        calculate_projections(
+            config,
+            inventory,
+            loaded_timeseries,
+            output=InMemoryOutput(),
+            checkpoint=RunCheckpoint(str(tmp_path)),
+        )
+
+
 def test_calculate_projections_with_default(config, inventory, loaded_timeseries):
     config.scalers.default_scaler = ConstantScaleMethod()
 
@@ -188,3 +434,22 @@ def test_calculate_point_sources(inventory, config):
 
     assert res["H2"].sel(sector="gas_leak").sum() == 600 * 2 / 3
     assert res["NH3"].sel(sector="gas_leak").sum() == 500
+
+
+def test_merge_point_sources(inventory, config, loaded_timeseries):
+    projections = calculate_projections(config, inventory, loaded_timeseries)
+    point_sources = calculate_point_sources(config, inventory)
+
+    res = merge_point_sources(projections, point_sources, inventory)
+
+    assert set(res.data_vars) == set(projections.data_vars) | {"H2"}
+    exp_total = projections["H2"].sum() + point_sources["H2"].sum() * len(
+        config.timeslices
+    )
+    # Point sources outside of the border are dropped
+    assert projections["H2"].sum() < res["H2"].sum() <= exp_total
+    # Variables without point sources are unchanged
+    xr.testing.assert_allclose(
+        res["CO"],
+        clip_region(projections["CO"].fillna(0), inventory.border_mask),
+    )
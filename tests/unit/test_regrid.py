@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+import xarray as xr
+
+from spaemis.cells import CELL_DIM
+from spaemis.regrid import (
+    get_bilinear_regridder,
+    get_cell_bounds,
+    get_conservative_regridder,
+    get_regridder,
+    weights_cache,
+)
+from spaemis.utils import area_grid
+
+
+@pytest.fixture()
+def source():
+    rng = np.random.default_rng(0)
+    lat = np.arange(-40, -30, 0.5) + 0.25
+    lon = np.arange(140, 150, 0.5) + 0.25
+
+    values = rng.random((2, len(lat), len(lon)))
+    values[:, rng.random((len(lat), len(lon))) < 0.2] = np.nan
+
+    return xr.DataArray(
+        values,
+        coords={"year": [2020, 2030], "lat": lat, "lon": lon},
+        dims=("year", "lat", "lon"),
+    )
+
+
+@pytest.fixture()
+def tmp_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPAEMIS_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_bilinear_grid(source, tmp_cache):
+    # Includes points outside the source grid and on the source points
+    lat = np.concatenate([np.linspace(-41, -29, 50), source.lat.values[2:6]])
+    lon = np.concatenate([np.linspace(139, 151, 40), source.lon.values[3:8]])
+
+    regridder = get_bilinear_regridder(source.lat, source.lon, lat, lon)
+    res = regridder.regrid(source)
+
+    exp = source.interp(lat=lat, lon=lon)
+    xr.testing.assert_allclose(res, exp)
+    assert np.isnan(res.sel(lat=-41)).all()
+
+
+def test_bilinear_points(source, tmp_cache):
+    rng = np.random.default_rng(1)
+    lat = np.concatenate([rng.uniform(-41, -29, 200), source.lat.values[2:6]])
+    lon = np.concatenate([rng.uniform(139, 151, 200), source.lon.values[3:7]])
+
+    regridder = get_bilinear_regridder(source.lat, source.lon, lat, lon, points=True)
+    res = regridder.regrid(source.transpose("lon", "lat", "year"))
+
+    exp = source.interp(
+        lat=xr.DataArray(lat, dims=CELL_DIM), lon=xr.DataArray(lon, dims=CELL_DIM)
+    ).drop_vars(["lat", "lon"])
+    assert res.dims == ("year", CELL_DIM)
+    xr.testing.assert_allclose(res, exp)
+
+
+def test_bilinear_descending(source, tmp_cache):
+    source = source.isel(lat=slice(None, None, -1))
+    lat = np.linspace(-39, -31, 20)
+    lon = np.linspace(141, 149, 20)
+
+    res = get_bilinear_regridder(source.lat, source.lon, lat, lon).regrid(source)
+
+    xr.testing.assert_allclose(res, source.sortby("lat").interp(lat=lat, lon=lon))
+
+
+def test_bilinear_invalid(source, tmp_cache):
+    with pytest.raises(ValueError, match="same shape"):
+        get_bilinear_regridder(
+            source.lat, source.lon, [-35.0, -34.0], [145.0], points=True
+        )
+
+    with pytest.raises(ValueError, match="At least two source points"):
+        get_bilinear_regridder([-35.0], source.lon, [-35.0], [145.0])
+
+    regridder = get_bilinear_regridder(source.lat, source.lon, [-35.0], [145.0])
+    with pytest.raises(ValueError, match="Expected grid"):
+        regridder.regrid(source.isel(lat=slice(1, None)))
+
+
+def test_bilinear_cached(source, tmp_cache, mocker):
+    lat = np.linspace(-39, -31, 30)
+    lon = np.linspace(141, 149, 30)
+
+    regridder = get_bilinear_regridder(source.lat, source.lon, lat, lon)
+    # Reused within the process
+    assert get_bilinear_regridder(source.lat, source.lon, lat, lon) is regridder
+    assert len(os.listdir(weights_cache.directory)) == 1
+
+    # Other processes load the weights from disk
+    mock_calculate = mocker.patch("spaemis.regrid._calculate_bilinear_weights")
+    mocker.patch("spaemis.regrid._regridders.get_or_load", lambda _, load: load())
+
+    res = get_bilinear_regridder(source.lat, source.lon, lat, lon)
+    mock_calculate.assert_not_called()
+    npt.assert_allclose(res.weights.toarray(), regridder.weights.toarray())
+
+
+def test_cell_bounds():
+    npt.assert_allclose(get_cell_bounds([0.5, 1.5, 2.5]), [0, 1, 2, 3])
+    npt.assert_allclose(get_cell_bounds([2.5, 1.5]), [3, 2, 1])
+
+    with pytest.raises(ValueError, match="At least two cells"):
+        get_cell_bounds([0.5])
+
+
+def test_conservative(source, tmp_cache):
+    source = source.fillna(1.0)
+    lat = np.arange(-40, -30, 0.1)[::-1] + 0.05
+    lon = np.arange(140, 150, 0.1) + 0.05
+
+    res = get_conservative_regridder(source.lat, source.lon, lat, lon).regrid(source)
+    assert res.dims == ("year", "lat", "lon")
+    npt.assert_allclose(res.lat, lat)
+
+    # The area integral is preserved
+    npt.assert_allclose(
+        (res * area_grid(lat, lon)).sum(dim=("lat", "lon")),
+        (source * area_grid(source.lat, source.lon)).sum(dim=("lat", "lon")),
+        rtol=1e-5,
+    )
+
+    # Each fine cell is within a single coarse cell
+    xr.testing.assert_allclose(
+        res.sel(lat=source.lat, lon=source.lon, method="nearest").assign_coords(
+            lat=source.lat, lon=source.lon
+        ),
+        source,
+    )
+
+    # Regridding back to the original grid recovers the source
+    coarse = get_conservative_regridder(lat, lon, source.lat, source.lon).regrid(res)
+    xr.testing.assert_allclose(coarse, source)
+
+
+def test_conservative_nan(source, tmp_cache):
+    lat = np.arange(-36, -28, 0.5)
+    lon = np.arange(144, 152, 0.5)
+
+    res = get_conservative_regridder(source.lat, source.lon, lat, lon).regrid(source)
+
+    # Nan cells are excluded from the mean
+    overlap = source.sel(lat=slice(-35.25, -34.75), lon=slice(145.25, 145.75))
+    areas = area_grid(overlap.lat, overlap.lon).where(overlap.notnull())
+    npt.assert_allclose(
+        res.sel(lat=-35.0, lon=145.5),
+        (overlap * areas).sum(dim=("lat", "lon")) / areas.sum(dim=("lat", "lon")),
+    )
+    # Cells outside of the source grid are nan
+    assert res.sel(lat=-29.5).isnull().all()
+    assert res.sel(lon=150.5).isnull().all()
+    assert res.sel(lat=-30).notnull().any()
+
+
+@pytest.mark.parametrize("method", ["bilinear", "conservative"])
+def test_get_regridder(method, tmp_cache):
+    lat = np.arange(-40, -30, 0.5)
+
+    res = get_regridder(method, lat, lat + 180, lat, lat + 180)
+    assert res.normalise == (method == "conservative")
+
+    with pytest.raises(ValueError, match="Unknown regridding method: unknown"):
+        get_regridder("unknown", lat, lat + 180, lat, lat + 180)
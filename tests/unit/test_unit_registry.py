@@ -0,0 +1,40 @@
+import numpy.testing as npt
+import pytest
+
+from spaemis.unit_registry import (
+    convert_to_target_unit,
+    get_unit_conversion,
+    unit_registry,
+)
+
+
+@pytest.mark.parametrize(
+    "initial_unit,target_unit",
+    [
+        ("Mt H2/yr", "kg"),
+        ("kt CH4 / yr", "kg"),
+        ("Gg NOx / a", "t"),
+    ],
+)
+def test_get_unit_conversion(initial_unit, target_unit):
+    scale_factor, unit = get_unit_conversion(initial_unit, target_unit)
+
+    exp = convert_to_target_unit(initial_unit, target_unit)
+    npt.assert_allclose(scale_factor, exp.m)
+    assert unit == str(exp.u)
+    assert unit_registry.Unit(unit) == exp.u
+
+
+def test_get_unit_conversion_cached(mocker):
+    get_unit_conversion.cache_clear()
+    mock_convert = mocker.patch(
+        "spaemis.unit_registry.convert_to_target_unit", wraps=convert_to_target_unit
+    )
+
+    assert get_unit_conversion("Mt H2/yr", "kg") == get_unit_conversion(
+        "Mt H2/yr", "kg"
+    )
+    assert mock_convert.call_count == 1
+
+    get_unit_conversion("Mt H2/yr", "t")
+    assert mock_convert.call_count == 2
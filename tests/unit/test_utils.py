@@ -0,0 +1,130 @@
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pytest
+import xarray as xr
+
+from spaemis.utils import (
+    allocate_points,
+    area_grid,
+    earth_radius,
+    get_cell_areas,
+    get_grid_signature,
+    get_nearest_indices,
+)
+
+
+def _meshgrid_areas(lat, lon):
+    xlon, ylat = np.meshgrid(lon, lat)
+    R = earth_radius(ylat)
+    dy = np.deg2rad(np.gradient(ylat, axis=0)) * R
+    dx = np.deg2rad(np.gradient(xlon, axis=1)) * R * np.cos(np.deg2rad(ylat))
+    return np.abs(dy * dx)
+
+
+@pytest.mark.parametrize(
+    "lat,lon",
+    [
+        (np.arange(-40, -10, 0.5) + 0.25, np.arange(110, 155, 0.5) + 0.25),
+        (np.linspace(-39, -33, 59), np.linspace(140, 151, 90)),
+        (np.array([-10.0, -20.0, -40.0]), np.array([100.0, 110.0, 125.0])),
+    ],
+)
+def test_area_grid(lat, lon):
+    res = area_grid(lat, lon)
+
+    assert res.dims == ("lat", "lon")
+    assert res.attrs["units"] == "m^2"
+    npt.assert_allclose(res.lat, lat)
+    npt.assert_allclose(res.values, _meshgrid_areas(lat, lon), rtol=1e-10)
+
+
+def test_area_grid_global():
+    lat = np.arange(-90, 90, 1.0) + 0.5
+    lon = np.arange(0, 360, 1.0) + 0.5
+
+    # Close to the area of the WGS84 ellipsoid
+    npt.assert_allclose(area_grid(lat, lon).sum(), 5.1007e14, rtol=1e-3)
+
+
+def test_get_cell_areas_cached():
+    lat = np.arange(-40, -30, 0.5)
+    lon = np.arange(140, 150, 0.5)
+
+    res = get_cell_areas(lat, lon)
+    assert get_cell_areas(lat.copy(), lon.copy()) is res
+    assert area_grid(lat, lon).values.base is res.base
+
+    # Only the latitude dependence is stored for regular grids
+    assert res.strides[1] == 0
+    with pytest.raises(ValueError, match="read-only"):
+        res[0, 0] = 1
+
+    irregular = get_cell_areas(lat, np.sort(np.concatenate([lon, [145.1]])))
+    assert irregular.shape == (len(lat), len(lon) + 1)
+    assert not irregular.flags.writeable
+
+
+def test_get_grid_signature():
+    lat = np.arange(-40, -30, 0.5)
+    lon = np.arange(140, 150, 0.5)
+
+    assert get_grid_signature(lat, lon) == get_grid_signature(list(lat), list(lon))
+    assert get_grid_signature(lat, lon) != get_grid_signature(lon, lat)
+    assert get_grid_signature(lat, lon) != get_grid_signature(lat[:-1], lon)
+
+
+@pytest.mark.parametrize(
+    "coords",
+    [
+        np.arange(-40, -30, 0.5),
+        np.arange(-40, -30, 0.5)[::-1],
+        np.array([1.0, 2.0, 4.0, 8.0]),
+        np.array([5.0]),
+    ],
+)
+def test_get_nearest_indices(coords):
+    # Includes points halfway between coordinates and outside of the domain
+    values = np.concatenate(
+        [
+            np.linspace(-45, 10, 301),
+            coords,
+            (coords[1:] + coords[:-1]) / 2,
+            [np.nan],
+        ]
+    )
+
+    res = get_nearest_indices(coords, values, 0.5)
+
+    exp = pd.Index(coords).get_indexer(values, method="nearest", tolerance=0.5)
+    npt.assert_array_equal(res, exp)
+
+
+def test_get_nearest_indices_invalid():
+    with pytest.raises(ValueError, match="must be monotonic"):
+        get_nearest_indices([1.0, 3.0, 2.0], [2.0], 1.0)
+
+
+def test_allocate_points():
+    rng = np.random.default_rng(0)
+    lat = np.arange(-40, -30, 0.5)[::-1] + 0.25
+    lon = np.arange(140, 150, 0.5) + 0.25
+    points = rng.uniform((-42, 138), (-28, 152), (500, 2))
+
+    res, num_valid = allocate_points(lat, lon, points[:, 0], points[:, 1], value=2.5)
+
+    exp = xr.DataArray(coords=(("lat", lat), ("lon", lon))).fillna(0)
+    exp_valid = 0
+    for point_lat, point_lon in points:
+        try:
+            location = exp.sel(
+                lat=point_lat, lon=point_lon, method="nearest", tolerance=0.5
+            )
+        except KeyError:
+            continue
+        exp.loc[location.lat, location.lon] += 2.5
+        exp_valid += 1
+
+    assert 0 < num_valid < len(points)
+    assert num_valid == exp_valid
+    npt.assert_allclose(res, exp.values)